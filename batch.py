@@ -0,0 +1,128 @@
+import json
+import time
+from typing import Callable, Iterable, Optional, TextIO
+
+from model import Contact, ContactStore, FileHandler, optional_module, validate_contact_fields
+from search import QueryCache
+from transfer import TransferResult
+import text_en as text
+
+# Positional fields of the tab-separated form, e.g. "edit<TAB>5<TAB><TAB>+7 999 111-22-33".
+TSV_FIELDS = {
+    "create": ("name", "phone", "comment"),
+    "edit": ("id", "name", "phone", "comment"),
+    "delete": ("id",),
+    "find": ("q",),
+}
+OPERATION_ALIASES = {"update": "edit", "search": "find"}
+OUTPUT_BATCH_SIZE = 1000
+
+
+class BatchError(Exception):
+    pass
+
+
+def parse_command(line: str) -> dict:
+    if line.lstrip().startswith("{"):
+        try:
+            command = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BatchError(f"Invalid JSON: {e}")
+        if not isinstance(command, dict):
+            raise BatchError("Command must be a JSON object")
+        return command
+    op, *values = line.split("\t")
+    op = OPERATION_ALIASES.get(op.strip(), op.strip())
+    if op not in TSV_FIELDS:
+        raise BatchError(f"Unknown operation: {op!r}")
+    if len(values) > len(TSV_FIELDS[op]):
+        raise BatchError(f"Too many fields for {op}")
+    return {"op": op, **dict(zip(TSV_FIELDS[op], values))}
+
+
+def command_fields(command: dict, required: bool) -> dict:
+    try:
+        return validate_contact_fields(command, required, blank_keeps_value=True)
+    except ValueError as e:
+        raise BatchError(str(e))
+
+
+def command_id(command: dict) -> int:
+    try:
+        return int(command.get("id"))
+    except (TypeError, ValueError, OverflowError):
+        raise BatchError(f"Invalid contact id: {command.get('id')!r}")
+
+
+def apply_command(store: ContactStore, command: dict) -> dict:
+    op = OPERATION_ALIASES.get(command.get("op"), command.get("op"))
+    if op == "create":
+        contact = store.insert(Contact(store.next_id(), **command_fields(command, required=True)))
+        return {"status": 201, "contact": contact.to_dict()}
+    if op == "edit":
+        contact_id = command_id(command)
+        contact = store.update(contact_id, **command_fields(command, required=False))
+    elif op == "delete":
+        contact_id = command_id(command)
+        contact = store.delete(contact_id)
+    elif op == "find":
+        term = command.get("q")
+        if not isinstance(term, str) or not term.strip():
+            raise BatchError("Field 'q' must be a non-empty string")
+        return {"status": 200, "contacts": [contact.to_dict() for contact in store.search(term.strip())]}
+    else:
+        raise BatchError(f"Unknown operation: {op!r}")
+    if contact is None:
+        return {"status": 404, "error": text.contact_found_error.strip()}
+    return {"status": 204} if op == "delete" else {"status": 200, "contact": contact.to_dict()}
+
+
+def result_encoder() -> Callable[[dict], str]:
+    orjson = optional_module("orjson")
+    if orjson is not None:
+        return lambda response: orjson.dumps(response).decode()
+    # Plain json.dumps reuses one C encoder; passing options would build a new one per line.
+    return json.dumps
+
+
+def run_commands(store: ContactStore, lines: Iterable[str], output: TextIO) -> TransferResult:
+    result = TransferResult()
+    start = time.perf_counter()
+    encode = result_encoder()
+    pending = []
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        if not line.strip() or line.startswith("#"):
+            continue
+        try:
+            response = apply_command(store, parse_command(line))
+        except BatchError as e:
+            response = {"status": 400, "error": str(e)}
+        except Exception as e:
+            # Any other failure still answers its line, so one odd command cannot stop the batch.
+            response = {"status": 400, "error": f"{type(e).__name__}: {e}"}
+        if response["status"] < 300:
+            result.processed += 1
+        else:
+            result.rejected += 1
+        response["line"] = number
+        pending.append(encode(response))
+        if len(pending) >= OUTPUT_BATCH_SIZE:
+            output.write("\n".join(pending) + "\n")
+            pending.clear()
+    if pending:
+        output.write("\n".join(pending) + "\n")
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def run_batch(file_handler: FileHandler, lines: Iterable[str], output: TextIO) -> tuple[TransferResult, Optional[int]]:
+    # The book is read once, every command is applied in memory and the changes are saved together.
+    contacts = file_handler.read_contacts()
+    store = contacts if isinstance(contacts, ContactStore) else ContactStore(contacts)
+    # Each result is written once, so cached searches would only cost an invalidation check per change.
+    store.query_cache = QueryCache(size=0)
+    result = run_commands(store, lines, output)
+    written = file_handler.write_changes(store, store.clear_changes()) if store.changes else 0
+    store.close()
+    return result, written
@@ -0,0 +1,52 @@
+import argparse
+import io
+import json
+import os
+import random
+import tempfile
+
+from batch import run_batch
+from benchmarks.generator import iter_contacts
+from model import FileHandler
+
+
+def command_lines(count: int, size: int, seed: int, find_share: float = 0.0) -> list[str]:
+    # A mix of creates, edits and deletes in both input forms, with searches mixed in at find_share.
+    rng = random.Random(seed)
+    lines = []
+    for number in range(count):
+        if rng.random() < find_share:
+            lines.append(f"find\t{rng.randint(1, size)}")
+            continue
+        choice = rng.random()
+        if choice < 0.4:
+            lines.append(f"create\tBatch Contact {number}\t+7 900 {number:07}\tBatch")
+        elif choice < 0.7:
+            lines.append(json.dumps({"op": "edit", "id": rng.randint(1, size), "comment": "Edited"}))
+        else:
+            lines.append(f"delete\t{rng.randint(1, size)}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure batch command throughput")
+    parser.add_argument("--size", type=int, default=100_000, help="contacts in the phonebook")
+    parser.add_argument("--commands", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--finds", type=float, default=0.0,
+                        help="share of find commands; the first one builds the search index, "
+                             "which later writes keep up to date")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'commands':>10} {'apply s':>8} {'commands/s':>11} {'records written':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "phonebook.json")
+        for count in args.commands:
+            FileHandler(filename).write_contacts(iter_contacts(args.size, args.seed))
+            lines = command_lines(count, args.size, args.seed, args.finds)
+            result, written = run_batch(FileHandler(filename), lines, io.StringIO())
+            print(f"{count:>10} {result.seconds:>8.2f} {result.rate:>11.0f} {written:>16}")
+
+
+if __name__ == "__main__":
+    main()
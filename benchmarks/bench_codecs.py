@@ -0,0 +1,50 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.generator import generate_contacts
+from model import CODECS, Codec, JsonCodec, optional_module
+
+STDLIB_JSON = "json (stdlib)"
+
+
+def measure(codec: Codec, contacts: list, filename: str, repeat: int) -> tuple[int, float, float]:
+    encode = decode = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(filename, 'wb') as file:
+            codec.write(file, contacts)
+        encode = min(encode, time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in codec.read(filename):
+            pass
+        decode = min(decode, time.perf_counter() - start)
+    return os.path.getsize(filename), encode, decode
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare file size and encode/decode speed of the codecs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    codecs = {name: codec for name, codec in CODECS.items()
+              if not codec.requires or optional_module(codec.requires) is not None}
+    if codecs["json"].orjson is not None:
+        codecs[STDLIB_JSON] = JsonCodec(use_orjson=False)
+    print(f"{'contacts':>10} {'codec':>14} {'MB':>7} {'encode MB/s':>12} {'decode MB/s':>12} "
+          f"{'encode k/s':>11} {'decode k/s':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "phonebook")
+        for size in args.sizes:
+            contacts = generate_contacts(size)
+            for name, codec in sorted(codecs.items()):
+                file_size, encode, decode = measure(codec, contacts, filename, args.repeat)
+                megabytes = file_size / 2 ** 20
+                print(f"{size:>10} {name:>14} {megabytes:>7.1f} {megabytes / encode:>12.1f} "
+                      f"{megabytes / decode:>12.1f} {size / encode / 1000:>11.0f} {size / decode / 1000:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
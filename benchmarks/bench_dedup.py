@@ -0,0 +1,55 @@
+import argparse
+import random
+import time
+
+from benchmarks.generator import generate_contacts
+from dedup import propose_merges
+from model import Contact
+
+
+def typo(name: str) -> str:
+    # Two letters of the last word swapped, past its first two.
+    *words, last = name.split()
+    if len(last) > 3:
+        last = last[:2] + last[3] + last[2] + last[4:]
+    return " ".join(words + [last])
+
+
+# Ways the same person ends up entered twice: only the first name, a typo, the number typed differently.
+VARIATIONS = [
+    lambda name: name.split()[0],
+    typo,
+    lambda name: " ".join(reversed(name.split())),
+    lambda name: name,
+]
+
+
+def with_duplicates(size: int, share: float, seed: int) -> list[Contact]:
+    rng = random.Random(seed)
+    contacts = generate_contacts(size, seed)
+    for contact_id in range(size + 1, size + int(size * share) + 1):
+        original = contacts[rng.randrange(size)]
+        phone = original.phone.replace(" ", "").replace("-", "")
+        contacts.append(Contact(contact_id, rng.choice(VARIATIONS)(original.name), phone, "Duplicate"))
+    return contacts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure duplicate detection on a phonebook with planted duplicates")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--duplicates", type=float, default=0.05, help="share of planted duplicates")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'contacts':>10} {'planted':>8} {'clusters':>9} {'merged away':>12} {'seconds':>8}")
+    for size in args.sizes:
+        contacts = with_duplicates(size, args.duplicates, args.seed)
+        start = time.perf_counter()
+        result = propose_merges(contacts)
+        seconds = time.perf_counter() - start
+        print(f"{len(contacts):>10} {len(contacts) - size:>8} {result.clusters:>9} {result.duplicates:>12} "
+              f"{seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import time
+
+from benchmarks.generator import generate_contacts
+from model import ContactStore
+from search import edit_distance, tokenize
+
+TERMS = ["olge", "mascha", "petrva", "ivan sidorv", "zzzzzz"]
+
+
+def linear_fuzzy(contacts, term: str, max_distance: int) -> list[int]:
+    tokens = tokenize(term)
+    return [contact.id for contact in contacts
+            if all(any(edit_distance(token, word, max_distance) <= max_distance
+                       for word in tokenize(contact.name)) for token in tokens)]
+
+
+def measure(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare indexed and linear fuzzy name search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--distance", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'contacts':>10} {'term':>14} {'linear ms':>10} {'index ms':>10} {'matches':>8}")
+    for size in args.sizes:
+        store = ContactStore(generate_contacts(size))
+        start = time.perf_counter()
+        store.build_index()
+        print(f"{size:>10} {'(build)':>14} {'':>10} {(time.perf_counter() - start) * 1000:>10.1f}")
+        for term in TERMS:
+            found = store.fuzzy_search(term, args.distance)
+            assert sorted(c.id for c in found) == linear_fuzzy(store, term, args.distance)
+            linear = measure(lambda: linear_fuzzy(store, term, args.distance), 1)
+            indexed = measure(lambda: store.fuzzy_search(term, args.distance), args.repeat)
+            print(f"{size:>10} {term:>14} {linear * 1000:>10.2f} {indexed * 1000:>10.3f} {len(found):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import gc
+import tracemalloc
+
+from benchmarks.generator import iter_contacts
+from model import ContactStore
+
+
+class DictContact:
+    def __init__(self, id: int, name: str, phone: str, comment: str = ""):
+        self.id = id
+        self.name = name
+        self.phone = phone
+        self.comment = comment
+
+
+def build_dict_contacts(count: int) -> ContactStore:
+    contacts = (DictContact(c.id, c.name, c.phone, c.comment) for c in iter_contacts(count))
+    return ContactStore(contacts, columnar=False)
+
+
+def build_slots_contacts(count: int) -> ContactStore:
+    return ContactStore(iter_contacts(count), columnar=False)
+
+
+def build_columnar_contacts(count: int) -> ContactStore:
+    return ContactStore(iter_contacts(count), columnar=True)
+
+
+LAYOUTS = {
+    "dict objects": build_dict_contacts,
+    "slots objects": build_slots_contacts,
+    "columnar": build_columnar_contacts,
+}
+
+
+def measure(build, count: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    store = build(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory used by contact layouts")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{'layout':>14} {'MiB':>10} {'bytes/contact':>14}")
+    for name, build in LAYOUTS.items():
+        size = measure(build, args.count)
+        print(f"{name:>14} {size / 2 ** 20:>10.1f} {size / args.count:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
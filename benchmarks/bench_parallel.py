@@ -0,0 +1,47 @@
+import argparse
+import os
+import time
+
+from benchmarks.generator import generate_contacts
+from model import ContactStore
+from search import ParallelSearcher, contact_matches
+
+TERMS = ["a", "ol", "9", "6p"]
+
+
+def serial_scan(store: ContactStore, term: str) -> list[int]:
+    return [contact.id for contact in store if contact_matches(contact, term)]
+
+
+def measure(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for term in TERMS:
+            func(term)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speedup of sharded multiprocess scans by worker count")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1, 8}))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    store = ContactStore(generate_contacts(args.count))
+    serial = measure(lambda term: serial_scan(store, term), args.repeat)
+    print(f"{'workers':>8} {'ms/query':>10} {'speedup':>8}")
+    print(f"{'serial':>8} {serial * 1000 / len(TERMS):>10.1f} {1:>7.2f}x")
+    for workers in args.workers:
+        searcher = ParallelSearcher(store, workers)
+        try:
+            assert searcher.search_ids("ol") == serial_scan(store, "ol")
+            parallel = measure(searcher.search_ids, args.repeat)
+        finally:
+            searcher.close()
+        print(f"{workers:>8} {parallel * 1000 / len(TERMS):>10.1f} {serial / parallel:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
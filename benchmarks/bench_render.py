@@ -0,0 +1,47 @@
+import argparse
+import contextlib
+import os
+import time
+
+from benchmarks.generator import generate_contacts
+from model import ContactStore
+from view import View
+import text_en as text
+
+
+def print_contacts(contacts):
+    print(text.contact_main)
+    for contact in contacts:
+        print(f"{text.contact_id}{contact.id}")
+        print(f"{text.contact_name}{contact.name}")
+        print(f"{text.contact_phone}{contact.phone}")
+        print(f"{text.contact_comment}{contact.comment}")
+        print("-" * 30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure render time per page of contacts")
+    parser.add_argument("--count", type=int, default=500_000)
+    parser.add_argument("--page-size", type=int, nargs="+", default=[20, 100, 1000])
+    parser.add_argument("--pages", type=int, default=50)
+    args = parser.parse_args()
+
+    store = ContactStore(generate_contacts(args.count))
+    print(f"{'page size':>10} {'per-line print ms':>18} {'buffered ms':>12}")
+    with open(os.devnull, "w") as devnull:
+        for size in args.page_size:
+            pages = [store.page(number, size) for number in range(1, args.pages + 1)]
+            with contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                for page in pages:
+                    print_contacts(page)
+                printed = (time.perf_counter() - start) / len(pages)
+                start = time.perf_counter()
+                for number, page in enumerate(pages, 1):
+                    View.show_contacts_page(page, number, args.pages)
+                buffered = (time.perf_counter() - start) / len(pages)
+            print(f"{size:>10} {printed * 1000:>18.3f} {buffered * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
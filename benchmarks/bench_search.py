@@ -0,0 +1,47 @@
+import argparse
+import time
+
+from benchmarks.generator import generate_contacts
+from model import ContactStore
+from search import QueryCache, query_matches
+
+TERMS = ["ol", "oleg", "petrov", "9991", "call after", "no such text"]
+
+
+def linear_search(contacts, term: str) -> list:
+    term = term.lower()
+    return [contact for contact in contacts if query_matches(contact, term)]
+
+
+def measure(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare indexed and linear contact search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'contacts':>10} {'term':>14} {'linear ms':>10} {'index ms':>10} {'speedup':>8} {'cached ms':>10}")
+    for size in args.sizes:
+        store = ContactStore(generate_contacts(size))
+        start = time.perf_counter()
+        store.build_index()
+        print(f"{size:>10} {'(build)':>14} {'':>10} {(time.perf_counter() - start) * 1000:>10.1f}")
+        for term in TERMS:
+            assert store.search(term) == linear_search(store, term)
+            linear = measure(lambda: linear_search(store, term), args.repeat)
+            store.query_cache = QueryCache(size=0)
+            indexed = measure(lambda: store.search(term), args.repeat)
+            store.query_cache = QueryCache()
+            cached = measure(lambda: store.search(term), args.repeat)
+            print(f"{size:>10} {term:>14} {linear * 1000:>10.2f} {indexed * 1000:>10.2f} "
+                  f"{linear / indexed:>7.1f}x {cached * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
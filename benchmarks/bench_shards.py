@@ -0,0 +1,47 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.generator import iter_contacts
+from model import ContactStore, FileHandler
+from storage import ShardedFileHandler
+
+
+def edit_one(handler: FileHandler, contact_id: int) -> float:
+    # Open, change one contact and save it, as a single edit from the menu does.
+    start = time.perf_counter()
+    contacts = handler.read_contacts()
+    store = contacts if isinstance(contacts, ContactStore) else ContactStore(contacts)
+    store.update(contact_id, comment="Edited")
+    handler.write_changes(store, store.clear_changes())
+    return time.perf_counter() - start
+
+
+def load_all(directory: str, workers: int) -> float:
+    start = time.perf_counter()
+    ShardedFileHandler(directory, workers=workers).read_contacts().load_all()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a single file with sharded storage")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'contacts':>10} {'json edit ms':>13} {'shard edit ms':>14} {'load 1 thread ms':>17} "
+          f"{f'load {args.workers} threads ms':>18}")
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, "phonebook.json")
+        shard_dir = os.path.join(directory, "phonebook.shards")
+        for size in args.sizes:
+            FileHandler(json_file).write_contacts(iter_contacts(size))
+            ShardedFileHandler(shard_dir).write_contacts(iter_contacts(size))
+            print(f"{size:>10} {edit_one(FileHandler(json_file), size // 2) * 1000:>13.1f} "
+                  f"{edit_one(ShardedFileHandler(shard_dir), size // 2) * 1000:>14.1f} "
+                  f"{load_all(shard_dir, 1) * 1000:>17.1f} {load_all(shard_dir, args.workers) * 1000:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
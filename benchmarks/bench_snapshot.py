@@ -0,0 +1,45 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.generator import generate_contacts
+from model import ContactStore, FileHandler
+
+
+def open_json(filename: str) -> float:
+    start = time.perf_counter()
+    store = ContactStore(FileHandler(filename).read_contacts())
+    store.get(len(store) // 2)
+    return time.perf_counter() - start
+
+
+def open_binary(filename: str) -> float:
+    start = time.perf_counter()
+    store = FileHandler(filename).read_contacts()
+    store.get(len(store) // 2)
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare startup from JSON and binary snapshots")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'contacts':>10} {'json MB':>8} {'binary MB':>10} {'json ms':>9} {'binary ms':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, "phonebook.json")
+        binary_file = os.path.join(directory, "phonebook.bin")
+        for size in args.sizes:
+            contacts = generate_contacts(size)
+            FileHandler(json_file, "json").write_contacts(contacts)
+            FileHandler(binary_file, "binary").write_contacts(contacts)
+            print(f"{size:>10} {os.path.getsize(json_file) / 2 ** 20:>8.1f} "
+                  f"{os.path.getsize(binary_file) / 2 ** 20:>10.1f} "
+                  f"{open_json(json_file) * 1000:>9.1f} {open_binary(binary_file) * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from benchmarks.generator import iter_contacts
+from controller import Phonebook
+from storage import JournalFileHandler
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(code: str, repeat: int) -> float:
+    # Bytecode caching is allowed so the numbers match an installed CLI, not a first run.
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+    times = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=PACKAGE_DIR, env=env, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times[1:])
+
+
+def create_and_save(filename: str, load: str) -> tuple[float, float]:
+    view = mock.Mock()
+    view.get_contact_input.return_value = ("Bench Contact", "+7 900 000-00-00", "Benchmark")
+    start = time.perf_counter()
+    phonebook = Phonebook(JournalFileHandler(filename), view, load=load)
+    started = time.perf_counter() - start
+    phonebook.create_contact()
+    phonebook.save_contacts()
+    return started, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI cold start and a create-and-save session")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    interpreter = run_python("pass", args.repeat)
+    entry_point = run_python("import main", args.repeat)
+    print(f"interpreter start {interpreter * 1000:.1f} ms, import main +{(entry_point - interpreter) * 1000:.1f} ms")
+
+    print(f"{'contacts':>10} {'load':>11} {'start ms':>9} {'create+save ms':>15}")
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "phonebook.json")
+        for size in args.sizes:
+            JournalFileHandler(filename).write_contacts(iter_contacts(size))
+            for load in ("eager", "background", "lazy"):
+                started, total = create_and_save(filename, load)
+                print(f"{size:>10} {load:>11} {started * 1000:>9.2f} {total * 1000:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import random
+from typing import Iterator
+
+from model import CODECS, Contact, FileHandler
+
+MALE_FIRST_NAMES = ["Oleg", "Ivan", "Sergey", "Dmitry", "Pavel", "Alexey", "Andrey", "Mikhail", "Nikolay",
+                    "Vladimir", "Artem", "Maxim", "Kirill", "Roman", "Yuri", "Egor", "Denis", "Boris"]
+FEMALE_FIRST_NAMES = ["Masha", "Olga", "Anna", "Elena", "Irina", "Natalia", "Tatiana", "Svetlana", "Ekaterina",
+                      "Yulia", "Daria", "Anastasia", "Ksenia", "Polina", "Sofia", "Vera", "Alina", "Lyudmila"]
+# Male form; the female form adds "a" (Petrov / Petrova).
+LAST_NAMES = ["Lutin", "Butov", "Petrov", "Ivanov", "Smirnov", "Kuznetsov", "Popov", "Sokolov", "Lebedev",
+              "Kozlov", "Novikov", "Morozov", "Volkov", "Solovyov", "Vasiliev", "Zaitsev", "Pavlov", "Semyonov",
+              "Golubev", "Vinogradov", "Bogdanov", "Vorobyov", "Fyodorov", "Mikhailov", "Belyaev", "Tarasov"]
+FOREIGN_NAMES = ["John Smith", "Maria Garcia", "Li Wei", "Ahmed Hassan", "Anna Müller", "Jean Dupont",
+                 "Kenji Sato", "Olivia Brown", "Lucas Silva", "Fatima Khan"]
+COMMENTS = ["", "", "", "", "Work", "Family", "Gym buddy", "Dentist", "Call after 6pm", "Neighbour",
+            "Plumber, ask for a discount", "Met at the conference", "Old school friend", "Landlord",
+            "Only WhatsApp", "Kids' football coach", "Accountant", "Do not call before 10am"]
+# Digits are filled in from the left; the same number is written the way people type it.
+PHONE_FORMATS = ["8##########", "+7##########", "+7 ### ###-##-##", "8 (###) ###-##-##", "8-###-###-##-##",
+                 "+7 (###) ### ## ##", "+1-###-###-####", "+44 #### ######", "###-##-##"]
+PHONE_FORMAT_WEIGHTS = [30, 20, 15, 10, 5, 10, 4, 3, 3]
+
+
+def random_name(rng: random.Random) -> str:
+    roll = rng.random()
+    if roll < 0.03:
+        return rng.choice(FOREIGN_NAMES)
+    female = roll < 0.5
+    first = rng.choice(FEMALE_FIRST_NAMES if female else MALE_FIRST_NAMES)
+    last = rng.choice(LAST_NAMES) + ("a" if female else "")
+    if roll > 0.97:
+        return first
+    return f"{first} {last}"
+
+
+def random_phone(rng: random.Random) -> str:
+    template = rng.choices(PHONE_FORMATS, PHONE_FORMAT_WEIGHTS)[0]
+    return "".join(str(rng.randrange(10)) if char == "#" else char for char in template)
+
+
+def iter_contacts(count: int, seed: int = 42) -> Iterator[Contact]:
+    rng = random.Random(seed)
+    for contact_id in range(1, count + 1):
+        yield Contact(contact_id, random_name(rng), random_phone(rng), rng.choice(COMMENTS))
+
+
+def generate_contacts(count: int, seed: int = 42) -> list[Contact]:
+    return list(iter_contacts(count, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic phonebook file")
+    parser.add_argument("count", type=int)
+    parser.add_argument("path")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=sorted(CODECS), default="json")
+    args = parser.parse_args()
+    FileHandler(args.path, args.format).write_contacts(iter_contacts(args.count, args.seed))
+
+
+if __name__ == "__main__":
+    main()
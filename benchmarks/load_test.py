@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.generator import generate_contacts
+from model import ContactStore
+from server import ContactService, PhonebookServer
+
+SEARCH_TERMS = ["ol", "oleg", "petrov", "9991", "call after"]
+
+
+def build_request(method: str, target: str, data=None) -> bytes:
+    body = b"" if data is None else json.dumps(data).encode("utf-8")
+    head = f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n"
+    return head.encode("latin-1") + body
+
+
+def request_mix(rng: random.Random, write_ratio: float, max_id: int) -> bytes:
+    if rng.random() < write_ratio:
+        if rng.random() < 0.5:
+            return build_request("POST", "/contacts", {"name": "Load Test", "phone": "+7 900 000 00 00"})
+        return build_request("PATCH", f"/contacts/{rng.randint(1, max_id)}", {"comment": "load test"})
+    choice = rng.random()
+    if choice < 0.4:
+        return build_request("GET", f"/contacts/{rng.randint(1, max_id)}")
+    if choice < 0.7:
+        return build_request("GET", f"/contacts?q={rng.choice(SEARCH_TERMS).replace(' ', '%20')}")
+    return build_request("GET", f"/contacts?page={rng.randint(1, 50)}")
+
+
+async def read_response(reader: asyncio.StreamReader) -> int:
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        key, _, value = line.partition(b":")
+        if key.lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host: str, port: int, count: int, write_ratio: float, max_id: int,
+                 seed: int, latencies: list[float], errors: list[int]):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            request = request_mix(rng, write_ratio, max_id)
+            start = time.perf_counter()
+            writer.write(request)
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status >= 500:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(args):
+    server = None
+    host, port = args.host, args.port
+    if port is None:
+        # No target given: measure an in-process instance over a generated store.
+        store = ContactStore(generate_contacts(args.contacts))
+        store.build_index()
+        server = PhonebookServer(ContactService(store), host, 0)
+        await server.start()
+        port = server.port
+
+    latencies: list[float] = []
+    errors: list[int] = []
+    per_client = args.requests // args.concurrency
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, per_client, args.write_ratio, args.contacts,
+                                  seed, latencies, errors)
+                           for seed in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        await server.stop()
+
+    latencies.sort()
+    print(f"requests {len(latencies)}  concurrency {args.concurrency}  errors {len(errors)}")
+    print(f"p50 {percentile(latencies, 0.50) * 1000:.2f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms  "
+          f"{len(latencies) / elapsed:.0f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the phone book HTTP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="running server (default: start one in-process)")
+    parser.add_argument("--contacts", type=int, default=10_000,
+                        help="contacts in the in-process store; upper bound for random ids")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
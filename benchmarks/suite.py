@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.generator import iter_contacts
+from model import CODECS, ContactStore, FileHandler
+from search import QueryCache
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+OPERATIONS = 1_000
+TERM_LENGTHS = [1, 2, 3, 5, 8]
+
+
+def best_of(repeat: int, func: Callable[[], object], setup: Callable[[], object] = lambda: None) -> float:
+    # The fastest run is the one least disturbed by the rest of the machine.
+    times = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def search_terms(store: ContactStore, length: int, count: int, rng: random.Random) -> list[str]:
+    contacts = list(store.page(1, 1000))
+    terms = []
+    for _ in range(count):
+        text = rng.choice([contact.name for contact in contacts] + [contact.phone for contact in contacts])
+        start = rng.randrange(max(1, len(text) - length + 1))
+        terms.append(text[start:start + length])
+    return terms
+
+
+def run_size(size: int, repeat: int, snapshot_format: str, seed: int, directory: str) -> dict[str, dict]:
+    rng = random.Random(seed)
+    filename = os.path.join(directory, f"phonebook-{size}")
+    handler = FileHandler(filename, snapshot_format)
+    handler.write_contacts(iter_contacts(size, seed))
+    results = {}
+
+    def record(name: str, seconds: float, operations: int = 1):
+        results[f"{name}/{size}"] = {"seconds": seconds, "operations": operations,
+                                     "per_operation_us": seconds / operations * 1e6}
+
+    def load() -> ContactStore:
+        contacts = FileHandler(filename).read_contacts()
+        return contacts if isinstance(contacts, ContactStore) else ContactStore(contacts)
+
+    record("load", best_of(repeat, load))
+    store = ContactStore(load())
+    record("save", best_of(repeat, lambda: handler.write_contacts(store)))
+    store.build_index()
+
+    ids = rng.sample(range(1, size + 1), min(OPERATIONS, size))
+    record("create", best_of(repeat, lambda: [store.create("Bench Contact", "+7 900 000-00-00", "Benchmark")
+                                              for _ in ids]), len(ids))
+    record("edit_by_id", best_of(repeat, lambda: [store.update(contact_id, comment="Edited")
+                                                  for contact_id in ids]), len(ids))
+    deleted = {}
+
+    def restore():
+        for contact in deleted.values():
+            store.insert(contact)
+        deleted.clear()
+
+    def delete():
+        for contact_id in ids:
+            deleted[contact_id] = store.delete(contact_id)
+
+    record("delete_by_id", best_of(repeat, delete, restore), len(ids))
+    # Plain searches go past the query cache; search_repeat measures it.
+    store.query_cache = QueryCache(size=0)
+    for length in TERM_LENGTHS:
+        terms = search_terms(store, length, 20, rng)
+        record(f"search_{length}", best_of(repeat, lambda: [store.search(term) for term in terms]), len(terms))
+    store.query_cache = QueryCache()
+    terms = search_terms(store, 3, 20, rng)
+    record("search_repeat", best_of(repeat, lambda: [store.search(term) for term in terms * 10]), len(terms) * 10)
+    return results
+
+
+def run(sizes: list[int], repeat: int, snapshot_format: str, seed: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            results.update(run_size(size, repeat, snapshot_format, seed, directory))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": repeat,
+            "format": snapshot_format,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, old in baseline["results"].items():
+        new = results["results"].get(name)
+        if new is None:
+            continue
+        ratio = new["seconds"] / old["seconds"] if old["seconds"] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {old['seconds'] * 1000:.3f} ms -> {new['seconds'] * 1000:.3f} ms "
+                               f"({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Phonebook benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="contact counts (1k to 10M)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--format", choices=sorted(CODECS), default="json")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown against the baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.format, args.seed)
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    print(f"{'benchmark':>24} {'total ms':>10} {'per op us':>12}")
+    for name, result in results["results"].items():
+        print(f"{name:>24} {result['seconds'] * 1000:>10.3f} {result['per_operation_us']:>12.2f}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,28 @@
 PATH = "phonebook.json"
+SQLITE_PATH = "phonebook.db"
+SHARDS_PATH = "phonebook.shards"
+COLUMNAR_CONTACTS = False
+STORAGE = "json"
+JOURNAL_MAX_BYTES = 4 * 1024 * 1024
+PHONE_COUNTRY_CODE = "7"
+PHONE_TRUNK_PREFIX = "8"
+PHONE_NATIONAL_LENGTH = 10
+AUTOSAVE = False
+PAGE_SIZE = 20
+IMPORT_BATCH_SIZE = 10_000
+SEARCH_WORKERS = 0
+FUZZY_MAX_DISTANCE = 2
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8080
+SERVER_SAVE_INTERVAL = 1.0
+SNAPSHOT_FORMAT = "json"
+SNAPSHOT_KEEP = 3
+METRICS = False
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_MAX_RESULTS = 10_000
+LOAD_CONTACTS = "lazy"
+SHARD_MAX_CONTACTS = 50_000
+SHARD_LOAD_WORKERS = 4
+DEDUP_MAX_BLOCK = 50
+DEDUP_NAME_DISTANCE = 2
+DEDUP_SHOW_GROUPS = 10
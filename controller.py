@@ -1,59 +1,299 @@
-from typing import Optional
-from model import Contact, FileHandler
+import threading
+from typing import TYPE_CHECKING, Callable, Optional
+from config import AUTOSAVE, DEDUP_SHOW_GROUPS, FUZZY_MAX_DISTANCE, LOAD_CONTACTS, PAGE_SIZE, SEARCH_WORKERS
+from model import Changeset, Contact, ContactStore, FileHandler, SaveStats, merge_changes
+from storage import make_file_handler
 from view import View
 import text_en as text
 
+if TYPE_CHECKING:
+    # Only needed for annotations; metrics and transfer are imported when first used.
+    from metrics import Metrics
+
+
+class BackgroundSaver:
+    def __init__(self, file_handler: FileHandler, on_saved: Callable[[Optional[int], Changeset], None]):
+        self.file_handler = file_handler
+        self.on_saved = on_saved
+        self.failed: Optional[Changeset] = None
+        self._condition = threading.Condition()
+        # Whatever the store's snapshot() returns: copied rows, or the store itself for SQLite.
+        self._pending: Optional[tuple[object, Changeset]] = None
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot, changes: Changeset):
+        with self._condition:
+            # Only the newest snapshot is written; the changes of skipped ones are kept.
+            if self._pending is not None:
+                self._pending[1].merge(changes)
+                changes = self._pending[1]
+            if self.failed is not None:
+                self.failed.merge(changes)
+                changes, self.failed = self.failed, None
+            self._pending = (snapshot, changes)
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                (snapshot, changes), self._pending = self._pending, None
+                self._busy = True
+            written = None
+            try:
+                written = self.file_handler.write_changes(snapshot, changes)
+            except Exception as e:
+                # A handler that raises is a failed save; the thread has to live on for wait() and close().
+                print(f"{text.save_error}{e}")
+            finally:
+                with self._condition:
+                    if written is None:
+                        # The failed changes are older than these, so these are replayed on top of them.
+                        if self.failed is not None:
+                            self.failed.merge(changes)
+                            changes = self.failed
+                        self.failed = changes
+                    self._busy = False
+                    self._condition.notify_all()
+            self.on_saved(written, changes)
+
+    def wait(self):
+        with self._condition:
+            while self._pending is not None or self._busy:
+                self._condition.wait()
+
+    def close(self):
+        self.wait()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
 
 class Phonebook:
-    def __init__(self, file_handler: Optional[FileHandler] = None, view: Optional[View] = None):
-        self.file_handler = file_handler if file_handler is not None else FileHandler()
+    def __init__(self, file_handler: Optional[FileHandler] = None, view: Optional[View] = None,
+                 autosave: bool = AUTOSAVE, metrics: Optional["Metrics"] = None, load: str = LOAD_CONTACTS):
+        self.file_handler = file_handler if file_handler is not None else make_file_handler()
         self.view = view if view is not None else View()
-        self.contacts = []
+        # None until the book is first needed; see the contacts property.
+        self._contacts: Optional[ContactStore] = None
+        self._loader: Optional[threading.Thread] = None
+        self._background_contacts: Optional[ContactStore] = None
+        # Contacts created before the book was loaded: (name, phone, comment).
+        self.pending_contacts: list[tuple[str, str, str]] = []
         self.modified = False
-        self.load_contacts()
+        self.save_stats = SaveStats()
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.instrument(self)
+        self.saver = BackgroundSaver(self.file_handler, self._on_saved) if autosave else None
+        if load == "eager":
+            self.load_contacts()
+        elif load == "background":
+            self._loader = threading.Thread(target=self._load_in_background, daemon=True)
+            self._loader.start()
+
+    @property
+    def contacts(self) -> ContactStore:
+        if self._contacts is None:
+            self.load_contacts()
+        return self._contacts
+
+    @contacts.setter
+    def contacts(self, contacts):
+        self._contacts = contacts if isinstance(contacts, ContactStore) else ContactStore(contacts)
+
+    @property
+    def loaded(self) -> bool:
+        return self._contacts is not None
+
+    @property
+    def changes(self) -> Changeset:
+        return self.contacts.changes
 
     def load_contacts(self):
-        self.contacts = self.file_handler.read_contacts()
+        contacts = None
+        if self._loader is not None:
+            self._loader.join()
+            contacts, self._loader, self._background_contacts = self._background_contacts, None, None
+        if contacts is None:
+            # No loader, or it failed: read here so any error surfaces in this thread.
+            contacts = self._prepare(self.file_handler.read_contacts())
+        self._contacts = contacts
+        for name, phone, comment in self.pending_contacts:
+            contacts.create(name, phone, comment)
+        self.pending_contacts = []
+
+    def _load_in_background(self):
+        self._background_contacts = self._prepare(self.file_handler.read_contacts())
+
+    def _prepare(self, contacts, changes: Optional[Changeset] = None) -> ContactStore:
+        if not isinstance(contacts, ContactStore):
+            contacts = ContactStore(contacts)
+        if changes is not None:
+            contacts.changes = changes
+        if contacts.eager_index:
+            contacts.build_index()
+        if SEARCH_WORKERS > 1:
+            contacts.enable_parallel_search(SEARCH_WORKERS)
+        return contacts
+
+    def refresh_contacts(self):
+        # An unloaded book has nothing to merge; it is read fresh when first needed.
+        if not self.loaded or not self.file_handler.changed_on_disk():
+            return
+        # Another process saved the book: take its copy and keep our unsaved changes on top.
+        theirs = self.file_handler.read_contacts()
+        contacts, changes = merge_changes(theirs, self.contacts, self.changes)
+        if hasattr(theirs, "close"):
+            theirs.close()
+        self.contacts.close()
+        self.contacts = self._prepare(contacts, changes)
+        self.view.show_message(text.contacts_reloaded)
 
     def save_contacts(self):
-        if self.file_handler.write_contacts(self.contacts):
+        if self.pending_contacts and not self.loaded:
+            self._append_pending_contacts()
+            return
+
+        if self.saver is not None:
+            self.saver.submit(self.contacts.snapshot(), self.contacts.clear_changes())
             self.modified = False
-            self.view.show_message(text.contact_save_successful)
+            self.view.show_message(text.save_started)
+            return
+
+        changes = self.changes
+        written = self.file_handler.write_changes(self.contacts, changes)
+        if written is not None:
+            self.contacts.clear_changes()
+            self.modified = False
+            self._on_saved(written, changes)
         else:
             self.view.show_message(text.save_error)
 
+    def _append_pending_contacts(self):
+        written = self.file_handler.append_new_contacts(self.pending_contacts)
+        if written is None:
+            self.view.show_message(text.save_error)
+            return
+        self.save_stats.record(written, len(self.pending_contacts))
+        self.pending_contacts = []
+        self.modified = False
+        self.view.show_message(text.contact_save_successful +
+                               text.contact_save_stats.format(written=written))
+
+    def _on_saved(self, written: Optional[int], changes: Changeset):
+        if written is None:
+            self.modified = True
+            self.view.show_message(text.save_error)
+            return
+        self.save_stats.record(written, len(changes))
+        self.view.show_message(text.contact_save_successful +
+                               text.contact_save_stats.format(written=written))
+
+    def stop_autosave(self):
+        if self.saver is None:
+            return
+        self.saver.close()
+        if self.saver.failed is not None:
+            self.saver.failed.merge(self.contacts.changes)
+            self.contacts.changes = self.saver.failed
+        self.saver = None
+
+    def show_all_contacts(self, page_size: int = PAGE_SIZE):
+        total = len(self.contacts)
+        if not total:
+            self.view.show_contacts([])
+            return
+
+        pages = (total + page_size - 1) // page_size
+        page = 1
+        while True:
+            self.view.show_contacts_page(self.contacts.page(page, page_size), page, pages)
+            if pages == 1:
+                return
+            command = self.view.get_page_command()
+            if command == text.page_next:
+                page = min(page + 1, pages)
+            elif command == text.page_previous:
+                page = max(page - 1, 1)
+            elif command.isdigit() and 1 <= int(command) <= pages:
+                page = int(command)
+            else:
+                return
+
+    def import_contacts(self, path: str, fmt: Optional[str] = None):
+        import transfer
+
+        result = transfer.import_contacts(self.contacts, path, fmt)
+        if result.processed:
+            self.modified = True
+        self.view.show_message(text.import_report.format(
+            count=result.processed, rejected=result.rejected, seconds=result.seconds, rate=result.rate))
+
+    def export_contacts(self, path: str, fmt: Optional[str] = None):
+        import transfer
+
+        result = transfer.export_contacts(self.contacts, path, fmt)
+        self.view.show_message(text.export_report.format(
+            count=result.processed, seconds=result.seconds, rate=result.rate))
+
+    def dedup_contacts(self, merge: Optional[bool] = None, output: Optional[str] = None):
+        import dedup
+
+        result = dedup.propose_merges(self.contacts)
+        self.view.show_message(text.dedup_report.format(
+            clusters=result.clusters, duplicates=result.duplicates, seconds=result.seconds))
+        if output:
+            dedup.write_proposals(result.proposals, output)
+        if not result.proposals:
+            return
+        if merge is None:
+            for proposal in result.proposals[:DEDUP_SHOW_GROUPS]:
+                self.view.show_contacts(proposal.contacts)
+            merge = self.view.confirm_action(text.dedup_confirm.format(clusters=result.clusters))
+        if merge:
+            removed = dedup.apply_merges(self.contacts, result.proposals)
+            self.modified = True
+            self.view.show_message(text.dedup_merged.format(clusters=result.clusters, removed=removed))
+
     def get_next_id(self) -> int:
-        return max([contact.id for contact in self.contacts], default=0) + 1
+        return self.contacts.next_id()
 
     def create_contact(self):
         name, phone, comment = self.view.get_contact_input()
-        contact = Contact(self.get_next_id(), name, phone, comment)
-        self.contacts.append(contact)
         self.modified = True
+        if not self.loaded and self._loader is None and self.file_handler.appends_new_contacts:
+            # Saving appends these without the rest of the book, which is left unread.
+            self.pending_contacts.append((name, phone, comment))
+            self.view.show_message(text.contact_create_successful)
+            return
+        contact = Contact(self.get_next_id(), name, phone, comment)
+        self.contacts.insert(contact)
         self.view.show_message(text.contact_create_successful)
 
     def find_contacts(self):
-        search_term = self.view.get_search_term().lower()
-        found_contacts = [
-            contact for contact in self.contacts
-            if (search_term in contact.name.lower() or
-                search_term in contact.phone.lower() or
-                search_term in contact.comment.lower())
-        ]
+        search_term = self.view.get_search_term()
+        found_contacts = self.contacts.search(search_term)
+        if not found_contacts and FUZZY_MAX_DISTANCE > 0:
+            found_contacts = self.contacts.fuzzy_search(search_term)
+            if found_contacts:
+                self.view.show_message(text.contact_similar_found)
         self.view.show_contacts(found_contacts)
 
     def edit_contact(self):
-        self.view.show_contacts(self.contacts)
+        self.show_all_contacts()
         if not self.contacts:
             return
 
         contact_id = self.view.get_contact_id()
-        contact = None
-
-        for c in self.contacts:
-            if c.id == contact_id:
-                contact = c
-                break
+        contact = self.contacts.get(contact_id)
 
         if contact is None:
             self.view.show_message(text.contact_found_error)
@@ -64,36 +304,43 @@ class Phonebook:
 
         name, phone, comment = self.view.get_contact_input(is_edit=True)
 
-        if name:
-            contact.name = name
-        if phone:
-            contact.phone = phone
-        if comment:
-            contact.comment = comment
+        fields = {"name": name, "phone": phone, "comment": comment}
+        self.contacts.update(contact.id, **{field: value for field, value in fields.items() if value})
         self.view.show_message(text.contact_update_successful)
         self.modified = True
 
     def delete_contact(self):
-        self.view.show_contacts(self.contacts)
+        self.show_all_contacts()
         if not self.contacts:
             return
 
         contact_id = self.view.get_contact_id()
-        contact = next((c for c in self.contacts if c.id == contact_id), None)
+        contact = self.contacts.delete(contact_id)
 
         if contact:
-            self.contacts.remove(contact)
             self.modified = True
             self.view.show_message(text.contact_delete_successful)
         else:
             self.view.show_message(text.contact_found_error)
 
+    def stats(self) -> dict:
+        stats = self.metrics.to_dict() if self.metrics is not None else {"operations": {}, "counters": {}}
+        if self.loaded and self.contacts.query_cache is not None:
+            stats["counters"].update(self.contacts.query_cache.stats())
+        return stats
+
+    def show_stats(self):
+        if self.metrics is None:
+            self.view.show_message(text.stats_disabled)
+        self.view.show_stats(self.stats())
+
     def run(self):
         while True:
             choice = self.view.show_menu()
+            self.refresh_contacts()
 
             if choice == "1":
-                self.view.show_contacts(self.contacts)
+                self.show_all_contacts()
             elif choice == "2":
                 self.create_contact()
             elif choice == "3":
@@ -105,10 +352,18 @@ class Phonebook:
             elif choice == "6":
                 self.save_contacts()
             elif choice == '7':
+                self.stop_autosave()
                 if self.modified:
                     if self.view.confirm_action():
                         self.save_contacts()
+                # Closing unmaps a binary snapshot, so it comes after the last save.
+                if self.loaded:
+                    self.contacts.close()
                 self.view.show_message(text.phonebook_closing)
                 break
+            elif choice == "8":
+                self.show_stats()
+            elif choice == "9":
+                self.dedup_contacts()
             else:
                 self.view.show_message(text.main_menu_user_choice_error)
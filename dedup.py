@@ -0,0 +1,189 @@
+import json
+import time
+from typing import Iterable
+
+from config import DEDUP_MAX_BLOCK, DEDUP_NAME_DISTANCE, PHONE_NATIONAL_LENGTH
+from model import Contact, ContactStore
+from search import edit_distance, tokenize
+
+# Shorter numbers (extensions, short codes) are too common to say two contacts are the same person.
+MIN_PHONE_DIGITS = 5
+# A number without its area code still has its local part.
+LOCAL_PHONE_DIGITS = 7
+SOUNDEX_CODES = {letter: str(code) for code, letters in enumerate(
+    ("aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r")) for letter in letters}
+
+
+def soundex(word: str) -> str:
+    # American Soundex for Latin letters; other letters are kept as they are.
+    code = word[0]
+    previous = SOUNDEX_CODES.get(code, code)
+    for letter in word[1:]:
+        digit = SOUNDEX_CODES.get(letter, letter)
+        if digit != previous and digit != "0":
+            code += digit
+        if letter not in "hw":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def name_key(name: str) -> tuple[str, ...]:
+    # The words in sorted order, so "Petrov Ivan" and "Ivan Petrov" have one key.
+    return tuple(sorted(tokenize(name)))
+
+
+def tokens_similar(a: str, b: str, max_distance: int = DEDUP_NAME_DISTANCE) -> bool:
+    # A typo, not another name: "Olge"/"Oleg" and "Lutn"/"Lutin" match, while a changed ending
+    # ("Ivan"/"Ivana", "Petrov"/"Petrova") or start ("Masha"/"Misha") marks a different person.
+    if a[:2] != b[:2] or a.startswith(b) or b.startswith(a):
+        return False
+    # Swapped letters can change the Soundex code, so the same letters in another order count too.
+    if soundex(a) != soundex(b) and sorted(a) != sorted(b):
+        return False
+    return edit_distance(a, b, max_distance) <= max_distance
+
+
+def names_similar(a: tuple, b: tuple, max_distance: int = DEDUP_NAME_DISTANCE) -> bool:
+    tokens_a, tokens_b = set(a), set(b)
+    if not tokens_a or not tokens_b:
+        return False
+    # "Oleg" and "Oleg Lutin" on the same number are one person entered twice.
+    if tokens_a <= tokens_b or tokens_b <= tokens_a:
+        return True
+    # Otherwise the names may differ in one word only, by a typo.
+    only_a, only_b = tokens_a - tokens_b, tokens_b - tokens_a
+    if len(only_a) != 1 or len(only_b) != 1:
+        return False
+    return tokens_similar(only_a.pop(), only_b.pop(), max_distance)
+
+
+class DisjointSet:
+    def __init__(self):
+        self.parent: dict[int, int] = {}
+        self.size: dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        parent.setdefault(item, item)
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size.get(a, 1) < self.size.get(b, 1):
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] = self.size.get(a, 1) + self.size.get(b, 1)
+
+    def groups(self) -> list[list[int]]:
+        groups: dict[int, list[int]] = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return [group for group in groups.values() if len(group) > 1]
+
+
+def phone_blocks(contacts: Iterable[Contact]) -> list[list[Contact]]:
+    # The national part of the number, so "+7 999 111-22-33" and "8 999 1112233" share a block.
+    blocks: dict[str, list[Contact]] = {}
+    for contact in contacts:
+        key = contact.phone_key
+        if len(key) >= MIN_PHONE_DIGITS:
+            blocks.setdefault(key[-PHONE_NATIONAL_LENGTH:], []).append(contact)
+    return [block for block in blocks.values() if len(block) > 1]
+
+
+def name_blocks(contacts: Iterable[Contact], keys: dict[int, tuple]) -> list[list[Contact]]:
+    # The same words in any order, with the last digits of the number, so "Petrov Ivan, 111-22-33"
+    # meets "Ivan Petrov, +7 999 111-22-33", which has a different national part.
+    blocks: dict[tuple, list[Contact]] = {}
+    for contact in contacts:
+        key = contact.phone_key
+        if len(key) >= LOCAL_PHONE_DIGITS:
+            blocks.setdefault((keys[contact.id], key[-LOCAL_PHONE_DIGITS:]), []).append(contact)
+    return [block for block in blocks.values() if len(block) > 1]
+
+
+def find_duplicates(contacts: Iterable[Contact], max_block: int = DEDUP_MAX_BLOCK) -> list[list[Contact]]:
+    # Contacts are only compared within a block sharing a number or a name, never all pairs of the book.
+    contacts = list(contacts)
+    keys = {contact.id: name_key(contact.name) for contact in contacts}
+    clusters = DisjointSet()
+    for block in phone_blocks(contacts):
+        if len(block) <= max_block:
+            for i in range(len(block)):
+                for j in range(i + 1, len(block)):
+                    if names_similar(keys[block[i].id], keys[block[j].id]):
+                        clusters.union(block[i].id, block[j].id)
+        else:
+            # A number shared by many contacts (an office line) only joins identical names.
+            first: dict[tuple, int] = {}
+            for contact in block:
+                clusters.union(first.setdefault(keys[contact.id], contact.id), contact.id)
+    for block in name_blocks(contacts, keys):
+        # A number without its area code joins the full one only when the full one is unambiguous.
+        longest = max((contact.phone_key for contact in block), key=len)
+        if all(longest.endswith(contact.phone_key) for contact in block):
+            for contact in block[1:]:
+                clusters.union(block[0].id, contact.id)
+    by_id = {contact.id: contact for contact in contacts}
+    return sorted((sorted((by_id[contact_id] for contact_id in group), key=lambda contact: contact.id)
+                   for group in clusters.groups()), key=lambda cluster: cluster[0].id)
+
+
+class MergeProposal:
+    def __init__(self, contacts: list[Contact]):
+        # The oldest contact is kept and takes the most complete values of the others.
+        self.contacts = contacts
+        self.keep = contacts[0].id
+        self.remove = [contact.id for contact in contacts[1:]]
+        self.name = max((contact.name for contact in contacts), key=lambda name: (len(tokenize(name)), len(name)))
+        self.phone = max(contacts, key=lambda contact: len(contact.phone_key)).phone
+        comments = []
+        for contact in contacts:
+            if contact.comment and contact.comment not in comments:
+                comments.append(contact.comment)
+        self.comment = "; ".join(comments)
+
+    def to_dict(self) -> dict:
+        return {"keep": self.keep, "remove": self.remove,
+                "contact": {"id": self.keep, "name": self.name, "phone": self.phone, "comment": self.comment}}
+
+
+class DedupResult:
+    def __init__(self, proposals: list[MergeProposal], seconds: float):
+        self.proposals = proposals
+        self.seconds = seconds
+
+    @property
+    def clusters(self) -> int:
+        return len(self.proposals)
+
+    @property
+    def duplicates(self) -> int:
+        return sum(len(proposal.remove) for proposal in self.proposals)
+
+
+def propose_merges(contacts: Iterable[Contact], max_block: int = DEDUP_MAX_BLOCK) -> DedupResult:
+    start = time.perf_counter()
+    proposals = [MergeProposal(cluster) for cluster in find_duplicates(contacts, max_block)]
+    return DedupResult(proposals, time.perf_counter() - start)
+
+
+def apply_merges(store: ContactStore, proposals: Iterable[MergeProposal]) -> int:
+    removed = 0
+    for proposal in proposals:
+        store.update(proposal.keep, name=proposal.name, phone=proposal.phone, comment=proposal.comment)
+        for contact_id in proposal.remove:
+            if store.delete(contact_id) is not None:
+                removed += 1
+    return removed
+
+
+def write_proposals(proposals: Iterable[MergeProposal], path: str):
+    with open(path, 'w', encoding="utf-8") as file:
+        for proposal in proposals:
+            file.write(json.dumps(proposal.to_dict(), ensure_ascii=False) + "\n")
@@ -1,5 +1,122 @@
+import argparse
+import sys
+
+from config import AUTOSAVE, LOAD_CONTACTS, METRICS, PATH, SQLITE_PATH, STORAGE
 from controller import Phonebook
+from model import CODECS, convert_snapshot
+from storage import FILE_HANDLERS, make_file_handler, migrate_json_to_sqlite
+import text_en as text
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Simple phone book")
+    parser.add_argument("--storage", choices=sorted(FILE_HANDLERS), default=STORAGE)
+    parser.add_argument("--path", help="phonebook file (default depends on --storage)")
+    parser.add_argument("--autosave", action="store_true", default=AUTOSAVE,
+                        help="save in a background thread")
+    parser.add_argument("--load", choices=["eager", "lazy", "background"], default=LOAD_CONTACTS,
+                        help="read the phonebook at startup, on first use or in a background thread")
+    parser.add_argument("--stats", action="store_true", default=METRICS,
+                        help="time operations and file access (menu item 8 shows the numbers)")
+    parser.add_argument("--stats-file", help="write collected statistics as JSON on exit (implies --stats)")
+    parser.add_argument("--profile", help="run under cProfile and write pstats to this file")
+    commands = parser.add_subparsers(dest="command")
+
+    migrate = commands.add_parser("migrate", help="import a JSON phonebook into SQLite")
+    migrate.add_argument("source", nargs="?", default=PATH)
+    migrate.add_argument("target", nargs="?", default=SQLITE_PATH)
+    migrate.add_argument("--replace", action="store_true", help="delete the contacts already in the target")
+
+    convert = commands.add_parser("convert", help="rewrite a phonebook file in another format")
+    convert.add_argument("source")
+    convert.add_argument("target")
+    convert.add_argument("--to", choices=sorted(CODECS), default="binary")
+
+    batch = commands.add_parser("batch", help="apply create/edit/delete/find commands (TSV or NDJSON lines) "
+                                              "and write the results as NDJSON")
+    batch.add_argument("file", nargs="?", default="-", help="command file (default: standard input)")
+    batch.add_argument("--output", default="-", help="results file (default: standard output)")
+
+    dedup = commands.add_parser("dedup", help="find contacts entered more than once and merge them")
+    dedup.add_argument("--merge", action="store_true", help="merge every group found and save")
+    dedup.add_argument("--output", help="write the merge proposals to this NDJSON file")
+
+    for name, help_text in (("import", "add contacts from a CSV, vCard or NDJSON file"),
+                            ("export", "write all contacts to a CSV, vCard or NDJSON file")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("file")
+        command.add_argument("--format", choices=["csv", "ndjson", "vcard"],
+                             help="file format (default: from the file extension)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile:
+        from metrics import profiled
+
+        profiled(lambda: run(args), args.profile)
+    else:
+        run(args)
+
+
+def run(args: argparse.Namespace):
+    if args.command == "migrate":
+        count = migrate_json_to_sqlite(args.source, args.target, args.replace)
+        if count is not None:
+            print(text.migrate_successful.format(count=count, path=args.target))
+        return
+    if args.command == "convert":
+        count = convert_snapshot(args.source, args.target, args.to)
+        if count is not None:
+            print(text.convert_successful.format(count=count, path=args.target))
+        return
+
+    if args.command == "batch":
+        run_batch_command(args)
+        return
+
+    metrics = None
+    if args.stats or args.stats_file:
+        from metrics import Metrics
+
+        metrics = Metrics()
+    app = Phonebook(make_file_handler(args.storage, args.path), autosave=args.autosave, metrics=metrics,
+                    load=args.load)
+    if args.command == "import":
+        app.import_contacts(args.file, args.format)
+        app.save_contacts()
+        app.stop_autosave()
+    elif args.command == "export":
+        app.export_contacts(args.file, args.format)
+    elif args.command == "dedup":
+        app.dedup_contacts(merge=args.merge, output=args.output)
+        if app.modified:
+            app.save_contacts()
+        app.stop_autosave()
+    else:
+        app.run()
+    if args.stats_file:
+        metrics.dump(args.stats_file, app.stats())
+
+
+def run_batch_command(args: argparse.Namespace):
+    from batch import run_batch
+
+    source = sys.stdin if args.file == "-" else open(args.file, "r", encoding="utf-8")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        result, written = run_batch(make_file_handler(args.storage, args.path), source, output)
+    finally:
+        for file in (source, output):
+            if file not in (sys.stdin, sys.stdout):
+                file.close()
+    # Results go to standard output, so the summary goes to standard error.
+    print(text.batch_report.format(count=result.processed, rejected=result.rejected, seconds=result.seconds,
+                                   rate=result.rate, written=written), file=sys.stderr)
+    if written is None:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    app = Phonebook()
-    app.run()
+    main()
@@ -0,0 +1,158 @@
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Optional
+
+# Histogram bucket upper bounds in seconds: 1 µs doubling up to about 17 s.
+BUCKET_BOUNDS = [1e-6 * 2 ** i for i in range(25)]
+PHONEBOOK_OPERATIONS = ("load_contacts", "save_contacts", "show_all_contacts", "create_contact",
+                        "find_contacts", "edit_contact", "delete_contact",
+                        "import_contacts", "export_contacts", "dedup_contacts")
+# View calls that wait for the user; their time is left out of the operation that made them.
+VIEW_INPUTS = ("get_contact_input", "get_search_term", "get_contact_id", "get_page_command",
+               "confirm_action")
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        # Upper bound of the bucket holding the percentile, capped by the largest sample.
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS, self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+            "buckets": {f"{bound * 1000:.3f}": count
+                        for bound, count in zip(BUCKET_BOUNDS + [float("inf")], self.buckets) if count},
+        }
+
+
+def file_size(filename: str) -> int:
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+class Metrics:
+    def __init__(self):
+        self.timers: dict[str, Histogram] = {}
+        self.counters: dict[str, int] = {
+            "bytes_read": 0,
+            "bytes_written": 0,
+            "contacts_read": 0,
+            "contacts_written": 0,
+            "records_written": 0,
+        }
+        self._waiting = threading.local()
+
+    def histogram(self, name: str) -> Histogram:
+        if name not in self.timers:
+            self.timers[name] = Histogram()
+        return self.timers[name]
+
+    def _wait_time(self) -> float:
+        return getattr(self._waiting, "seconds", 0.0)
+
+    def timed(self, name: str, func: Callable, on_result: Optional[Callable] = None) -> Callable:
+        histogram = self.histogram(name)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            waited = self._wait_time()
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                histogram.record(time.perf_counter() - start - (self._wait_time() - waited))
+            if on_result is not None:
+                on_result(result, *args)
+            return result
+        return wrapper
+
+    def waiting(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._waiting.seconds = self._wait_time() + time.perf_counter() - start
+        return wrapper
+
+    def instrument(self, phonebook):
+        # Wrappers are set on the instances only, so nothing changes for uninstrumented objects.
+        for name in PHONEBOOK_OPERATIONS:
+            setattr(phonebook, name, self.timed(name, getattr(phonebook, name)))
+        for name in VIEW_INPUTS:
+            if hasattr(phonebook.view, name):
+                setattr(phonebook.view, name, self.waiting(getattr(phonebook.view, name)))
+        self.instrument_file_handler(phonebook.file_handler)
+
+    def instrument_file_handler(self, file_handler):
+        filenames = [file_handler.filename]
+        if hasattr(file_handler, "journal_filename"):
+            filenames.append(file_handler.journal_filename)
+
+        def on_read(contacts, *args):
+            self.counters["bytes_read"] += sum(map(file_size, filenames))
+            self.counters["contacts_read"] += len(contacts)
+
+        def on_write(written, contacts, *args):
+            if written:
+                self.counters["bytes_written"] += file_size(file_handler.filename)
+                self.counters["contacts_written"] += len(contacts)
+
+        def on_changes(written, *args):
+            self.counters["records_written"] += written or 0
+
+        file_handler.read_contacts = self.timed("read_contacts", file_handler.read_contacts, on_read)
+        file_handler.write_contacts = self.timed("write_contacts", file_handler.write_contacts, on_write)
+        file_handler.write_changes = self.timed("write_changes", file_handler.write_changes, on_changes)
+
+    def to_dict(self) -> dict:
+        return {
+            "operations": {name: histogram.to_dict() for name, histogram in self.timers.items()
+                           if histogram.count},
+            "counters": dict(self.counters),
+        }
+
+    def dump(self, path: str, stats: Optional[dict] = None):
+        with open(path, 'w') as file:
+            json.dump(self.to_dict() if stats is None else stats, file, indent=2)
+
+
+def profiled(func: Callable, path: str):
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func)
+    finally:
+        profiler.dump_stats(path)
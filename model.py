@@ -1,15 +1,60 @@
+import codecs
+import importlib
 import json
-from config import PATH
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from json.encoder import encode_basestring_ascii
+from typing import BinaryIO, Iterable, Iterator, Optional, TextIO
+from config import COLUMNAR_CONTACTS, PATH, SNAPSHOT_FORMAT, SNAPSHOT_KEEP
+from search import (FuzzyIndex, NgramIndex, ParallelSearcher, PhoneIndex, QueryCache, contact_matches, is_phone_query,
+                    normalize_phone)
 import text_en as text
 
+READ_CHUNK_SIZE = 64 * 1024
+TEMP_SUFFIX = ".tmp"
+# Each snapshot has a "<crc32> <size>" sidecar; one that fails it is set aside with DAMAGED_SUFFIX.
+CHECKSUM_SUFFIX = ".crc32"
+DAMAGED_SUFFIX = ".damaged"
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# What may follow a decode error when the value is only cut short: part of a
+# literal, number or escape running up to the end of the buffer.
+PARTIAL_TOKEN = re.compile(r'[^ \t\n\r,:\[\]{}"]*')
+# Binary snapshot: header, id table, record table (heap offset and field lengths), string heap.
+SNAPSHOT_MAGIC = b"PHBKSNP1"
+SNAPSHOT_HEADER = struct.Struct("<8sQ")
+SNAPSHOT_ID = struct.Struct("<q")
+SNAPSHOT_RECORD = struct.Struct("<QIII")
+# Other codecs that are not plain JSON also start with an eight byte magic.
+PACKED_MAGIC = b"PHBKPAK1"
+PACKED_RECORD = struct.Struct("<qIII")
+LINES_MAGIC = b"PHBKJSL1"
+MSGPACK_MAGIC = b"PHBKMSP1"
+WRITE_BATCH_SIZE = 1000
+OPTIONAL_MODULES: dict = {}
+CONTACT_FIELDS = ("name", "phone", "comment")
+
 
 class Contact:
+    __slots__ = ("id", "name", "phone", "comment")
+
     def __init__(self, id: int, name: str, phone: str, comment: str = ""):
         self.id = id
         self.name = name
         self.phone = phone
         self.comment = comment
 
+    @property
+    def phone_key(self) -> str:
+        # Computed when needed; a cached key would cost every contact another slot and string.
+        return normalize_phone(self.phone)
+
     @classmethod
     def from_dict(cls, data: dict) -> 'Contact':
         return cls(
@@ -27,31 +72,1095 @@ class Contact:
             "comment": self.comment
         }
 
+    def copy(self) -> 'Contact':
+        return Contact(self.id, self.name, self.phone, self.comment)
+
+
+def validate_contact_fields(data: dict, required: bool, blank_keeps_value: bool = False) -> dict:
+    # Contact fields sent by a client (server, batch commands); ValueError says what is wrong with them.
+    fields = {}
+    for field in CONTACT_FIELDS:
+        value = data.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            raise ValueError(f"Field '{field}' must be a string")
+        value = value.strip()
+        # Like the interactive edit, a blank field may leave the current value.
+        if value or not blank_keeps_value:
+            fields[field] = value
+    for field in ("name", "phone"):
+        if (required or field in fields) and not fields.get(field):
+            raise ValueError(f"Field '{field}' cannot be empty")
+    return fields
+
+
+class PackedStrings:
+    def __init__(self):
+        self._data = bytearray()
+        self._starts = array('Q')
+        self._lengths = array('I')
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, index: int) -> str:
+        start = self._starts[index]
+        return self._data[start:start + self._lengths[index]].decode()
+
+    def __setitem__(self, index: int, value: str):
+        # The old bytes stay in the buffer until compact() is called.
+        start, length = self._pack(value)
+        self._starts[index] = start
+        self._lengths[index] = length
+
+    def _pack(self, value: str) -> tuple[int, int]:
+        encoded = value.encode()
+        start = len(self._data)
+        self._data += encoded
+        return start, len(encoded)
+
+    def append(self, value: str):
+        start, length = self._pack(value)
+        self._starts.append(start)
+        self._lengths.append(length)
+
+    def compact(self):
+        values = [self[index] for index in range(len(self))]
+        self.__init__()
+        for value in values:
+            self.append(value)
+
+
+class ContactView:
+    __slots__ = ("_columns", "_pos")
+
+    def __init__(self, columns: 'ContactColumns', pos: int):
+        self._columns = columns
+        self._pos = pos
+
+    @property
+    def id(self) -> int:
+        return self._columns.ids[self._pos]
+
+    @property
+    def name(self) -> str:
+        return self._columns.names[self._pos]
+
+    @name.setter
+    def name(self, value: str):
+        self._columns.names[self._pos] = value
+
+    @property
+    def phone(self) -> str:
+        return self._columns.phones[self._pos]
+
+    @phone.setter
+    def phone(self, value: str):
+        self._columns.phones[self._pos] = value
+
+    @property
+    def phone_key(self) -> str:
+        return normalize_phone(self.phone)
+
+    @property
+    def comment(self) -> str:
+        return self._columns.comments[self._pos]
+
+    @comment.setter
+    def comment(self, value: str):
+        self._columns.comments[self._pos] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "phone": self.phone,
+            "comment": self.comment
+        }
+
+
+class ContactColumns:
+    def __init__(self):
+        self.ids = array('q')
+        self.names = PackedStrings()
+        self.phones = PackedStrings()
+        self.comments = PackedStrings()
+        self._alive = bytearray()
+        self._count = 0
+        # Filled only if ids stop arriving in ascending order.
+        self._positions: Optional[dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, contact_id: int) -> bool:
+        return self._find(contact_id) is not None
+
+    def __getitem__(self, contact_id: int) -> ContactView:
+        pos = self._find(contact_id)
+        if pos is None:
+            raise KeyError(contact_id)
+        return ContactView(self, pos)
+
+    def __setitem__(self, contact_id: int, contact: Contact):
+        if contact_id in self:
+            raise ValueError(f"Contact with id {contact_id} already exists")
+        pos = len(self.ids)
+        if self._positions is None and self.ids and contact_id <= self.ids[-1]:
+            self._positions = {cid: i for i, cid in enumerate(self.ids) if self._alive[i]}
+        if self._positions is not None:
+            self._positions[contact_id] = pos
+        self.ids.append(contact_id)
+        self.names.append(contact.name)
+        self.phones.append(contact.phone)
+        self.comments.append(contact.comment)
+        self._alive.append(1)
+        self._count += 1
+
+    def _find(self, contact_id: int) -> Optional[int]:
+        if self._positions is not None:
+            return self._positions.get(contact_id)
+        pos = bisect_left(self.ids, contact_id)
+        if pos < len(self.ids) and self.ids[pos] == contact_id and self._alive[pos]:
+            return pos
+        return None
+
+    def get(self, contact_id: int, default=None):
+        pos = self._find(contact_id)
+        return default if pos is None else ContactView(self, pos)
+
+    def pop(self, contact_id: int, default=None):
+        pos = self._find(contact_id)
+        if pos is None:
+            return default
+        contact = Contact(contact_id, self.names[pos], self.phones[pos], self.comments[pos])
+        self._alive[pos] = 0
+        self._count -= 1
+        if self._positions is not None:
+            del self._positions[contact_id]
+        return contact
+
+    def values(self) -> Iterator[ContactView]:
+        alive = self._alive
+        return (ContactView(self, pos) for pos in range(len(self.ids)) if alive[pos])
+
+
+class Utf8Reader:
+    # Text on top of a binary file, decoded chunk by chunk as JsonArrayReader asks for it.
+    def __init__(self, file: BinaryIO):
+        self._file = file
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def read(self, size: int) -> str:
+        chunk = self._file.read(size)
+        return self._decoder.decode(chunk, final=not chunk)
+
+
+class JsonArrayReader:
+    def __init__(self, file: TextIO, chunk_size: int = READ_CHUNK_SIZE):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+
+    def _fill(self) -> bool:
+        chunk = self._file.read(self._chunk_size)
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return bool(chunk)
+
+    def _peek(self) -> str:
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", self._buffer, self._pos)
+        self._pos += 1
+        return char
+
+    def _decode(self):
+        while True:
+            try:
+                value, self._pos = self._decoder.raw_decode(self._buffer, self._pos)
+                return value
+            except json.JSONDecodeError as e:
+                # Only a value cut at the chunk boundary is worth another read;
+                # anything else is malformed and would be copied again on every refill.
+                if not self._cut_at_end(e) or not self._fill():
+                    raise
+
+    def _cut_at_end(self, error: json.JSONDecodeError) -> bool:
+        if error.msg.startswith("Unterminated string"):
+            return True
+        return PARTIAL_TOKEN.fullmatch(self._buffer, error.pos) is not None
+
+    def __iter__(self) -> Iterator:
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+        else:
+            while True:
+                self._peek()
+                yield self._decode()
+                if self._expect(",]") == "]":
+                    break
+        if self._peek():
+            raise json.JSONDecodeError("Extra data", self._buffer, self._pos)
+
+
+class BinarySnapshot:
+    def __init__(self, filename: str):
+        with open(filename, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = SNAPSHOT_HEADER.unpack_from(self._map)
+        self._records = SNAPSHOT_HEADER.size + self._count * SNAPSHOT_ID.size
+        self._heap = self._records + self._count * SNAPSHOT_RECORD.size
+        if magic != SNAPSHOT_MAGIC or len(self._map) < self._heap:
+            self._map.close()
+            raise ValueError(f"Not a contact snapshot: {filename}")
+        id_table = memoryview(self._map)[SNAPSHOT_HEADER.size:self._records]
+        if sys.byteorder == "little":
+            self._ids = id_table.cast("q")
+        else:
+            self._ids = array('q', id_table.tobytes())
+            self._ids.byteswap()
+            id_table.release()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def id_at(self, pos: int) -> int:
+        return self._ids[pos]
+
+    def position(self, contact_id: int) -> Optional[int]:
+        pos = bisect_left(self._ids, contact_id)
+        if pos < self._count and self._ids[pos] == contact_id:
+            return pos
+        return None
+
+    def contact(self, pos: int) -> Contact:
+        offset, name_len, phone_len, comment_len = SNAPSHOT_RECORD.unpack_from(
+            self._map, self._records + pos * SNAPSHOT_RECORD.size)
+        start = self._heap + offset
+        data = self._map[start:start + name_len + phone_len + comment_len]
+        return Contact(self._ids[pos], data[:name_len].decode(),
+                       data[name_len:name_len + phone_len].decode(),
+                       data[name_len + phone_len:].decode())
+
+    def __iter__(self) -> Iterator[Contact]:
+        return (self.contact(pos) for pos in range(self._count))
+
+    def close(self):
+        if isinstance(self._ids, memoryview):
+            self._ids.release()
+        self._map.close()
+
+    @staticmethod
+    def write(file: BinaryIO, contacts: Iterable[Contact]):
+        contacts = sorted(contacts, key=lambda contact: contact.id)
+        ids = bytearray()
+        records = bytearray()
+        heap = bytearray()
+        for contact in contacts:
+            fields = [contact.name.encode(), contact.phone.encode(), contact.comment.encode()]
+            ids += SNAPSHOT_ID.pack(contact.id)
+            records += SNAPSHOT_RECORD.pack(len(heap), *map(len, fields))
+            heap += b"".join(fields)
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(contacts)))
+        file.write(ids)
+        file.write(records)
+        file.write(heap)
+
+
+def optional_module(name: str):
+    # Optional speedups are imported on first use, keeping them off the startup path.
+    if name not in OPTIONAL_MODULES:
+        try:
+            OPTIONAL_MODULES[name] = importlib.import_module(name)
+        except ImportError:
+            OPTIONAL_MODULES[name] = None
+    return OPTIONAL_MODULES[name]
+
+
+def batches(items: Iterable, size: int = WRITE_BATCH_SIZE) -> Iterator[list]:
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+class Codec:
+    name = ""
+    magic = b""
+    extension = ""
+    # Optional module the codec cannot work without; looked up on first use.
+    requires = ""
+
+    def check_available(self, filename: str):
+        if self.requires and optional_module(self.requires) is None:
+            raise ValueError(f"{filename} needs {self.requires}, which is not installed")
+
+    def check_magic(self, file: BinaryIO, filename: str):
+        if file.read(len(self.magic)) != self.magic:
+            raise ValueError(f"Not a {self.name} file: {filename}")
+
+    def write(self, file: BinaryIO, contacts: Iterable[Contact]):
+        raise NotImplementedError
+
+    def read(self, filename: str) -> Iterator[Contact]:
+        with open(filename, 'rb') as file:
+            yield from self.decode(file, filename)
+
+    def decode(self, file: BinaryIO, filename: str) -> Iterator[Contact]:
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    # A compact JSON array; orjson encodes it when installed.
+    name = "json"
+    extension = ".json"
+
+    def __init__(self, use_orjson: bool = True):
+        self.use_orjson = use_orjson
+
+    @property
+    def orjson(self):
+        return optional_module("orjson") if self.use_orjson else None
+
+    def write(self, file: BinaryIO, contacts: Iterable[Contact]):
+        orjson = self.orjson
+        separator = b"[\n"
+        for batch in batches(contacts):
+            if orjson is not None:
+                # orjson writes "[{...},{...}]" on one line; the brackets are dropped to join batches.
+                records = orjson.dumps([contact.to_dict() for contact in batch])[1:-1]
+            else:
+                records = ",\n".join(
+                    f'{{"id":{c.id},"name":{encode_basestring_ascii(c.name)},'
+                    f'"phone":{encode_basestring_ascii(c.phone)},"comment":{encode_basestring_ascii(c.comment)}}}'
+                    for c in batch).encode()
+            file.write(separator + records)
+            separator = b",\n"
+        file.write(b"[\n]\n" if separator == b"[\n" else b"\n]\n")
+
+    def decode(self, file: BinaryIO, filename: str) -> Iterator[Contact]:
+        for data in JsonArrayReader(Utf8Reader(file)):
+            yield Contact.from_dict(data)
+
+
+class JsonLinesCodec(Codec):
+    # One [id, name, phone, comment] array per line, so orjson can decode it line by line.
+    # Without orjson the standard library reads and writes the same file.
+    name = "jsonl"
+    magic = LINES_MAGIC
+    extension = ".jsonl"
+
+    def write(self, file: BinaryIO, contacts: Iterable[Contact]):
+        file.write(self.magic + b"\n")
+        orjson = optional_module("orjson")
+        if orjson is not None:
+            dumps = orjson.dumps
+        else:
+            dumps = lambda record: json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode()
+        for batch in batches(contacts):
+            file.write(b"".join(dumps((c.id, c.name, c.phone, c.comment)) + b"\n" for c in batch))
+
+    def decode(self, file: BinaryIO, filename: str) -> Iterator[Contact]:
+        orjson = optional_module("orjson")
+        loads = orjson.loads if orjson is not None else json.loads
+        self.check_magic(file, filename)
+        file.readline()
+        for line in file:
+            contact_id, name, phone, comment = loads(line)
+            yield Contact(contact_id, name, phone, comment)
+
+
+class PackedCodec(Codec):
+    # Length-prefixed records: id and the byte lengths of the three UTF-8 fields, then the fields.
+    name = "packed"
+    magic = PACKED_MAGIC
+    extension = ".pack"
+
+    def write(self, file: BinaryIO, contacts: Iterable[Contact]):
+        file.write(self.magic)
+        buffer = bytearray()
+        for contact in contacts:
+            name, phone, comment = contact.name.encode(), contact.phone.encode(), contact.comment.encode()
+            buffer += PACKED_RECORD.pack(contact.id, len(name), len(phone), len(comment))
+            buffer += name + phone + comment
+            if len(buffer) >= READ_CHUNK_SIZE:
+                file.write(buffer)
+                buffer.clear()
+        file.write(buffer)
+
+    def decode(self, file: BinaryIO, filename: str) -> Iterator[Contact]:
+        header = PACKED_RECORD.size
+        self.check_magic(file, filename)
+        buffer, pos = b"", 0
+        while True:
+            chunk = file.read(READ_CHUNK_SIZE)
+            buffer, pos = buffer[pos:] + chunk, 0
+            while len(buffer) - pos >= header:
+                contact_id, name_len, phone_len, comment_len = PACKED_RECORD.unpack_from(buffer, pos)
+                start = pos + header
+                phone_start = start + name_len
+                comment_start = phone_start + phone_len
+                end = comment_start + comment_len
+                if end > len(buffer):
+                    break
+                yield Contact(contact_id, buffer[start:phone_start].decode(),
+                              buffer[phone_start:comment_start].decode(), buffer[comment_start:end].decode())
+                pos = end
+            if not chunk:
+                if pos < len(buffer):
+                    raise ValueError(f"Truncated record in {filename}")
+                return
+
+
+class SnapshotCodec(Codec):
+    # The memory-mapped BinarySnapshot; FileHandler opens these without decoding them.
+    name = "binary"
+    magic = SNAPSHOT_MAGIC
+    extension = ".bin"
+
+    def write(self, file: BinaryIO, contacts: Iterable[Contact]):
+        BinarySnapshot.write(file, contacts)
+
+    def read(self, filename: str) -> Iterator[Contact]:
+        snapshot = BinarySnapshot(filename)
+        try:
+            yield from snapshot
+        finally:
+            snapshot.close()
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+    magic = MSGPACK_MAGIC
+    extension = ".msgpack"
+    requires = "msgpack"
+
+    def write(self, file: BinaryIO, contacts: Iterable[Contact]):
+        file.write(self.magic)
+        packer = optional_module("msgpack").Packer()
+        for batch in batches(contacts):
+            file.write(b"".join(packer.pack((c.id, c.name, c.phone, c.comment)) for c in batch))
+
+    def decode(self, file: BinaryIO, filename: str) -> Iterator[Contact]:
+        self.check_magic(file, filename)
+        for contact_id, name, phone, comment in optional_module("msgpack").Unpacker(file, use_list=False):
+            yield Contact(contact_id, name, phone, comment)
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), JsonLinesCodec(), PackedCodec(), SnapshotCodec(),
+                                           MsgpackCodec())}
+
+
+def detect_codec(filename: str) -> Codec:
+    with open(filename, 'rb') as file:
+        head = file.read(len(SNAPSHOT_MAGIC))
+    for codec in CODECS.values():
+        if codec.magic and head == codec.magic:
+            codec.check_available(filename)
+            return codec
+    return CODECS["json"]
+
+
+class MappedContacts:
+    # Mapping over a snapshot: records are decoded on access, changes live in memory.
+    def __init__(self, snapshot: BinarySnapshot):
+        self.snapshot = snapshot
+        self._loaded: dict[int, Contact] = {}
+        self._added: dict[int, Contact] = {}
+        self._deleted: set[int] = set()
+        self._count = len(snapshot)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, contact_id: int) -> bool:
+        return self.get(contact_id) is not None
+
+    def __getitem__(self, contact_id: int) -> Contact:
+        contact = self.get(contact_id)
+        if contact is None:
+            raise KeyError(contact_id)
+        return contact
+
+    def __setitem__(self, contact_id: int, contact: Contact):
+        if contact_id in self:
+            raise ValueError(f"Contact with id {contact_id} already exists")
+        if self.snapshot.position(contact_id) is None:
+            self._added[contact_id] = contact
+        else:
+            self._deleted.discard(contact_id)
+        self._loaded[contact_id] = contact
+        self._count += 1
+
+    def get(self, contact_id: int, default=None):
+        contact = self._loaded.get(contact_id)
+        if contact is None and contact_id not in self._deleted:
+            pos = self.snapshot.position(contact_id)
+            if pos is not None:
+                # Kept, so that edits made through the returned object stick.
+                contact = self._loaded[contact_id] = self.snapshot.contact(pos)
+        return default if contact is None else contact
+
+    def pop(self, contact_id: int, default=None):
+        contact = self.get(contact_id)
+        if contact is None:
+            return default
+        del self._loaded[contact_id]
+        if self._added.pop(contact_id, None) is None:
+            self._deleted.add(contact_id)
+        self._count -= 1
+        return contact
+
+    def values(self) -> Iterator[Contact]:
+        snapshot = self.snapshot
+        loaded = self._loaded
+        deleted = self._deleted
+        for pos in range(len(snapshot)):
+            contact_id = snapshot.id_at(pos)
+            if contact_id not in deleted:
+                contact = loaded.get(contact_id)
+                yield snapshot.contact(pos) if contact is None else contact
+        yield from self._added.values()
+
+
+class Changeset:
+    def __init__(self):
+        self.added: set[int] = set()
+        self.updated: set[int] = set()
+        self.deleted: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.updated) + len(self.deleted)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.deleted)
+
+    @property
+    def dirty(self) -> set[int]:
+        return self.added | self.updated
+
+    def record_insert(self, contact_id: int):
+        self.added.add(contact_id)
+        self.deleted.discard(contact_id)
+
+    def record_update(self, contact_id: int):
+        if contact_id not in self.added:
+            self.updated.add(contact_id)
+
+    def record_delete(self, contact_id: int):
+        # A contact created and deleted before the next save never reaches storage.
+        if contact_id in self.added:
+            self.added.discard(contact_id)
+            return
+        self.updated.discard(contact_id)
+        self.deleted.add(contact_id)
+
+    def merge(self, newer: 'Changeset'):
+        for contact_id in newer.deleted:
+            self.record_delete(contact_id)
+        for contact_id in newer.added:
+            self.record_insert(contact_id)
+        for contact_id in newer.updated:
+            self.record_update(contact_id)
+
+
+class ContactRows:
+    # A copy of the book as plain tuples, cheap to take on the menu thread; contacts are made
+    # again only when the saving thread reads them.
+    def __init__(self, rows: list[tuple[int, str, str, str]]):
+        self.rows = rows
+        self._positions: Optional[dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[Contact]:
+        return (Contact(*row) for row in self.rows)
+
+    def get(self, contact_id: int) -> Optional[Contact]:
+        if self._positions is None:
+            self._positions = {row[0]: pos for pos, row in enumerate(self.rows)}
+        pos = self._positions.get(contact_id)
+        return None if pos is None else Contact(*self.rows[pos])
+
+
+def merge_changes(theirs: Iterable[Contact], ours, changes: Changeset) -> tuple[list[Contact], Changeset]:
+    # Replays our unsaved changes over someone else's newer copy; the last writer wins per contact.
+    merged = {contact.id: contact for contact in theirs}
+    rebased = Changeset()
+    for contact_id in changes.deleted:
+        if merged.pop(contact_id, None) is not None:
+            rebased.record_delete(contact_id)
+    for contact_id in sorted(changes.updated):
+        contact = ours.get(contact_id)
+        if contact is not None:
+            merged[contact_id] = Contact(contact.id, contact.name, contact.phone, contact.comment)
+            rebased.record_update(contact_id)
+    next_id = max(max(merged, default=0), max(changes.added, default=0)) + 1
+    for contact_id in sorted(changes.added):
+        contact = ours.get(contact_id)
+        if contact is None:
+            continue
+        contact = Contact(contact.id, contact.name, contact.phone, contact.comment)
+        if contact_id in merged:
+            # The other copy created a different contact under the same id.
+            contact.id = next_id
+            next_id += 1
+        merged[contact.id] = contact
+        rebased.record_insert(contact.id)
+    return list(merged.values()), rebased
+
+
+class SaveStats:
+    def __init__(self):
+        self.saves = 0
+        self.records_written = 0
+        self.last_written = 0
+        self.last_changes = 0
+
+    def record(self, written: int, changes: int):
+        self.saves += 1
+        self.records_written += written
+        self.last_written = written
+        self.last_changes = changes
+
+
+class ContactStore:
+    # Whether loading should build the search indexes up front rather than on the first lookup.
+    eager_index = True
+
+    def __init__(self, contacts: Iterable[Contact] = (), columnar: bool = COLUMNAR_CONTACTS):
+        self._contacts = ContactColumns() if columnar else {}
+        self._last_id = 0
+        self._id_ordered = True
+        # Insertion rank by id, built on the first lookup after an id arrives out of order.
+        self._positions: Optional[dict[int, int]] = None
+        self._next_position = 0
+        self._text_index: Optional[NgramIndex] = None
+        self._phone_index: Optional[PhoneIndex] = None
+        self._fuzzy_index: Optional[FuzzyIndex] = None
+        self._indexes: list = []
+        self._parallel: Optional[ParallelSearcher] = None
+        self._parallel_generation = -1
+        self.search_workers = 0
+        self.generation = 0
+        self.query_cache = QueryCache()
+        self.changes = Changeset()
+        for contact in contacts:
+            # Older files may contain repeated ids; keep every record reachable.
+            if contact.id in self._contacts:
+                contact.id = self.next_id()
+            self.insert(contact)
+        self.clear_changes()
+
+    def __iter__(self):
+        return iter(self._contacts.values())
+
+    def __len__(self) -> int:
+        return len(self._contacts)
+
+    def __contains__(self, contact_id: int) -> bool:
+        return contact_id in self._contacts
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("contact index out of range")
+        return next(islice(self, index, None))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (ContactStore, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def next_id(self) -> int:
+        return self._last_id + 1
+
+    def page(self, number: int, size: int) -> list[Contact]:
+        start = (number - 1) * size
+        return list(islice(self, start, start + size))
+
+    def get(self, contact_id: int) -> Optional[Contact]:
+        return self._contacts.get(contact_id)
+
+    def insert(self, contact: Contact) -> Contact:
+        if contact.id in self._contacts:
+            raise ValueError(f"Contact with id {contact.id} already exists")
+        self._contacts[contact.id] = contact
+        if contact.id > self._last_id:
+            self._last_id = contact.id
+        else:
+            self._id_ordered = False
+        if self._positions is not None:
+            self._positions[contact.id] = self._next_position
+            self._next_position += 1
+        for index in self._indexes:
+            index.add(contact)
+        self.query_cache.contact_changed(contact)
+        self.generation += 1
+        self.changes.record_insert(contact.id)
+        return contact
+
+    def insert_many(self, contacts: Iterable[Contact]) -> int:
+        # Dropping the indexes and rebuilding them on the next lookup beats updating them per contact.
+        self._indexes = []
+        self.query_cache.clear()
+        count = 0
+        for contact in contacts:
+            self.insert(contact)
+            count += 1
+        return count
+
+    def create(self, name: str, phone: str, comment: str = "") -> Contact:
+        return self.insert(Contact(self.next_id(), name, phone, comment))
+
+    def update(self, contact_id: int, **fields) -> Optional[Contact]:
+        contact = self._contacts.get(contact_id)
+        if contact is None:
+            return None
+        changed = {field for field, value in fields.items() if getattr(contact, field) != value}
+        # Only indexes over a changed field are touched; a new comment leaves the phone index alone.
+        indexes = [index for index in self._indexes if changed.intersection(index.fields)]
+        for index in indexes:
+            index.remove(contact)
+        for field in changed:
+            setattr(contact, field, fields[field])
+        for index in indexes:
+            index.add(contact)
+        self.query_cache.contact_changed(contact)
+        self.generation += 1
+        self.changes.record_update(contact_id)
+        return contact
+
+    def delete(self, contact_id: int) -> Optional[Contact]:
+        contact = self._contacts.pop(contact_id, None)
+        if contact is None:
+            return None
+        if self._positions is not None:
+            del self._positions[contact_id]
+        for index in self._indexes:
+            index.remove(contact)
+        self.query_cache.contact_deleted(contact_id)
+        self.generation += 1
+        self.changes.record_delete(contact_id)
+        return contact
+
+    def snapshot(self) -> ContactRows:
+        return ContactRows([(c.id, c.name, c.phone, c.comment) for c in self])
+
+    def clear_changes(self) -> Changeset:
+        changes = self.changes
+        self.changes = Changeset()
+        return changes
+
+    def build_index(self):
+        self._text_index = NgramIndex(self)
+        self._phone_index = PhoneIndex(self)
+        self._fuzzy_index = FuzzyIndex(self)
+        self._indexes = [self._text_index, self._phone_index, self._fuzzy_index]
+
+    def _ordered(self, ids) -> Iterable[Contact]:
+        if self._id_ordered:
+            return (self._contacts[contact_id] for contact_id in sorted(ids))
+        # Sorting the matches by rank keeps a lookup proportional to the matches, not to the book.
+        if self._positions is None:
+            self._positions = {contact.id: pos for pos, contact in enumerate(self)}
+            self._next_position = len(self._positions)
+        return (self._contacts[contact_id] for contact_id in sorted(ids, key=self._positions.__getitem__))
+
+    def search(self, term: str) -> list[Contact]:
+        term = term.lower()
+        cache = self.query_cache
+        ids = cache.get(term)
+        if ids is not None:
+            return [self._contacts[contact_id] for contact_id in ids]
+        if not self._indexes:
+            self.build_index()
+        candidates = self._text_index.candidates(term)
+        ids = cache.refinement(term, len(self) if candidates is None else len(candidates))
+        if ids is not None:
+            found = [contact for contact in map(self._contacts.__getitem__, ids) if contact_matches(contact, term)]
+        else:
+            found = self._search(term, candidates)
+        cache.put(term, [contact.id for contact in found], refined=ids is not None)
+        return found
+
+    def _search(self, term: str, ids: Optional[set[int]]) -> list[Contact]:
+        if ids is None and self.search_workers > 1:
+            found = [self._contacts[contact_id] for contact_id in self._parallel_search(term)]
+        else:
+            candidates = self if ids is None else self._ordered(ids)
+            found = [contact for contact in candidates if contact_matches(contact, term)]
+        if is_phone_query(term):
+            phone_ids = set(self._phone_index.prefix(normalize_phone(term)))
+            if not phone_ids.issubset(contact.id for contact in found):
+                found = list(self._ordered(phone_ids.union(contact.id for contact in found)))
+        return found
+
+    def fuzzy_search(self, term: str, max_distance: Optional[int] = None) -> list[Contact]:
+        if not self._indexes:
+            self.build_index()
+        scores = self._fuzzy_index.matches(term, max_distance)
+        if self._id_ordered:
+            return [self._contacts[contact_id]
+                    for contact_id in sorted(scores, key=lambda contact_id: (scores[contact_id], contact_id))]
+        return sorted(self._ordered(scores), key=lambda contact: scores[contact.id])
+
+    def enable_parallel_search(self, workers: int):
+        self.close()
+        self.search_workers = workers
+
+    def _parallel_search(self, term: str) -> list[int]:
+        # Workers hold a copy of the book, so any change since they started means resharding.
+        if self._parallel is None or self._parallel_generation != self.generation:
+            self.close()
+            self._parallel = ParallelSearcher(self, self.search_workers)
+            self._parallel_generation = self.generation
+        return self._parallel.search_ids(term)
+
+    def close(self):
+        if self._parallel is not None:
+            self._parallel.close()
+            self._parallel = None
+
+    def find_by_phone(self, phone: str, prefix: bool = False) -> list[Contact]:
+        if not self._indexes:
+            self.build_index()
+        key = normalize_phone(phone)
+        ids = self._phone_index.prefix(key) if prefix else self._phone_index.exact(key)
+        return list(self._ordered(ids))
+
+
+class MappedContactStore(ContactStore):
+    # Opening costs the same for any size; contacts are decoded as they are used.
+    eager_index = False
+
+    def __init__(self, snapshot: BinarySnapshot):
+        super().__init__()
+        self._contacts = MappedContacts(snapshot)
+        self._last_id = snapshot.id_at(len(snapshot) - 1) if len(snapshot) else 0
+
+    def close(self):
+        super().close()
+        self._contacts.snapshot.close()
+
+
+class ChecksumWriter:
+    # Codecs only call write, so the checksum is taken on the way to the file instead of re-reading it.
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.crc = 0
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def checksum(self) -> str:
+        return f"{self.crc:08x} {self.size}"
+
+
+class ChecksumReader:
+    # The reading side of ChecksumWriter: a snapshot is checked in the pass that decodes it.
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.crc = 0
+        self.size = 0
+
+    def _add(self, data: bytes) -> bytes:
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        return data
+
+    def read(self, size: int = -1) -> bytes:
+        return self._add(self.file.read(size))
+
+    def readline(self) -> bytes:
+        return self._add(self.file.readline())
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self.readline, b"")
+
+    def checksum(self) -> str:
+        # Whatever the codec left unread still counts.
+        while self.read(READ_CHUNK_SIZE):
+            pass
+        return f"{self.crc:08x} {self.size}"
+
+
+def file_checksum(filename: str) -> str:
+    crc = 0
+    size = 0
+    with open(filename, 'rb') as file:
+        while chunk := file.read(READ_CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+    return f"{crc:08x} {size}"
+
+
+def read_checksum(filename: str) -> Optional[str]:
+    try:
+        with open(filename + CHECKSUM_SUFFIX, 'r') as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        # Written by an older version or by hand.
+        return None
+
+
+def write_synced(filename: str, data: bytes):
+    with open(filename, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def sync_directory(filename: str):
+    # Makes the renames durable; not every platform can open a directory.
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    descriptor = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def remove_file(filename: str):
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
+def move_snapshot(source: str, target: str):
+    # The target loses its checksum first: a snapshot without one is still read, while a
+    # checksum left over from the file it replaced would reject it.
+    remove_file(target + CHECKSUM_SUFFIX)
+    os.replace(source, target)
+    if os.path.exists(source + CHECKSUM_SUFFIX):
+        os.replace(source + CHECKSUM_SUFFIX, target + CHECKSUM_SUFFIX)
+
 
 class FileHandler:
-    def __init__(self, filename: str = PATH):
+    # Whether new contacts can be saved with append_new_contacts, without reading the book first.
+    appends_new_contacts = False
+
+    def __init__(self, filename: str = PATH, snapshot_format: str = SNAPSHOT_FORMAT, keep: int = SNAPSHOT_KEEP,
+                 checksums: bool = True):
         self.filename = filename
+        self.snapshot_format = snapshot_format
+        # Previous snapshots kept as <filename>.1 (newest) to <filename>.<keep>.
+        self.keep = keep
+        self.checksums = checksums
+
+    def snapshot_files(self) -> list[str]:
+        return [self.filename] + [f"{self.filename}.{number}" for number in range(1, self.keep + 1)]
 
     def read_contacts(self) -> list[Contact]:
-        try:
-            with open(self.filename, 'r') as file:
-                data = json.load(file)
-                result = []
-                for contact in data:
-                    cnt_obj = Contact.from_dict(contact)
-                    result.append(cnt_obj)
-                return result
-        except FileNotFoundError:
-            return []
-        except json.JSONDecodeError:
-            return []
+        damaged = []
+        for filename in self.snapshot_files():
+            try:
+                contacts = self.read_snapshot(filename)
+            except FileNotFoundError:
+                continue
+            except ValueError as e:
+                print(f"{text.load_error}{e}")
+                damaged.append(filename)
+                continue
+            if damaged:
+                print(f"{text.snapshot_restored}{filename}")
+            return contacts
+        if self.filename in damaged:
+            # Nothing usable is left; the file is kept for recovery rather than overwritten by the next save.
+            move_snapshot(self.filename, self.filename + DAMAGED_SUFFIX)
+            print(f"{text.snapshot_damaged}{self.filename + DAMAGED_SUFFIX}")
+        return []
+
+    def read_snapshot(self, filename: str):
+        # A file that fails its checksum is damaged even if it decodes: one cut at a record boundary does.
+        expected = read_checksum(filename) if self.checksums else None
+        codec = detect_codec(filename)
+        if isinstance(codec, SnapshotCodec):
+            # Hashing would read the whole file that mapping avoids; the size catches a cut-off copy,
+            # which the header alone does not.
+            if expected is not None and expected.split()[-1] != str(os.path.getsize(filename)):
+                raise ValueError(f"Size does not match the checksum of {filename}")
+            contacts = MappedContactStore(BinarySnapshot(filename))
+        else:
+            with open(filename, 'rb') as file:
+                reader = ChecksumReader(file)
+                contacts = list(codec.decode(reader, filename))
+                if expected is not None and reader.checksum() != expected:
+                    raise ValueError(f"Checksum does not match {filename}")
+        # Saves keep the format the file was read in.
+        self.snapshot_format = codec.name
+        return contacts
+
+    def iter_contacts(self) -> Iterator[Contact]:
+        yield from detect_codec(self.filename).read(self.filename)
+
+    def changed_on_disk(self) -> bool:
+        return False
+
+    def write_changes(self, contacts, changes: Changeset) -> Optional[int]:
+        return len(contacts) if self.write_contacts(contacts) else None
 
     def write_contacts(self, contacts) -> bool:
+        # The new snapshot is complete and on disk before any rename, so a crash at any point
+        # leaves either the old or the new one in place, plus the rotated copies.
+        temp_filename = self.filename + TEMP_SUFFIX
         try:
-            with open(self.filename, 'w') as file:
-                json_data = [contact.to_dict() for contact in contacts]
-                json.dump(json_data, file, indent=2)
+            codec = CODECS[self.snapshot_format]
+            codec.check_available(self.filename)
+            with open(temp_filename, 'wb') as file:
+                writer = ChecksumWriter(file)
+                codec.write(writer, contacts)
+                file.flush()
+                os.fsync(file.fileno())
+            if self.checksums:
+                write_synced(temp_filename + CHECKSUM_SUFFIX, writer.checksum().encode())
+            self.rotate()
+            move_snapshot(temp_filename, self.filename)
+            sync_directory(self.filename)
             return True
         except Exception as e:
+            for filename in (temp_filename, temp_filename + CHECKSUM_SUFFIX):
+                if os.path.isfile(filename):
+                    os.remove(filename)
             print(f"{text.save_error}{e}")
             return False
+
+    def rotate(self):
+        # Renames only: the current file becomes <filename>.1 and the oldest copy is dropped.
+        files = self.snapshot_files()
+        for source, target in reversed(list(zip(files, files[1:]))):
+            if os.path.isfile(source):
+                move_snapshot(source, target)
+
+
+def convert_snapshot(source: str, target: str, snapshot_format: str) -> Optional[int]:
+    try:
+        contacts = list(FileHandler(source).iter_contacts())
+    except Exception as e:
+        print(f"{text.convert_error}{e}")
+        return None
+    # A failed write has already been reported.
+    if not FileHandler(target, snapshot_format).write_contacts(contacts):
+        return None
+    return len(contacts)
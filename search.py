@@ -0,0 +1,371 @@
+import re
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Iterable, Optional, Sequence
+
+from config import (FUZZY_MAX_DISTANCE, PHONE_COUNTRY_CODE, PHONE_NATIONAL_LENGTH, PHONE_TRUNK_PREFIX,
+                    QUERY_CACHE_MAX_RESULTS, QUERY_CACHE_SIZE)
+
+NGRAM_SIZE = 3
+PHONE_BUCKET_DIGITS = 6
+SEARCH_FIELDS = ("name", "phone", "comment")
+NON_DIGITS = re.compile(r"\D")
+PHONE_QUERY = re.compile(r"^\+?[\d\s().-]*\d[\d\s().-]*$")
+WORD = re.compile(r"\w+")
+
+
+def contact_matches(contact, term: str) -> bool:
+    return (term in contact.name.lower() or
+            term in contact.phone.lower() or
+            term in contact.comment.lower())
+
+
+def normalize_phone(phone: str) -> str:
+    if phone.isdigit():
+        digits = phone
+    else:
+        if phone.lstrip().startswith("+"):
+            return NON_DIGITS.sub("", phone)
+        digits = NON_DIGITS.sub("", phone)
+    if digits.startswith(PHONE_TRUNK_PREFIX) and len(digits) <= PHONE_NATIONAL_LENGTH + 1:
+        digits = PHONE_COUNTRY_CODE + digits[len(PHONE_TRUNK_PREFIX):]
+    return digits
+
+
+def is_phone_query(term: str) -> bool:
+    return PHONE_QUERY.match(term) is not None
+
+
+def query_matches(contact, term: str) -> bool:
+    # What ContactStore.search returns for a lowercase term: text matches plus phone prefixes.
+    if contact_matches(contact, term):
+        return True
+    if is_phone_query(term):
+        digits = normalize_phone(term)
+        return bool(digits) and contact.phone_key.startswith(digits)
+    return False
+
+
+def ngrams(text: str, size: int = NGRAM_SIZE) -> set[str]:
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class NgramIndex:
+    fields = SEARCH_FIELDS
+
+    def __init__(self, contacts: Iterable = (), size: int = NGRAM_SIZE):
+        self.size = size
+        self._postings: dict[str, set[int]] = {}
+        for contact in contacts:
+            self.add(contact)
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def _contact_grams(self, contact) -> set[str]:
+        grams = set()
+        for field in SEARCH_FIELDS:
+            grams |= ngrams(getattr(contact, field).lower(), self.size)
+        return grams
+
+    def add(self, contact):
+        postings = self._postings
+        for gram in self._contact_grams(contact):
+            ids = postings.get(gram)
+            if ids is None:
+                postings[gram] = {contact.id}
+            else:
+                ids.add(contact.id)
+
+    def remove(self, contact):
+        postings = self._postings
+        for gram in self._contact_grams(contact):
+            ids = postings.get(gram)
+            if ids is not None:
+                ids.discard(contact.id)
+                if not ids:
+                    del postings[gram]
+
+    def candidates(self, term: str) -> Optional[set[int]]:
+        # None means the term is too short to be answered from the index.
+        grams = ngrams(term, self.size)
+        if not grams:
+            return None
+        lists = sorted((self._postings.get(gram, ()) for gram in grams), key=len)
+        result = set(lists[0])
+        for ids in lists[1:]:
+            if not result:
+                break
+            result &= ids
+        return result
+
+
+class PhoneIndex:
+    # Keys grouped by their first PHONE_BUCKET_DIGITS digits, so adding or removing a contact
+    # touches one small bucket instead of shifting a sorted list of the whole book.
+    fields = ("phone",)
+
+    def __init__(self, contacts: Iterable = ()):
+        self._buckets: dict[str, dict[str, set[int]]] = {}
+        # Sorted bucket names for short prefixes; a bucket is only added or dropped now and then.
+        self._starts: list[str] = []
+        self._count = 0
+        for contact in contacts:
+            self.add(contact)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, contact):
+        key = contact.phone_key
+        start = key[:PHONE_BUCKET_DIGITS]
+        bucket = self._buckets.get(start)
+        if bucket is None:
+            bucket = self._buckets[start] = {}
+            insort(self._starts, start)
+        bucket.setdefault(key, set()).add(contact.id)
+        self._count += 1
+
+    def remove(self, contact):
+        key = contact.phone_key
+        bucket = self._buckets.get(key[:PHONE_BUCKET_DIGITS])
+        ids = bucket.get(key) if bucket is not None else None
+        if ids is None or contact.id not in ids:
+            return
+        ids.discard(contact.id)
+        self._count -= 1
+        if not ids:
+            del bucket[key]
+            if not bucket:
+                start = key[:PHONE_BUCKET_DIGITS]
+                del self._buckets[start]
+                del self._starts[bisect_left(self._starts, start)]
+
+    def prefix(self, digits: str) -> list[int]:
+        if not digits:
+            return []
+        if len(digits) >= PHONE_BUCKET_DIGITS:
+            buckets = [self._buckets.get(digits[:PHONE_BUCKET_DIGITS], {})]
+        else:
+            # ':' sorts right after '9', so it bounds every name starting with the prefix.
+            starts = self._starts[bisect_left(self._starts, digits):bisect_left(self._starts, digits + ":")]
+            buckets = [self._buckets[start] for start in starts]
+        return [contact_id for bucket in buckets for key, ids in bucket.items() if key.startswith(digits)
+                for contact_id in ids]
+
+    def exact(self, digits: str) -> list[int]:
+        return list(self._buckets.get(digits[:PHONE_BUCKET_DIGITS], {}).get(digits, ())) if digits else []
+
+
+def tokenize(text: str) -> list[str]:
+    return WORD.findall(text.lower())
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    # Levenshtein distance, or limit + 1 as soon as it is known to exceed limit.
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def deletions(word: str, depth: int) -> set[str]:
+    result = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {item[:i] + item[i + 1:] for item in frontier for i in range(len(item))}
+        result |= frontier
+    return result
+
+
+class FuzzyIndex:
+    fields = ("name",)
+
+    def __init__(self, contacts: Iterable = (), max_distance: int = FUZZY_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._token_ids: dict[str, set[int]] = {}
+        self._variants: dict[str, set[str]] = {}
+        for contact in contacts:
+            self.add(contact)
+
+    def __len__(self) -> int:
+        return len(self._token_ids)
+
+    def add(self, contact):
+        for token in set(tokenize(contact.name)):
+            ids = self._token_ids.get(token)
+            if ids is None:
+                self._token_ids[token] = {contact.id}
+                for variant in deletions(token, self.max_distance):
+                    self._variants.setdefault(variant, set()).add(token)
+            else:
+                ids.add(contact.id)
+
+    def remove(self, contact):
+        for token in set(tokenize(contact.name)):
+            ids = self._token_ids.get(token)
+            if ids is None:
+                continue
+            ids.discard(contact.id)
+            if ids:
+                continue
+            del self._token_ids[token]
+            for variant in deletions(token, self.max_distance):
+                tokens = self._variants.get(variant)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._variants[variant]
+
+    def similar_tokens(self, token: str, max_distance: int) -> dict[str, int]:
+        candidates = set()
+        for variant in deletions(token, max_distance):
+            candidates |= self._variants.get(variant, set())
+        result = {}
+        for candidate in candidates:
+            distance = edit_distance(token, candidate, max_distance)
+            if distance <= max_distance:
+                result[candidate] = distance
+        return result
+
+    def matches(self, term: str, max_distance: Optional[int] = None) -> dict[int, int]:
+        # Every word of the term has to be close to some word of the name; distances add up.
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        scores: Optional[dict[int, int]] = None
+        for token in tokenize(term):
+            best: dict[int, int] = {}
+            for similar, distance in self.similar_tokens(token, max_distance).items():
+                for contact_id in self._token_ids[similar]:
+                    if distance < best.get(contact_id, max_distance + 1):
+                        best[contact_id] = distance
+            if scores is None:
+                scores = best
+            else:
+                scores = {contact_id: score + best[contact_id]
+                          for contact_id, score in scores.items() if contact_id in best}
+            if not scores:
+                break
+        return scores or {}
+
+
+class QueryCache:
+    def __init__(self, size: int = QUERY_CACHE_SIZE, max_results: int = QUERY_CACHE_MAX_RESULTS):
+        self.size = size
+        # Larger results cost more memory and invalidation work than a new index lookup.
+        self.max_results = max_results
+        self._entries: OrderedDict[str, tuple[list[int], set[int]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.refinements = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, term: str) -> Optional[list[int]]:
+        entry = self._entries.get(term)
+        if entry is None:
+            return None
+        self._entries.move_to_end(term)
+        self.hits += 1
+        return entry[0]
+
+    def refinement(self, term: str, candidates: int) -> Optional[list[int]]:
+        # Text matches of a term are a subset of those of any part of it; phone-prefix
+        # matches are not, so phone-like terms always go to the index.
+        if is_phone_query(term):
+            return None
+        # The smallest cached result to filter, and only if it is smaller than what the index would check.
+        best = None
+        for cached, (ids, _) in self._entries.items():
+            if cached in term and len(ids) < candidates and (best is None or len(ids) < len(self._entries[best][0])):
+                best = cached
+        if best is None:
+            return None
+        self._entries.move_to_end(best)
+        self.refinements += 1
+        return self._entries[best][0]
+
+    def put(self, term: str, ids: list[int], refined: bool = False):
+        if not refined:
+            self.misses += 1
+        if self.size <= 0 or len(ids) > self.max_results:
+            return
+        self._entries[term] = (ids, set(ids))
+        self._entries.move_to_end(term)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def contact_changed(self, contact):
+        # Only entries whose answer now differs for this contact are dropped.
+        stale = [term for term, (_, ids) in self._entries.items()
+                 if (contact.id in ids) != query_matches(contact, term)]
+        for term in stale:
+            del self._entries[term]
+        self.invalidations += len(stale)
+
+    def contact_deleted(self, contact_id: int):
+        for ids, id_set in self._entries.values():
+            if contact_id in id_set:
+                ids.remove(contact_id)
+                id_set.discard(contact_id)
+
+    def clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "cache_hits": self.hits,
+            "cache_refinements": self.refinements,
+            "cache_misses": self.misses,
+            "cache_invalidations": self.invalidations,
+            "cache_entries": len(self._entries),
+        }
+
+
+_shard: Sequence[tuple] = ()
+
+
+def load_shard(rows: Sequence[tuple]):
+    global _shard
+    _shard = rows
+
+
+def scan_shard(term: str) -> list[int]:
+    return [contact_id for contact_id, name, phone, comment in _shard
+            if term in name or term in phone or term in comment]
+
+
+class ParallelSearcher:
+    def __init__(self, contacts: Iterable, workers: int):
+        from concurrent.futures import ProcessPoolExecutor
+
+        rows = [(contact.id, contact.name.lower(), contact.phone.lower(), contact.comment.lower())
+                for contact in contacts]
+        shard_size = max(1, -(-len(rows) // workers))
+        # One single-process pool per shard: each worker receives its rows once, at start-up.
+        self._pools = [
+            ProcessPoolExecutor(1, initializer=load_shard, initargs=(rows[start:start + shard_size],))
+            for start in range(0, len(rows), shard_size)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._pools)
+
+    def search_ids(self, term: str) -> list[int]:
+        futures = [pool.submit(scan_shard, term) for pool in self._pools]
+        return [contact_id for future in futures for contact_id in future.result()]
+
+    def close(self):
+        for pool in self._pools:
+            pool.shutdown(cancel_futures=True)
+        self._pools = []
@@ -0,0 +1,364 @@
+import argparse
+import asyncio
+import json
+import time
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from config import PAGE_SIZE, SERVER_HOST, SERVER_PORT, SERVER_SAVE_INTERVAL, STORAGE
+from model import Contact, ContactStore, FileHandler, validate_contact_fields
+from storage import FILE_HANDLERS, make_file_handler
+import text_en as text
+
+MAX_BODY_SIZE = 16 * 1024 * 1024
+REASONS = {
+    200: "OK",
+    201: "Created",
+    204: "No Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, method: str, target: str, headers: Optional[dict] = None, body: bytes = b""):
+        url = urlsplit(target)
+        self.method = method.upper()
+        self.path = url.path
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.headers = headers or {}
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body or b"null")
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise HttpError(400, f"Invalid JSON: {e}")
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+
+class Response:
+    def __init__(self, status: int, data=None, headers: Optional[dict] = None):
+        self.status = status
+        self.headers = headers or {}
+        self.body = b"" if data is None else json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    @property
+    def data(self):
+        return json.loads(self.body) if self.body else None
+
+    def encode(self, keep_alive: bool = True) -> bytes:
+        lines = [f"HTTP/1.1 {self.status} {REASONS.get(self.status, '')}",
+                 f"Content-Length: {len(self.body)}",
+                 "Connection: " + ("keep-alive" if keep_alive else "close")]
+        if self.body:
+            lines.append("Content-Type: application/json; charset=utf-8")
+        lines.extend(f"{key}: {value}" for key, value in self.headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + self.body
+
+
+def contact_fields(data, required: bool) -> dict:
+    if not isinstance(data, dict):
+        raise HttpError(400, "Contact must be a JSON object")
+    try:
+        return validate_contact_fields(data, required)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+
+def parse_int(value, what: str = "contact id") -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise HttpError(400, f"Invalid {what}: {value!r}")
+
+
+def batch_result(status: int, data) -> dict:
+    if data is None:
+        return {"status": status}
+    return {"status": status, "contact" if status < 300 else "error": data}
+
+
+class ContactService:
+    def __init__(self, store: ContactStore, file_handler: Optional[FileHandler] = None,
+                 save_interval: float = SERVER_SAVE_INTERVAL):
+        self.store = store
+        self.file_handler = file_handler
+        self.save_interval = save_interval
+        self.generation = 0
+        # Distinguishes ETags issued before and after a restart.
+        self._instance = format(time.time_ns(), "x")
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._save_lock = asyncio.Lock()
+
+    @property
+    def etag(self) -> str:
+        return f'"{self._instance}-{self.generation}"'
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._write_loop())]
+        if self.file_handler is not None:
+            self._tasks.append(asyncio.create_task(self._save_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.save()
+
+    async def write(self, operations: list[dict]) -> list[tuple[int, object]]:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((operations, future))
+        return await future
+
+    async def _write_loop(self):
+        # The only task that mutates the store, so handlers never see a half-applied batch.
+        while True:
+            operations, future = await self._queue.get()
+            results = []
+            for operation in operations:
+                try:
+                    results.append(self._apply(operation))
+                except Exception as e:
+                    # The operations before it stay applied, so each one answers for itself
+                    # and the writer keeps serving the next batches.
+                    results.append((500, {"error": f"{type(e).__name__}: {e}"}))
+            if not future.cancelled():
+                future.set_result(results)
+
+    def _apply(self, operation) -> tuple[int, object]:
+        try:
+            if not isinstance(operation, dict):
+                raise HttpError(400, "Operation must be a JSON object")
+            op = operation.get("op")
+            if op == "create":
+                fields = contact_fields(operation, required=True)
+                contact = self.store.insert(Contact(self.store.next_id(), **fields))
+                status = 201
+            elif op == "update":
+                contact = self.store.update(parse_int(operation.get("id")),
+                                            **contact_fields(operation, required=False))
+                status = 200
+            elif op == "delete":
+                contact = self.store.delete(parse_int(operation.get("id")))
+                status = 204
+            else:
+                raise HttpError(400, f"Unknown operation: {op!r}")
+        except HttpError as e:
+            return e.status, {"error": e.message}
+        if contact is None:
+            return 404, {"error": text.contact_found_error.strip()}
+        self.generation += 1
+        return status, None if status == 204 else contact.to_dict()
+
+    async def _save_loop(self):
+        while True:
+            await asyncio.sleep(self.save_interval)
+            await self.save()
+
+    async def save(self) -> Optional[int]:
+        # Shielded and locked: cancelling the save loop must not leave a write running next to the
+        # final save in stop(), nor skip putting back the changes of a write that failed.
+        return await asyncio.shield(self._save())
+
+    async def _save(self) -> Optional[int]:
+        async with self._save_lock:
+            if self.file_handler is None or not self.store.changes:
+                return 0
+            snapshot = self.store.snapshot()
+            changes = self.store.clear_changes()
+            written = await asyncio.get_running_loop().run_in_executor(
+                None, self.file_handler.write_changes, snapshot, changes)
+            if written is None:
+                # Keep the failed changes so the next save writes them again.
+                changes.merge(self.store.changes)
+                self.store.changes = changes
+            return written
+
+    def _listing(self, contacts: list) -> Response:
+        return Response(200, {"contacts": [contact.to_dict() for contact in contacts]},
+                        headers={"ETag": self.etag})
+
+    def list_contacts(self, request: Request) -> Response:
+        # Every list is a function of the URL and the store, so one ETag covers them all.
+        if self.etag in {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}:
+            return Response(304, headers={"ETag": self.etag})
+        query = request.query
+        if "ids" in query:
+            ids = [parse_int(value) for value in query["ids"].split(",") if value]
+            return self._listing([contact for contact in map(self.store.get, ids) if contact])
+        page = parse_int(query.get("page", 1), "page")
+        size = parse_int(query.get("size", PAGE_SIZE), "page size")
+        if page < 1 or size < 1:
+            raise HttpError(400, "Page and size must be positive")
+        if "q" in query:
+            found = self.store.search(query["q"])
+            if not found and query.get("fuzzy") == "1":
+                found = self.store.fuzzy_search(query["q"])
+            total = len(found)
+            contacts = found[(page - 1) * size:page * size]
+        else:
+            total = len(self.store)
+            contacts = self.store.page(page, size)
+        response = self._listing(contacts)
+        response.headers["X-Total-Count"] = str(total)
+        return response
+
+    async def handle(self, request: Request) -> Response:
+        try:
+            return await self._dispatch(request)
+        except HttpError as e:
+            return Response(e.status, {"error": e.message})
+
+    async def _dispatch(self, request: Request) -> Response:
+        parts = request.path.strip("/").split("/")
+        if parts[0] != "contacts" or len(parts) > 2:
+            raise HttpError(404, f"No such resource: {request.path}")
+        method = request.method
+
+        if len(parts) == 1:
+            if method == "GET":
+                return self.list_contacts(request)
+            if method == "POST":
+                data = request.json()
+                operation = dict(data, op="create") if isinstance(data, dict) else data
+                return Response(*(await self.write([operation]))[0])
+        elif parts[1] == "batch":
+            if method == "POST":
+                operations = request.json()
+                if not isinstance(operations, list):
+                    raise HttpError(400, "Batch must be a JSON array of operations")
+                results = await self.write(operations)
+                return Response(200, {"results": [batch_result(*result) for result in results]})
+        else:
+            id = parse_int(parts[1])
+            if method == "GET":
+                contact = self.store.get(id)
+                if contact is None:
+                    raise HttpError(404, text.contact_found_error.strip())
+                return Response(200, contact.to_dict())
+            if method in ("PUT", "PATCH"):
+                data = request.json()
+                operation = dict(data, op="update", id=id) if isinstance(data, dict) else data
+                return Response(*(await self.write([operation]))[0])
+            if method == "DELETE":
+                return Response(*(await self.write([{"op": "delete", "id": id}]))[0])
+        raise HttpError(405, f"Method {method} not allowed on {request.path}")
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    length = parse_int(headers.get("content-length", 0), "Content-Length")
+    if length < 0:
+        raise HttpError(400, f"Invalid Content-Length: {length}")
+    if length > MAX_BODY_SIZE:
+        raise HttpError(413, "Request body is too large")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method, target, headers, body)
+
+
+class PhonebookServer:
+    def __init__(self, service: ContactService, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        self.service = service
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        await self.service.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        await self.service.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    writer.write(Response(e.status, {"error": e.message}).encode(keep_alive=False))
+                    break
+                if request is None:
+                    break
+                response = await self.service.handle(request)
+                writer.write(response.encode(request.keep_alive))
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def load_store(file_handler: FileHandler) -> ContactStore:
+    contacts = file_handler.read_contacts()
+    store = contacts if isinstance(contacts, ContactStore) else ContactStore(contacts)
+    if store.eager_index:
+        store.build_index()
+    return store
+
+
+async def serve(file_handler: FileHandler, host: str = SERVER_HOST, port: int = SERVER_PORT):
+    server = PhonebookServer(ContactService(load_store(file_handler), file_handler), host, port)
+    await server.start()
+    print(text.server_started.format(host=server.host, port=server.port))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        server.service.store.close()
+        if hasattr(file_handler, "close"):
+            file_handler.close()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Phone book HTTP/JSON API")
+    parser.add_argument("--storage", choices=sorted(FILE_HANDLERS), default=STORAGE)
+    parser.add_argument("--path", help="phonebook file (default depends on --storage)")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        asyncio.run(serve(make_file_handler(args.storage, args.path), args.host, args.port))
+    except KeyboardInterrupt:
+        print(text.server_stopped)
+
+
+if __name__ == "__main__":
+    main()
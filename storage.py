@@ -0,0 +1,808 @@
+import json
+import os
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+from config import (JOURNAL_MAX_BYTES, PATH, SHARD_LOAD_WORKERS, SHARD_MAX_CONTACTS, SHARDS_PATH, SQLITE_PATH,
+                    STORAGE)
+from model import (CODECS, READ_CHUNK_SIZE, TEMP_SUFFIX, Changeset, Contact, ContactStore, FileHandler,
+                   file_checksum, merge_changes, read_checksum, sync_directory, write_synced)
+from search import NGRAM_SIZE, FuzzyIndex, contact_matches, is_phone_query, normalize_phone
+import text_en as text
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on this platform; shared mode still detects and merges changes.
+    fcntl = None
+
+if TYPE_CHECKING:
+    import sqlite3
+
+JOURNAL_SUFFIX = ".journal"
+LOCK_SUFFIX = ".lock"
+MANIFEST_NAME = "manifest.json"
+# Upper bound of the last shard's id range.
+SHARD_END = 2 ** 63
+
+
+def dump_record(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+class JournalFileHandler(FileHandler):
+    appends_new_contacts = True
+
+    def __init__(self, filename: str = PATH, max_journal_bytes: int = JOURNAL_MAX_BYTES):
+        super().__init__(filename)
+        self.journal_filename = filename + JOURNAL_SUFFIX
+        self.max_journal_bytes = max_journal_bytes
+
+    def read_contacts(self) -> list[Contact]:
+        contacts = {contact.id: contact for contact in super().read_contacts()}
+        last_id = max(contacts, default=0)
+        snapshot, checked = None, False
+        for record in self.read_journal():
+            if record["op"] == "add":
+                if "snapshot" in record:
+                    if not checked:
+                        snapshot, checked = self.snapshot_checksum(), True
+                    # Added to an older snapshot: compaction stopped before clearing the journal,
+                    # and the contact is already in the current one. Without a snapshot (set aside
+                    # as damaged) the adds go onto whatever copy was read.
+                    if snapshot is not None and record["snapshot"] != snapshot:
+                        continue
+                # Appended without the book loaded, so the id is given here.
+                last_id += 1
+                record["id"] = last_id
+            last_id = max(last_id, record["id"])
+            if record["op"] == "del":
+                contacts.pop(record["id"], None)
+            else:
+                contacts[record["id"]] = Contact.from_dict(record)
+        return list(contacts.values())
+
+    def read_journal(self) -> Iterator[dict]:
+        try:
+            with open(self.journal_filename, 'r') as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn tail of an interrupted append: nothing after it was acknowledged.
+                        return
+        except FileNotFoundError:
+            return
+
+    def snapshot_checksum(self) -> Optional[str]:
+        if not os.path.exists(self.filename):
+            return None
+        # Renaming a snapshot moves its checksum after it, so a crash in between leaves none.
+        return read_checksum(self.filename) or file_checksum(self.filename)
+
+    def journal_size(self) -> int:
+        try:
+            return os.path.getsize(self.journal_filename)
+        except OSError:
+            return 0
+
+    def write_changes(self, contacts, changes: Changeset) -> Optional[int]:
+        if not os.path.exists(self.filename) or self.journal_size() >= self.max_journal_bytes:
+            return super().write_changes(contacts, changes)
+        return self.append_changes(contacts, changes)
+
+    def write_contacts(self, contacts) -> bool:
+        return self.compact(contacts)
+
+    def append_changes(self, contacts, changes: Changeset) -> Optional[int]:
+        records = [{"op": "del", "id": contact_id} for contact_id in sorted(changes.deleted)]
+        for contact_id in sorted(changes.dirty):
+            contact = contacts.get(contact_id)
+            # A changeset kept from a failed save can name a contact deleted since.
+            if contact is not None:
+                records.append({"op": "put", **contact.to_dict()})
+        return self.append_records(records)
+
+    def append_new_contacts(self, contacts: list[tuple[str, str, str]]) -> Optional[int]:
+        # Ids are given on replay, so each record names the snapshot it adds to instead.
+        snapshot = read_checksum(self.filename) if self.checksums and contacts else None
+        key = {"snapshot": snapshot} if snapshot else {}
+        records = [{"op": "add", **key, "name": name, "phone": phone, "comment": comment}
+                   for name, phone, comment in contacts]
+        return self.append_records(records)
+
+    def trim_torn_tail(self):
+        # Replay stops at a half-written record, so anything appended after one would be lost:
+        # the journal is cut back to its last complete line first.
+        try:
+            with open(self.journal_filename, 'r+b') as file:
+                size = end = file.seek(0, os.SEEK_END)
+                while end > 0:
+                    start = max(0, end - READ_CHUNK_SIZE)
+                    file.seek(start)
+                    newline = file.read(end - start).rfind(b"\n")
+                    if newline >= 0:
+                        end = start + newline + 1
+                        break
+                    end = start
+                if end < size:
+                    file.truncate(end)
+        except FileNotFoundError:
+            return
+
+    def append_records(self, records: list[dict]) -> Optional[int]:
+        if not records:
+            return 0
+        try:
+            self.trim_torn_tail()
+            with open(self.journal_filename, 'a') as file:
+                file.write("".join(dump_record(record) for record in records))
+                file.flush()
+                os.fsync(file.fileno())
+            return len(records)
+        except Exception as e:
+            print(f"{text.save_error}{e}")
+            return None
+
+    def compact(self, contacts) -> bool:
+        if not super().write_contacts(contacts):
+            return False
+        try:
+            open(self.journal_filename, 'w').close()
+            return True
+        except Exception as e:
+            print(f"{text.save_error}{e}")
+            return False
+
+
+@contextmanager
+def file_lock(filename: str, exclusive: bool):
+    if fcntl is None:
+        yield
+        return
+    with open(filename, 'a') as file:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def file_stamp(filename: str) -> Optional[tuple[int, int, int]]:
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class SharedFileHandler(FileHandler):
+    def __init__(self, filename: str = PATH):
+        super().__init__(filename)
+        self.lock_filename = filename + LOCK_SUFFIX
+        self._stamp: Optional[tuple[int, int, int]] = None
+        self._digest: Optional[str] = None
+        self._stale = False
+
+    def _remember_file(self):
+        self._stamp = file_stamp(self.filename)
+        # The checksum saved next to the snapshot stands for its bytes, so nothing is read here
+        # unless checksums are off.
+        self._digest = read_checksum(self.filename) if self.checksums else None
+        if self._digest is None and self._stamp is not None:
+            self._digest = file_checksum(self.filename)
+        self._stale = False
+
+    def changed_on_disk(self) -> bool:
+        if self._stale:
+            return True
+        stamp = file_stamp(self.filename)
+        if stamp == self._stamp:
+            return False
+        # A new stamp over the same bytes (touched, or rewritten unchanged) needs no reload.
+        if stamp is not None and file_checksum(self.filename) == self._digest:
+            self._stamp = stamp
+            return False
+        return True
+
+    def read_contacts(self):
+        with file_lock(self.lock_filename, exclusive=False):
+            contacts = super().read_contacts()
+            self._remember_file()
+        return contacts
+
+    def write_changes(self, contacts, changes: Changeset) -> Optional[int]:
+        with file_lock(self.lock_filename, exclusive=True):
+            merged = self.changed_on_disk()
+            if merged:
+                theirs = super().read_contacts()
+                contacts, _ = merge_changes(theirs, contacts, changes)
+                if hasattr(theirs, "close"):
+                    theirs.close()
+            if not super().write_contacts(contacts):
+                return None
+            self._remember_file()
+            # The caller's copy lacks the other writer's changes until it reloads.
+            self._stale = merged
+        return len(contacts)
+
+    def write_contacts(self, contacts) -> bool:
+        with file_lock(self.lock_filename, exclusive=True):
+            if not super().write_contacts(contacts):
+                return False
+            self._remember_file()
+        return True
+
+
+class Shard:
+    def __init__(self, start: int, file: Optional[str] = None, count: int = 0):
+        self.start = start
+        # None for a shard without contacts, which has no file.
+        self.file = file
+        self.count = count
+
+    def to_dict(self) -> dict:
+        return {"start": self.start, "file": self.file, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Shard':
+        return cls(data["start"], data["file"], data["count"])
+
+
+class ShardLayout:
+    # Shards cover consecutive id ranges: each from its start up to the next shard's start.
+    def __init__(self, shards: list[Shard]):
+        self.shards = shards
+        self.starts = [shard.start for shard in shards]
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def find(self, contact_id: int) -> int:
+        return bisect_right(self.starts, contact_id) - 1
+
+    def bounds(self, index: int) -> tuple[int, int]:
+        end = self.starts[index + 1] if index + 1 < len(self.starts) else SHARD_END
+        return self.starts[index], end
+
+
+class ShardRange:
+    def __init__(self, start: int, end: int, contacts: Iterable[Contact]):
+        self.start = start
+        self.end = end
+        self.contacts = {contact.id: contact for contact in contacts}
+        self.ordered = True
+
+    def add(self, contact: Contact):
+        if self.contacts and contact.id < next(reversed(self.contacts)):
+            self.ordered = False
+        self.contacts[contact.id] = contact
+
+    def values(self) -> Iterable[Contact]:
+        if not self.ordered:
+            self.contacts = dict(sorted(self.contacts.items()))
+            self.ordered = True
+        return self.contacts.values()
+
+
+class ShardedContacts:
+    # Mapping over a shard directory: a shard is read the first time one of its ids is used,
+    # after which the loaded range in memory is the current copy.
+    def __init__(self, handler: 'ShardedFileHandler'):
+        self.handler = handler
+        self._ranges: list[ShardRange] = []
+        self._starts: list[int] = []
+        self._count = sum(shard.count for shard in handler.layout.shards)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, contact_id: int) -> bool:
+        return self.get(contact_id) is not None
+
+    def __getitem__(self, contact_id: int) -> Contact:
+        contact = self.get(contact_id)
+        if contact is None:
+            raise KeyError(contact_id)
+        return contact
+
+    def __setitem__(self, contact_id: int, contact: Contact):
+        shard_range = self._range_for(contact_id)
+        if contact_id in shard_range.contacts:
+            raise ValueError(f"Contact with id {contact_id} already exists")
+        shard_range.add(contact)
+        self._count += 1
+
+    def get(self, contact_id: int, default=None):
+        return self._range_for(contact_id).contacts.get(contact_id, default)
+
+    def pop(self, contact_id: int, default=None):
+        contact = self._range_for(contact_id).contacts.pop(contact_id, None)
+        if contact is None:
+            return default
+        self._count -= 1
+        return contact
+
+    def values(self) -> Iterator[Contact]:
+        # Shards are read one by one as iteration reaches them, so a first page reads one shard.
+        layout = self.handler.layout
+        index = 0
+        while index < len(layout):
+            shard_range = self._loaded_range(layout.starts[index]) or self._load(layout, index)
+            yield from shard_range.values()
+            index = layout.find(shard_range.end - 1) + 1
+
+    def contacts_between(self, start: int, end: int) -> list[Contact]:
+        shard_range = self._range_for(start)
+        return [contact for contact in shard_range.values() if start <= contact.id < end]
+
+    def load_all(self):
+        layout = self.handler.layout
+        missing = [index for index in range(len(layout)) if self._loaded_range(layout.starts[index]) is None]
+        if len(missing) < 2:
+            for index in missing:
+                self._load(layout, index)
+            return
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=self.handler.workers) as pool:
+            loaded = pool.map(lambda index: self.handler.read_shard(layout.shards[index]), missing)
+            for index, contacts in zip(missing, loaded):
+                self._add_range(*layout.bounds(index), contacts)
+
+    def copy(self) -> 'ShardedContacts':
+        copy = ShardedContacts(self.handler)
+        for shard_range in self._ranges:
+            copy._add_range(shard_range.start, shard_range.end,
+                            (Contact(c.id, c.name, c.phone, c.comment) for c in shard_range.values()))
+        copy._count = self._count
+        return copy
+
+    def _loaded_range(self, contact_id: int) -> Optional[ShardRange]:
+        position = bisect_right(self._starts, contact_id) - 1
+        if position >= 0 and contact_id < self._ranges[position].end:
+            return self._ranges[position]
+        return None
+
+    def _range_for(self, contact_id: int) -> ShardRange:
+        shard_range = self._loaded_range(contact_id)
+        if shard_range is None:
+            layout = self.handler.layout
+            shard_range = self._load(layout, layout.find(contact_id))
+        return shard_range
+
+    def _load(self, layout: ShardLayout, index: int) -> ShardRange:
+        return self._add_range(*layout.bounds(index), self.handler.read_shard(layout.shards[index]))
+
+    def _add_range(self, start: int, end: int, contacts: Iterable[Contact]) -> ShardRange:
+        position = bisect_right(self._starts, start)
+        shard_range = ShardRange(start, end, contacts)
+        self._starts.insert(position, start)
+        self._ranges.insert(position, shard_range)
+        return shard_range
+
+
+class ShardedContactStore(ContactStore):
+    # Opening reads only the manifest; whole-book work (search indexes) reads the shards in parallel.
+    eager_index = False
+
+    def __init__(self, handler: 'ShardedFileHandler'):
+        super().__init__()
+        self.handler = handler
+        self._contacts = ShardedContacts(handler)
+        self._last_id = handler.last_id
+
+    def load_all(self):
+        self._contacts.load_all()
+
+    def build_index(self):
+        self.load_all()
+        super().build_index()
+
+    def snapshot(self) -> 'ShardedContactStore':
+        # Shards that were never read cannot have changes, so the copy leaves them on disk.
+        store = ShardedContactStore(self.handler)
+        store._contacts = self._contacts.copy()
+        store._last_id = self._last_id
+        return store
+
+
+class ShardedFileHandler(FileHandler):
+    def __init__(self, filename: str = SHARDS_PATH, max_shard_contacts: int = SHARD_MAX_CONTACTS,
+                 workers: int = SHARD_LOAD_WORKERS):
+        super().__init__(filename)
+        self.manifest_filename = os.path.join(filename, MANIFEST_NAME)
+        self.max_shard_contacts = max_shard_contacts
+        self.workers = workers
+        self.layout = ShardLayout([Shard(0)])
+        self.generation = 0
+        self.last_id = 0
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_filename, 'r') as file:
+                manifest = json.load(file)
+            self.layout = ShardLayout([Shard.from_dict(shard) for shard in manifest["shards"]])
+            self.generation = manifest["generation"]
+            self.last_id = manifest["last_id"]
+            self.snapshot_format = manifest["format"]
+        except FileNotFoundError:
+            return
+        except (ValueError, KeyError) as e:
+            print(f"{text.load_error}{e}")
+
+    def read_contacts(self) -> ShardedContactStore:
+        self.read_manifest()
+        return ShardedContactStore(self)
+
+    def read_shard(self, shard: Shard) -> list[Contact]:
+        if shard.file is None:
+            return []
+        return list(self.shard_handler(shard.file).iter_contacts())
+
+    def shard_handler(self, name: str) -> FileHandler:
+        # Shard files are never rewritten in place: a save writes new ones and switches the manifest,
+        # which is the only file that needs the atomic rename.
+        return FileHandler(os.path.join(self.filename, name), self.snapshot_format, keep=0, checksums=False)
+
+    def iter_contacts(self) -> Iterator[Contact]:
+        self.read_manifest()
+        for shard in self.layout.shards:
+            yield from self.read_shard(shard)
+
+    def write_changes(self, contacts, changes: Changeset) -> Optional[int]:
+        if getattr(contacts, "handler", None) is not self:
+            return len(contacts) if self.write_contacts(contacts) else None
+        layout = self.layout
+        dirty = {layout.find(contact_id) for contact_id in changes.added | changes.updated | changes.deleted}
+        if not dirty:
+            return 0
+        plan = []
+        for index, shard in enumerate(layout.shards):
+            if index in dirty:
+                start, end = layout.bounds(index)
+                plan += self.split(start, contacts._contacts.contacts_between(start, end))
+            else:
+                plan.append(shard)
+        return self.commit(plan, contacts.next_id() - 1)
+
+    def write_contacts(self, contacts) -> bool:
+        self.read_manifest()
+        contacts = sorted(contacts, key=lambda contact: contact.id)
+        return self.commit(self.split(0, contacts), contacts[-1].id if contacts else 0) is not None
+
+    def split(self, start: int, contacts: list[Contact]) -> list[tuple[int, list[Contact]]]:
+        # A shard past the limit is cut into pieces half the limit in size, so each has room to grow.
+        if len(contacts) <= self.max_shard_contacts:
+            return [(start, contacts)]
+        size = max(1, self.max_shard_contacts // 2)
+        pieces = [contacts[i:i + size] for i in range(0, len(contacts), size)]
+        return [(start if i == 0 else piece[0].id, piece) for i, piece in enumerate(pieces)]
+
+    def commit(self, plan: list, last_id: int) -> Optional[int]:
+        # Rewritten shards get new file names and the manifest switches to them in one rename,
+        # so an interrupted save leaves the previous manifest and its files intact.
+        generation = self.generation + 1
+        extension = CODECS[self.snapshot_format].extension
+        shards: list[Shard] = []
+        created: list[str] = []
+        written = 0
+        try:
+            os.makedirs(self.filename, exist_ok=True)
+        except OSError as e:
+            print(f"{text.save_error}{e}")
+            return None
+        for item in plan:
+            if isinstance(item, Shard):
+                shards.append(item)
+                continue
+            start, contacts = item
+            shard = Shard(start, count=len(contacts))
+            if contacts:
+                # Empty shards keep their id range but need no file.
+                shard.file = f"{start}-{generation}{extension}"
+                created.append(shard.file)
+                handler = self.shard_handler(shard.file)
+                if not handler.write_contacts(contacts):
+                    self.remove_files(created)
+                    return None
+            shards.append(shard)
+            written += len(contacts)
+
+        temp_filename = self.manifest_filename + TEMP_SUFFIX
+        manifest = {"generation": generation, "last_id": last_id, "format": self.snapshot_format,
+                    "shards": [shard.to_dict() for shard in shards]}
+        try:
+            write_synced(temp_filename, json.dumps(manifest, indent=2).encode())
+            os.replace(temp_filename, self.manifest_filename)
+            sync_directory(self.manifest_filename)
+        except Exception as e:
+            self.remove_files(created + [MANIFEST_NAME + TEMP_SUFFIX])
+            print(f"{text.save_error}{e}")
+            return None
+
+        kept = {shard.file for shard in shards}
+        self.remove_files([shard.file for shard in self.layout.shards if shard.file and shard.file not in kept])
+        self.layout = ShardLayout(shards)
+        self.generation = generation
+        self.last_id = last_id
+        return written
+
+    def remove_files(self, names: list[str]):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.filename, name))
+            except OSError:
+                pass
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    comment TEXT NOT NULL DEFAULT '',
+    phone_key TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS contacts_phone_key ON contacts(phone_key);
+CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+    name, phone, comment, content='contacts', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS contacts_ai AFTER INSERT ON contacts BEGIN
+    INSERT INTO contacts_fts(rowid, name, phone, comment)
+    VALUES (new.id, new.name, new.phone, new.comment);
+END;
+CREATE TRIGGER IF NOT EXISTS contacts_ad AFTER DELETE ON contacts BEGIN
+    INSERT INTO contacts_fts(contacts_fts, rowid, name, phone, comment)
+    VALUES ('delete', old.id, old.name, old.phone, old.comment);
+END;
+CREATE TRIGGER IF NOT EXISTS contacts_au AFTER UPDATE ON contacts BEGIN
+    INSERT INTO contacts_fts(contacts_fts, rowid, name, phone, comment)
+    VALUES ('delete', old.id, old.name, old.phone, old.comment);
+    INSERT INTO contacts_fts(rowid, name, phone, comment)
+    VALUES (new.id, new.name, new.phone, new.comment);
+END;
+"""
+SQLITE_COLUMNS = "id, name, phone, comment"
+SQLITE_INSERT = "INSERT INTO contacts (id, name, phone, comment, phone_key) VALUES (?, ?, ?, ?, ?)"
+SQLITE_BATCH_SIZE = 10_000
+
+
+def sqlite_row(contact: Contact) -> tuple:
+    return contact.id, contact.name, contact.phone, contact.comment, contact.phone_key
+
+
+class SqliteContactStore(ContactStore):
+    def __init__(self, connection: "sqlite3.Connection", lock: threading.RLock):
+        self.connection = connection
+        self.lock = lock
+        self._fuzzy_index: Optional[FuzzyIndex] = None
+        # Queries go to SQLite, which keeps its own page cache.
+        self.query_cache = None
+        self.changes = Changeset()
+        row = connection.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'contacts'").fetchone()
+        self._last_id = row[0] if row else 0
+
+    def __iter__(self) -> Iterator[Contact]:
+        rows = self.connection.execute(f"SELECT {SQLITE_COLUMNS} FROM contacts ORDER BY id")
+        return (Contact(*row) for row in rows)
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT count(*) FROM contacts").fetchone()[0]
+
+    def __contains__(self, contact_id: int) -> bool:
+        return self.get(contact_id) is not None
+
+    def page(self, number: int, size: int) -> list[Contact]:
+        rows = self.connection.execute(
+            f"SELECT {SQLITE_COLUMNS} FROM contacts ORDER BY id LIMIT ? OFFSET ?",
+            (size, (number - 1) * size))
+        return [Contact(*row) for row in rows]
+
+    def get(self, contact_id: int) -> Optional[Contact]:
+        row = self.connection.execute(
+            f"SELECT {SQLITE_COLUMNS} FROM contacts WHERE id = ?", (contact_id,)).fetchone()
+        return Contact(*row) if row else None
+
+    def insert(self, contact: Contact) -> Contact:
+        try:
+            with self.lock:
+                self.connection.execute(SQLITE_INSERT, sqlite_row(contact))
+        except self.connection.IntegrityError:
+            raise ValueError(f"Contact with id {contact.id} already exists")
+        self._last_id = max(self._last_id, contact.id)
+        if self._fuzzy_index is not None:
+            self._fuzzy_index.add(contact)
+        self.changes.record_insert(contact.id)
+        return contact
+
+    def insert_many(self, contacts: Iterable[Contact]) -> int:
+        rows = []
+        for contact in contacts:
+            rows.append(sqlite_row(contact))
+            self._last_id = max(self._last_id, contact.id)
+            self.changes.record_insert(contact.id)
+        self._fuzzy_index = None
+        try:
+            with self.lock:
+                self.connection.executemany(SQLITE_INSERT, rows)
+        except self.connection.IntegrityError as e:
+            raise ValueError(str(e))
+        return len(rows)
+
+    def update(self, contact_id: int, **fields) -> Optional[Contact]:
+        contact = self.get(contact_id)
+        if contact is None:
+            return None
+        if self._fuzzy_index is not None:
+            self._fuzzy_index.remove(contact)
+        for field, value in fields.items():
+            setattr(contact, field, value)
+        if self._fuzzy_index is not None:
+            self._fuzzy_index.add(contact)
+        with self.lock:
+            self.connection.execute(
+                "UPDATE contacts SET name = ?, phone = ?, comment = ?, phone_key = ? WHERE id = ?",
+                (contact.name, contact.phone, contact.comment, contact.phone_key, contact_id))
+        self.changes.record_update(contact_id)
+        return contact
+
+    def delete(self, contact_id: int) -> Optional[Contact]:
+        contact = self.get(contact_id)
+        if contact is None:
+            return None
+        with self.lock:
+            self.connection.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
+        if self._fuzzy_index is not None:
+            self._fuzzy_index.remove(contact)
+        self.changes.record_delete(contact_id)
+        return contact
+
+    def build_index(self):
+        pass
+
+    def fuzzy_search(self, term: str, max_distance: Optional[int] = None) -> list[Contact]:
+        if self._fuzzy_index is None:
+            self._fuzzy_index = FuzzyIndex(self)
+        scores = self._fuzzy_index.matches(term, max_distance)
+        ranked = sorted(scores, key=lambda contact_id: (scores[contact_id], contact_id))
+        return [self.get(contact_id) for contact_id in ranked]
+
+    def close(self):
+        pass
+
+    def snapshot(self) -> 'SqliteContactStore':
+        # Uncommitted rows already live in the connection; saving only commits them.
+        return self
+
+    def search(self, term: str) -> list[Contact]:
+        term = term.lower()
+        if len(term) < NGRAM_SIZE:
+            candidates = iter(self)
+        else:
+            rows = self.connection.execute(
+                f"SELECT {SQLITE_COLUMNS} FROM contacts WHERE id IN "
+                "(SELECT rowid FROM contacts_fts WHERE contacts_fts MATCH ?) ORDER BY id",
+                ('"' + term.replace('"', '""') + '"',))
+            candidates = (Contact(*row) for row in rows)
+        found = [contact for contact in candidates if contact_matches(contact, term)]
+        if is_phone_query(term):
+            seen = {contact.id for contact in found}
+            extra = [contact for contact in self.find_by_phone(term, prefix=True) if contact.id not in seen]
+            if extra:
+                found = sorted(found + extra, key=lambda contact: contact.id)
+        return found
+
+    def find_by_phone(self, phone: str, prefix: bool = False) -> list[Contact]:
+        key = normalize_phone(phone)
+        if not key:
+            return []
+        if prefix:
+            where, params = "phone_key >= ? AND phone_key < ?", (key, key + ":")
+        else:
+            where, params = "phone_key = ?", (key,)
+        rows = self.connection.execute(
+            f"SELECT {SQLITE_COLUMNS} FROM contacts WHERE {where} ORDER BY id", params)
+        return [Contact(*row) for row in rows]
+
+
+class SqliteFileHandler(FileHandler):
+    def __init__(self, filename: str = SQLITE_PATH):
+        import sqlite3
+
+        super().__init__(filename)
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.executescript(SQLITE_SCHEMA)
+        self.lock = threading.RLock()
+
+    def read_contacts(self) -> SqliteContactStore:
+        with self.lock:
+            self.connection.rollback()
+        return SqliteContactStore(self.connection, self.lock)
+
+    def iter_contacts(self) -> Iterator[Contact]:
+        return iter(SqliteContactStore(self.connection, self.lock))
+
+    def write_changes(self, contacts, changes: Changeset) -> Optional[int]:
+        if getattr(contacts, "connection", None) is not self.connection:
+            return super().write_changes(contacts, changes)
+        try:
+            with self.lock:
+                self.connection.commit()
+            return len(changes)
+        except Exception as e:
+            print(f"{text.save_error}{e}")
+            return None
+
+    def write_contacts(self, contacts) -> bool:
+        try:
+            with self.lock:
+                if getattr(contacts, "connection", None) is not self.connection:
+                    self.connection.execute("DELETE FROM contacts")
+                    self.insert_many(contacts)
+                self.connection.commit()
+            return True
+        except Exception as e:
+            with self.lock:
+                self.connection.rollback()
+            print(f"{text.save_error}{e}")
+            return False
+
+    def insert_many(self, contacts: Iterable[Contact], batch_size: int = SQLITE_BATCH_SIZE) -> int:
+        count = 0
+        contacts = iter(contacts)
+        while batch := list(islice(contacts, batch_size)):
+            self.connection.executemany(SQLITE_INSERT, [sqlite_row(contact) for contact in batch])
+            count += len(batch)
+        return count
+
+    def close(self):
+        self.connection.close()
+
+
+def migrate_json_to_sqlite(json_path: str = PATH, sqlite_path: str = SQLITE_PATH,
+                           replace: bool = False) -> Optional[int]:
+    handler = None
+    try:
+        handler = SqliteFileHandler(sqlite_path)
+        existing = handler.connection.execute("SELECT count(*) FROM contacts").fetchone()[0]
+        if existing and not replace:
+            # Ids would collide with the contacts already there.
+            print(text.migrate_not_empty.format(path=sqlite_path, count=existing))
+            return None
+        handler.connection.execute("DELETE FROM contacts")
+        count = handler.insert_many(FileHandler(json_path).iter_contacts())
+        handler.connection.commit()
+        return count
+    except Exception as e:
+        # A missing or unreadable source, or one that repeats an id: nothing is written.
+        if handler is not None:
+            handler.connection.rollback()
+        print(f"{text.migrate_error}{e}")
+        return None
+    finally:
+        if handler is not None:
+            handler.close()
+
+
+FILE_HANDLERS = {
+    "json": FileHandler,
+    "journal": JournalFileHandler,
+    "shared": SharedFileHandler,
+    "sharded": ShardedFileHandler,
+    "sqlite": SqliteFileHandler,
+}
+DEFAULT_PATHS = {
+    "sharded": SHARDS_PATH,
+    "sqlite": SQLITE_PATH,
+}
+
+
+def make_file_handler(kind: str = STORAGE, filename: Optional[str] = None) -> FileHandler:
+    if kind not in FILE_HANDLERS:
+        raise ValueError(f"Unknown storage: {kind}")
+    return FILE_HANDLERS[kind](filename or DEFAULT_PATHS.get(kind, PATH))
@@ -0,0 +1,92 @@
+import io
+import json
+from unittest import mock
+
+from batch import parse_command, run_batch, run_commands
+from model import Contact, ContactStore, FileHandler
+
+"""
+Common args for test fuctions:
+    tmp_path: pytest fixture providing temporary directory
+    test_first_contact: Fixture providing test Contact instance
+    test_second_contact: Fixture providing second test Contact instance
+"""
+
+
+def results(output: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_parse_tsv_and_ndjson() -> None:
+    """Test that tab-separated and JSON commands parse to the same fields."""
+    assert parse_command("edit\t2\t\t+7 999") == {"op": "edit", "id": "2", "name": "", "phone": "+7 999"}
+    assert parse_command('{"op": "edit", "id": 2, "phone": "+7 999"}') == {"op": "edit", "id": 2,
+                                                                          "phone": "+7 999"}
+
+
+def test_run_commands(test_first_contact: Contact,
+                      test_second_contact: Contact) -> None:
+    """Test that every command is applied and answered with its line number."""
+    store = ContactStore([test_first_contact, test_second_contact])
+    lines = [
+        "create\tIvan Petrov\t+7 900 111\tNew",
+        '{"op": "update", "id": 2, "comment": "Updated"}',
+        "",
+        "# comment lines are skipped",
+        "delete\t1",
+        "find\tivan",
+    ]
+    output = io.StringIO()
+
+    result = run_commands(store, lines, output)
+
+    assert (result.processed, result.rejected) == (4, 0)
+    responses = results(output)
+    assert [(r["line"], r["status"]) for r in responses] == [(1, 201), (2, 200), (5, 204), (6, 200)]
+    assert responses[0]["contact"] == {"id": 3, "name": "Ivan Petrov", "phone": "+7 900 111", "comment": "New"}
+    assert store.get(2).comment == "Updated"
+    assert 1 not in store
+    assert [contact["id"] for contact in responses[3]["contacts"]] == [3]
+
+
+def test_run_commands_rejects_invalid(test_first_contact: Contact) -> None:
+    """Test that invalid commands get an error and do not stop the batch."""
+    store = ContactStore([test_first_contact])
+    lines = ["rename\t1", "create\tNo Phone", "edit\tabc", "delete\t9", "{broken", "[1]",
+             '{"op": "delete", "id": 1e400}', '{"op": ["delete"], "id": 1}', "edit\t1\tRenamed"]
+    output = io.StringIO()
+
+    result = run_commands(store, lines, output)
+
+    assert (result.processed, result.rejected) == (1, 8)
+    assert [r["status"] for r in results(output)] == [400, 400, 400, 404, 400, 400, 400, 400, 200]
+    assert store.get(1).name == "Renamed"
+
+
+def test_run_batch_saves_once(tmp_path,
+                              test_first_contact: Contact,
+                              test_second_contact: Contact) -> None:
+    """Test that a batch reads the book once and saves all changes together."""
+    handler = FileHandler(str(tmp_path / "phonebook.json"))
+    handler.write_contacts([test_first_contact, test_second_contact])
+    lines = io.StringIO("create\tIvan Petrov\t+7 900 111\ndelete\t1\nfind\tmasha\n")
+
+    with mock.patch.object(handler, "write_changes", wraps=handler.write_changes) as write_changes:
+        result, written = run_batch(handler, lines, io.StringIO())
+
+    write_changes.assert_called_once()
+    assert result.processed == 3
+    assert written
+    assert [contact.id for contact in handler.read_contacts()] == [2, 3]
+
+
+def test_run_batch_without_changes_does_not_save(tmp_path, test_first_contact: Contact) -> None:
+    """Test that a batch of searches leaves the file alone."""
+    handler = FileHandler(str(tmp_path / "phonebook.json"))
+    handler.write_contacts([test_first_contact])
+
+    with mock.patch.object(handler, "write_changes") as write_changes:
+        result, written = run_batch(handler, ["find\toleg"], io.StringIO())
+
+    write_changes.assert_not_called()
+    assert written == 0
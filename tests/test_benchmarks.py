@@ -0,0 +1,54 @@
+import pytest
+
+from benchmarks.generator import generate_contacts
+from benchmarks.suite import compare, run
+from search import normalize_phone
+
+"""
+Common args for test fuctions:
+    results: Benchmark results as written by the suite
+"""
+
+
+def test_generator_is_deterministic() -> None:
+    """Test that the same seed gives the same phonebook and another seed does not."""
+    first = [c.to_dict() for c in generate_contacts(200, seed=1)]
+
+    assert first == [c.to_dict() for c in generate_contacts(200, seed=1)]
+    assert first != [c.to_dict() for c in generate_contacts(200, seed=2)]
+
+
+def test_generator_variety() -> None:
+    """Test that phones come in several formats and comments are sometimes empty."""
+    contacts = generate_contacts(2000)
+
+    assert [c.id for c in contacts] == list(range(1, 2001))
+    assert len({c.phone[:2] for c in contacts}) >= 4
+    assert all(normalize_phone(c.phone) for c in contacts)
+    assert any(not c.comment for c in contacts) and any(c.comment for c in contacts)
+    assert any(c.name.endswith("a") for c in contacts)
+
+
+@pytest.fixture(scope="module")
+def results() -> dict:
+    """Run the whole suite once on a tiny phonebook."""
+    return run([50], repeat=1, snapshot_format="json", seed=42)
+
+
+def test_suite_results(results: dict) -> None:
+    """Test that every benchmark reports a timing."""
+    names = {name.split("/")[0] for name in results["results"]}
+
+    assert {"load", "save", "create", "edit_by_id", "delete_by_id", "search_1", "search_8"} <= names
+    assert all(result["seconds"] > 0 for result in results["results"].values())
+
+
+def test_compare(results: dict) -> None:
+    """Test that only slowdowns beyond the threshold are reported."""
+    slower = {"results": {name: dict(result, seconds=result["seconds"] * 1.1)
+                          for name, result in results["results"].items()}}
+    slower["results"]["load/50"]["seconds"] = results["results"]["load/50"]["seconds"] * 2
+
+    assert compare(results, results, threshold=0.2) == []
+    regressions = compare(slower, results, threshold=0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("load/50")
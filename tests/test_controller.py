@@ -1,8 +1,10 @@
 import pytest
+import threading
 
 from typing import Any
-from controller import Phonebook
-from model import Contact
+from controller import BackgroundSaver, Phonebook
+from model import Changeset, Contact, ContactStore, FileHandler
+from storage import JournalFileHandler, SharedFileHandler
 
 import text_en as text
 
@@ -26,6 +28,9 @@ class TestPhonebook:
             Phonebook: Test instance with mocked dependencies
         """
         self.mock_file_handler = mocker.Mock()
+        self.mock_file_handler.read_contacts.return_value = []
+        self.mock_file_handler.changed_on_disk.return_value = False
+        self.mock_file_handler.appends_new_contacts = False
         self.mock_view = mocker.Mock()
         return Phonebook(self.mock_file_handler, self.mock_view)
 
@@ -39,28 +44,55 @@ class TestPhonebook:
         assert phonebook.contacts == [test_first_contact]
         self.mock_file_handler.read_contacts.assert_called_once()
 
-    def test_save_contacts_successful(self, phonebook: Phonebook) -> None:
+    def test_save_contacts_successful(self, phonebook: Phonebook,
+                                      test_first_contact: Contact) -> None:
         """Test successful contact saving operation."""
-        self.mock_file_handler.write_contacts.return_value = True
+        self.mock_file_handler.write_changes.return_value = 1
+        phonebook.contacts.insert(test_first_contact)
+        changes = phonebook.changes
         phonebook.modified = True
 
         phonebook.save_contacts()
 
         assert not phonebook.modified
-        self.mock_file_handler.write_contacts.assert_called_once_with(phonebook.contacts)
+        assert not phonebook.changes
+        self.mock_file_handler.write_changes.assert_called_once_with(phonebook.contacts, changes)
         self.mock_view.show_message.assert_called_once()
 
-    def test_save_contacts_failure(self, phonebook: Phonebook) -> None:
+    def test_save_contacts_stats(self, phonebook: Phonebook,
+                                 test_first_contact: Contact) -> None:
+        """Test that each save records how many records it wrote."""
+        self.mock_file_handler.write_changes.return_value = 1
+        phonebook.contacts.insert(test_first_contact)
+
+        phonebook.save_contacts()
+
+        assert phonebook.save_stats.saves == 1
+        assert phonebook.save_stats.last_written == 1
+        assert phonebook.save_stats.last_changes == 1
+
+    def test_save_contacts_failure(self, phonebook: Phonebook,
+                                   test_first_contact: Contact) -> None:
         """Test failed contact saving operation."""
-        self.mock_file_handler.write_contacts.return_value = False
+        self.mock_file_handler.write_changes.return_value = None
+        phonebook.contacts.insert(test_first_contact)
         phonebook.modified = True
 
         phonebook.save_contacts()
 
         assert phonebook.modified
-        self.mock_file_handler.write_contacts.assert_called_once_with(phonebook.contacts)
+        assert phonebook.changes.added == {test_first_contact.id}
+        self.mock_file_handler.write_changes.assert_called_once_with(phonebook.contacts, phonebook.changes)
         self.mock_view.show_message.assert_called_once()
 
+    def test_get_next_id_after_delete(self, phonebook: Phonebook,
+                                      test_first_contact: Contact,
+                                      test_second_contact: Contact) -> None:
+        """Test that ids of deleted contacts are not reused."""
+        phonebook.contacts = [test_first_contact, test_second_contact]
+        phonebook.contacts.delete(test_second_contact.id)
+        assert phonebook.get_next_id() == 3
+
     def test_get_next_id_empty_contacts(self, phonebook: Phonebook) -> None:
         """Test ID generation with empty contact list."""
         phonebook.contacts = []
@@ -96,7 +128,19 @@ class TestPhonebook:
 
         phonebook.find_contacts()
 
-        self.mock_view.show_contacts.assert_called_once()
+        self.mock_view.show_contacts.assert_called_once_with([test_first_contact])
+
+    def test_find_contacts_similar(self, phonebook: Phonebook,
+                                   test_first_contact: Contact,
+                                   test_second_contact: Contact) -> None:
+        """Test that a misspelled name falls back to similar contacts."""
+        phonebook.contacts = [test_first_contact, test_second_contact]
+        self.mock_view.get_search_term.return_value = "Mascha"
+
+        phonebook.find_contacts()
+
+        self.mock_view.show_message.assert_called_once_with(text.contact_similar_found)
+        self.mock_view.show_contacts.assert_called_once_with([test_second_contact])
 
     def test_edit_contact_successful(self, phonebook: Phonebook,
                                      test_second_contact: Contact,
@@ -152,6 +196,68 @@ class TestPhonebook:
         self.mock_view.show_message.assert_called_with(
             any_string_containing(text.contact_found_error))
 
+    def test_show_all_contacts_pages(self, phonebook: Phonebook) -> None:
+        """Test paging through the book one page at a time."""
+        phonebook.contacts = [Contact(i, f"Name {i}", "1") for i in range(1, 6)]
+        self.mock_view.get_page_command.side_effect = [text.page_next, "3", text.page_previous, ""]
+
+        phonebook.show_all_contacts(page_size=2)
+
+        shown = [(c.args[1], [contact.id for contact in c.args[0]])
+                 for c in self.mock_view.show_contacts_page.call_args_list]
+        assert shown == [(1, [1, 2]), (2, [3, 4]), (3, [5]), (2, [3, 4])]
+        assert all(c.args[2] == 3 for c in self.mock_view.show_contacts_page.call_args_list)
+
+    def test_show_all_contacts_empty(self, phonebook: Phonebook) -> None:
+        """Test listing an empty book."""
+        phonebook.show_all_contacts()
+
+        self.mock_view.show_contacts.assert_called_once_with([])
+        self.mock_view.get_page_command.assert_not_called()
+
+    def test_import_and_export_contacts(self, phonebook: Phonebook, tmp_path,
+                                        test_first_contact: Contact) -> None:
+        """Test bulk import and export through the controller."""
+        path = str(tmp_path / "contacts.csv")
+        phonebook.contacts = [test_first_contact]
+        phonebook.export_contacts(path)
+        phonebook.import_contacts(path)
+
+        assert phonebook.modified
+        assert [contact.id for contact in phonebook.contacts] == [1, 2]
+        assert self.mock_view.show_message.call_count == 2
+
+    @pytest.mark.parametrize("confirm", [True, False])
+    def test_dedup_contacts(self, phonebook: Phonebook, confirm: bool,
+                            test_first_contact: Contact,
+                            test_second_contact: Contact) -> None:
+        """Test that duplicate groups are shown and merged only when confirmed."""
+        duplicate = Contact(3, "Oleg", "+7 999 111-22-33", "Gym")
+        phonebook.contacts = [test_first_contact, test_second_contact, duplicate]
+        self.mock_view.confirm_action.return_value = confirm
+
+        phonebook.dedup_contacts()
+
+        self.mock_view.show_contacts.assert_called_once_with([test_first_contact, duplicate])
+        assert phonebook.modified is confirm
+        assert [contact.id for contact in phonebook.contacts] == ([1, 2] if confirm else [1, 2, 3])
+
+    def test_run_quit_saves_binary_snapshot(self, tmp_path: Any, mocker: Any,
+                                            test_first_contact: Contact) -> None:
+        """Test that exiting with changes saves a memory-mapped book before it is closed."""
+        path = str(tmp_path / "phonebook.bin")
+        FileHandler(path, "binary").write_contacts([test_first_contact])
+        view = mocker.Mock()
+        view.get_contact_input.return_value = ("Ivan Petrov", "+7 900 111", "")
+        view.show_menu.side_effect = ["2", "7"]
+        view.confirm_action.return_value = True
+        phonebook = Phonebook(FileHandler(path), view, load="eager")
+
+        phonebook.run()
+
+        assert [contact.name for contact in FileHandler(path).read_contacts()] == [test_first_contact.name,
+                                                                                   "Ivan Petrov"]
+
     def test_run_quit_without_changes(self, phonebook: Phonebook) -> None:
         """Test application exit without unsaved changes."""
         self.mock_view.show_menu.return_value = "7"
@@ -167,12 +273,196 @@ class TestPhonebook:
         self.mock_view.show_menu.return_value = "7"
         self.mock_view.confirm_action.return_value = True
         phonebook.modified = True
-        self.mock_file_handler.write_contacts.return_value = True
+        self.mock_file_handler.write_changes.return_value = 0
 
         phonebook.run()
 
         self.mock_view.confirm_action.assert_called_once()
-        self.mock_file_handler.write_contacts.assert_called_once()
+        self.mock_file_handler.write_changes.assert_called_once()
+
+
+class TestAutosave:
+    @pytest.fixture
+    def phonebook(self, mocker: Any) -> Phonebook:
+        """Create a Phonebook that saves in a background thread.
+        Returns:
+            Phonebook: Test instance with mocked dependencies and autosave enabled
+        """
+        self.mock_file_handler = mocker.Mock()
+        self.mock_file_handler.read_contacts.return_value = []
+        self.mock_file_handler.changed_on_disk.return_value = False
+        self.mock_file_handler.appends_new_contacts = False
+        self.mock_view = mocker.Mock()
+        phonebook = Phonebook(self.mock_file_handler, self.mock_view, autosave=True)
+        yield phonebook
+        phonebook.stop_autosave()
+
+    def test_save_uses_snapshot(self, phonebook: Phonebook,
+                                test_first_contact: Contact) -> None:
+        """Test that the writer gets a copy that later edits do not touch."""
+        self.mock_file_handler.write_changes.return_value = 1
+        phonebook.contacts.insert(test_first_contact)
+
+        phonebook.save_contacts()
+        phonebook.contacts.update(test_first_contact.id, name="Changed")
+        phonebook.saver.wait()
+
+        snapshot, changes = self.mock_file_handler.write_changes.call_args.args
+        assert snapshot.get(test_first_contact.id).name == "Oleg Lutin"
+        assert changes.added == {test_first_contact.id}
+        assert phonebook.save_stats.saves == 1
+        self.mock_view.show_message.assert_called_with(
+            any_string_containing(text.contact_save_successful))
+
+    def test_failed_save_is_retried_on_exit(self, phonebook: Phonebook,
+                                            test_first_contact: Contact) -> None:
+        """Test that exit waits for the writer and saves what it failed to write."""
+        self.mock_file_handler.write_changes.return_value = None
+        phonebook.contacts.insert(test_first_contact)
+        phonebook.save_contacts()
+        phonebook.saver.wait()
+        assert phonebook.modified
+
+        self.mock_file_handler.write_changes.return_value = 1
+        self.mock_view.show_menu.return_value = "7"
+        self.mock_view.confirm_action.return_value = True
+        phonebook.run()
+
+        assert phonebook.saver is None
+        _, changes = self.mock_file_handler.write_changes.call_args.args
+        assert changes.added == {test_first_contact.id}
+        assert not phonebook.changes
+
+
+class TestSharedAccess:
+    def test_refresh_keeps_unsaved_changes(self, tmp_path: Any, mocker: Any,
+                                           test_first_contact: Contact,
+                                           test_second_contact: Contact) -> None:
+        """Test that another program's save is picked up without losing local edits."""
+        path = str(tmp_path / "shared.json")
+        FileHandler(path).write_contacts([test_first_contact])
+        view = mocker.Mock()
+        phonebook = Phonebook(SharedFileHandler(path), view)
+        phonebook.refresh_contacts()
+        view.show_message.assert_not_called()
+
+        phonebook.contacts.update(1, comment="Local")
+        FileHandler(path).write_contacts([test_first_contact, test_second_contact])
+        phonebook.refresh_contacts()
+
+        view.show_message.assert_called_once_with(text.contacts_reloaded)
+        assert [c.id for c in phonebook.contacts] == [1, 2]
+        assert phonebook.contacts.get(1).comment == "Local"
+        assert phonebook.changes.updated == {1}
+        assert [c.id for c in phonebook.contacts.search("masha")] == [2]
+
+
+class TestDeferredLoading:
+    @pytest.mark.parametrize("load", ["lazy", "background"])
+    def test_contacts_read_once(self, mocker: Any, load: str,
+                                test_first_contact: Contact) -> None:
+        """Test that lazy and background loading read the book once, when it is needed."""
+        handler = mocker.Mock()
+        handler.read_contacts.return_value = [test_first_contact]
+        phonebook = Phonebook(handler, mocker.Mock(), load=load)
+        if load == "lazy":
+            handler.read_contacts.assert_not_called()
+            assert not phonebook.loaded
+
+        assert phonebook.contacts.get(1) == test_first_contact
+        assert phonebook.contacts.search("oleg") == [test_first_contact]
+        handler.read_contacts.assert_called_once()
+
+    def test_create_and_save_without_loading(self, tmp_path: Any, mocker: Any,
+                                             test_first_contact: Contact,
+                                             test_second_contact: Contact) -> None:
+        """Test that new contacts are appended to the journal without reading the book."""
+        path = str(tmp_path / "journal.json")
+        JournalFileHandler(path).write_contacts([test_first_contact, test_second_contact])
+        handler = JournalFileHandler(path)
+        read_contacts = mocker.spy(handler, "read_contacts")
+        view = mocker.Mock()
+        view.get_contact_input.side_effect = [("Ivan", "112", ""), ("Olga", "113", "Work")]
+        phonebook = Phonebook(handler, view)
+
+        phonebook.create_contact()
+        phonebook.save_contacts()
+        phonebook.create_contact()
+
+        read_contacts.assert_not_called()
+        assert phonebook.save_stats.records_written == 1
+        assert [c.id for c in JournalFileHandler(path).read_contacts()] == [1, 2, 3]
+        assert phonebook.modified
+        # Loading picks up the saved contact from disk and the unsaved one as a change.
+        assert [(c.id, c.name) for c in phonebook.contacts][2:] == [(3, "Ivan"), (4, "Olga")]
+        assert phonebook.changes.added == {4}
+        assert not phonebook.pending_contacts
+
+
+class TestBackgroundSaver:
+    def test_coalesces_pending_saves(self, mocker: Any) -> None:
+        """Test that saves queued behind a running one collapse into one write."""
+        started, release = threading.Event(), threading.Event()
+        writes = []
+
+        def write_changes(snapshot: ContactStore, changes: Changeset) -> int:
+            writes.append((len(snapshot), set(changes.added)))
+            started.set()
+            release.wait()
+            return len(changes)
+
+        handler = mocker.Mock()
+        handler.write_changes.side_effect = write_changes
+        saver = BackgroundSaver(handler, mocker.Mock())
+        for count in range(1, 4):
+            changes = Changeset()
+            changes.record_insert(count)
+            saver.submit(ContactStore(Contact(i, "N", "1") for i in range(1, count + 1)), changes)
+            started.wait()
+        release.set()
+        saver.close()
+
+        assert writes == [(1, {1}), (3, {2, 3})]
+
+    def test_survives_raising_handler(self, mocker: Any) -> None:
+        """Test that a handler that raises counts as a failed save and close still returns."""
+        handler = mocker.Mock()
+        handler.write_changes.side_effect = OSError("locked")
+        on_saved = mocker.Mock()
+        saver = BackgroundSaver(handler, on_saved)
+        changes = Changeset()
+        changes.record_insert(1)
+
+        saver.submit(ContactStore([Contact(1, "N", "1")]), changes)
+        saver.close()
+
+        on_saved.assert_called_once_with(None, changes)
+        assert saver.failed.added == {1}
+
+    def test_failed_saves_keep_newest_change(self, mocker: Any) -> None:
+        """Test that a contact created in one failed save and deleted in the next is forgotten."""
+        started, release = threading.Event(), threading.Event()
+
+        def write_changes(snapshot: ContactStore, changes: Changeset) -> None:
+            started.set()
+            release.wait()
+            return None
+
+        handler = mocker.Mock()
+        handler.write_changes.side_effect = write_changes
+        saver = BackgroundSaver(handler, mocker.Mock())
+        created, deleted = Changeset(), Changeset()
+        created.record_insert(5)
+        deleted.record_delete(5)
+
+        saver.submit(ContactStore(), created)
+        started.wait()
+        # Queued while the first save is still running, so it is not folded into the failed one.
+        saver.submit(ContactStore(), deleted)
+        release.set()
+        saver.close()
+
+        assert not saver.failed
 
 
 def any_string_containing(substring: str) -> Any:
@@ -0,0 +1,93 @@
+from dedup import DisjointSet, apply_merges, find_duplicates, propose_merges, soundex
+from model import Contact, ContactStore
+
+"""
+Common args for test fuctions:
+    test_first_contact: Fixture providing test Contact instance
+    test_second_contact: Fixture providing second test Contact instance
+"""
+
+
+def test_soundex() -> None:
+    """Test that names that sound alike get the same code."""
+    assert soundex("robert") == soundex("rupert") == "r163"
+    assert soundex("ashcraft") == "a261"
+    assert soundex("lutin") == soundex("lutn")
+
+
+def test_disjoint_set() -> None:
+    """Test that unions join groups transitively."""
+    groups = DisjointSet()
+    groups.union(1, 2)
+    groups.union(3, 4)
+    groups.union(2, 4)
+    groups.union(5, 5)
+
+    assert [sorted(group) for group in groups.groups()] == [[1, 2, 3, 4]]
+
+
+def test_find_duplicates(test_first_contact: Contact,
+                         test_second_contact: Contact) -> None:
+    """Test that contacts with one number and similar names form a cluster."""
+    contacts = [
+        test_first_contact,
+        test_second_contact,
+        Contact(3, "Lutin Oleg", "+7 999 111-22-33"),
+        Contact(4, "Olge Lutin", "8 (999) 111-22-33"),
+        Contact(5, "Oleg", "89991112233"),
+        Contact(6, "Taxi", "89991112233"),
+        Contact(7, "Masha Butova", "8 999 555 44"),
+        Contact(8, "Ivan", "101"),
+        Contact(9, "Ivan", "101"),
+        Contact(10, "Misha Petrov", "+7 495 123-45-67"),
+        Contact(11, "Masha Petrova", "+7 495 123-45-67"),
+        Contact(12, "Ivan Sidorov", "+7 495 765-43-21"),
+        Contact(13, "Ivana Sidorova", "+7 495 765-43-21"),
+        Contact(14, "Petrov Ivan", "123-45-67"),
+        Contact(15, "Ivan Petrov", "+7 495 123-45-67"),
+    ]
+
+    clusters = find_duplicates(contacts)
+
+    assert [[contact.id for contact in cluster] for cluster in clusters] == [[1, 3, 4, 5], [2, 7], [14, 15]]
+
+
+def test_local_number_needs_one_full_number() -> None:
+    """Test that a number without its area code is not joined to one of two different full numbers."""
+    contacts = [Contact(1, "Ivan Petrov", "123-45-67"),
+                Contact(2, "Ivan Petrov", "+7 812 123-45-67"),
+                Contact(3, "Ivan Petrov", "+7 495 123-45-67")]
+
+    assert find_duplicates(contacts) == []
+
+
+def test_large_block_joins_identical_names() -> None:
+    """Test that a number shared by many contacts only joins the same name."""
+    contacts = [Contact(i, name, "+7 495 000-00-00") for i, name in
+                enumerate(["Anna Petrova", "Petrova Anna", "Ana Petrova", "Anna", "Boris Popov"], 1)]
+
+    clusters = find_duplicates(contacts, max_block=2)
+
+    assert [[contact.id for contact in cluster] for cluster in clusters] == [[1, 2]]
+
+
+def test_propose_and_apply_merges() -> None:
+    """Test that a merge keeps the oldest contact with the most complete fields."""
+    store = ContactStore([
+        Contact(1, "Oleg", "9991112233", "Work"),
+        Contact(2, "Oleg Lutin", "+7 999 111-22-33", "Gym"),
+        Contact(3, "Oleg Lutin", "8 999 111 22 33", "Work"),
+        Contact(4, "Masha", "899955544"),
+    ])
+
+    result = propose_merges(store)
+
+    assert (result.clusters, result.duplicates) == (1, 2)
+    assert result.proposals[0].to_dict() == {
+        "keep": 1, "remove": [2, 3],
+        "contact": {"id": 1, "name": "Oleg Lutin", "phone": "+7 999 111-22-33", "comment": "Work; Gym"},
+    }
+    assert apply_merges(store, result.proposals) == 2
+    assert [contact.id for contact in store] == [1, 4]
+    assert store.get(1).name == "Oleg Lutin"
+    assert store.changes.deleted == {2, 3}
@@ -0,0 +1,121 @@
+import json
+import pstats
+import time
+import pytest
+
+from typing import Any
+from controller import Phonebook
+from metrics import Histogram, Metrics, profiled
+from model import Contact, FileHandler
+
+import text_en as text
+
+"""
+Common args for test fuctions:
+    temp_file: Fixture providing temporary file path
+    mocker: pytest-mock fixture
+    test_first_contact: Fixture providing test Contact instance
+    test_second_contact: Fixture providing second test Contact instance
+"""
+
+
+@pytest.fixture
+def temp_file(tmp_path) -> str:
+    """Create a temporary file path for testing."""
+    return str(tmp_path / "test_contacts.json")
+
+
+def test_histogram() -> None:
+    """Test counts, percentiles and bucket placement."""
+    histogram = Histogram()
+    for seconds in [0.001] * 98 + [0.5, 2.0]:
+        histogram.record(seconds)
+
+    assert histogram.count == 100
+    assert histogram.percentile(0.5) == pytest.approx(0.001024)
+    assert histogram.percentile(0.99) == pytest.approx(0.524288)
+    assert histogram.to_dict()["max_ms"] == 2000.0
+    assert sum(histogram.to_dict()["buckets"].values()) == 100
+
+
+def test_disabled_leaves_objects_untouched(mocker: Any) -> None:
+    """Test that without metrics no call goes through a wrapper."""
+    file_handler = FileHandler("unused.json")
+    phonebook = Phonebook(file_handler, mocker.Mock())
+
+    assert phonebook.metrics is None
+    assert phonebook.find_contacts.__func__ is Phonebook.find_contacts
+    assert not {"find_contacts", "load_contacts", "save_contacts"} & vars(phonebook).keys()
+    assert not {"read_contacts", "write_contacts", "write_changes"} & vars(file_handler).keys()
+
+
+def test_operations_exclude_user_input(mocker: Any, test_first_contact: Contact) -> None:
+    """Test that time spent waiting for input is not counted as work."""
+    view = mocker.Mock()
+    view.get_search_term.side_effect = lambda: time.sleep(0.05) or "Oleg"
+    file_handler = mocker.Mock(spec=FileHandler, filename="missing.json")
+    file_handler.read_contacts.return_value = [test_first_contact]
+    metrics = Metrics()
+
+    phonebook = Phonebook(file_handler, view, metrics=metrics)
+    phonebook.find_contacts()
+    phonebook.find_contacts()
+
+    stats = metrics.to_dict()
+    assert stats["operations"]["find_contacts"]["count"] == 2
+    assert stats["operations"]["find_contacts"]["max_ms"] < 50
+    assert stats["operations"]["load_contacts"]["count"] == 1
+    assert stats["counters"]["contacts_read"] == 1
+    view.show_contacts.assert_called_with([test_first_contact])
+
+
+def test_file_counters(temp_file: str, mocker: Any,
+                       test_first_contact: Contact,
+                       test_second_contact: Contact) -> None:
+    """Test bytes and contacts counted for reads and writes."""
+    FileHandler(temp_file).write_contacts([test_first_contact, test_second_contact])
+    metrics = Metrics()
+    phonebook = Phonebook(FileHandler(temp_file), mocker.Mock(), metrics=metrics)
+    phonebook.contacts.update(1, comment="Changed")
+    phonebook.save_contacts()
+
+    counters = metrics.to_dict()["counters"]
+    assert counters["contacts_read"] == 2
+    assert counters["bytes_read"] > 0
+    assert counters["contacts_written"] == 2
+    assert counters["bytes_written"] > 0
+    assert counters["records_written"] == 2
+    assert {"read_contacts", "write_contacts", "write_changes", "save_contacts"} <= \
+        metrics.to_dict()["operations"].keys()
+
+
+def test_stats_menu(mocker: Any) -> None:
+    """Test the statistics menu item with and without metrics."""
+    file_handler = mocker.Mock(spec=FileHandler, filename="missing.json")
+    file_handler.read_contacts.return_value = []
+    file_handler.changed_on_disk.return_value = False
+    view = mocker.Mock()
+    view.show_menu.side_effect = ["8", "7"]
+
+    Phonebook(file_handler, view).run()
+    view.show_message.assert_any_call(text.stats_disabled)
+
+    view.show_menu.side_effect = ["8", "7"]
+    Phonebook(file_handler, view, metrics=Metrics(), load="eager").run()
+    stats = view.show_stats.call_args.args[0]
+    assert stats["operations"]["load_contacts"]["count"] == 1
+
+
+def test_dump_and_profile(tmp_path, temp_file: str) -> None:
+    """Test the JSON dump and the pstats file written for a profiled run."""
+    metrics = Metrics()
+    handler = FileHandler(temp_file)
+    metrics.instrument_file_handler(handler)
+    profile_file = str(tmp_path / "run.pstats")
+
+    assert profiled(lambda: handler.write_contacts([]), profile_file) is True
+    metrics.dump(str(tmp_path / "stats.json"))
+
+    with open(tmp_path / "stats.json") as f:
+        assert json.load(f)["operations"]["write_contacts"]["count"] == 1
+    assert pstats.Stats(profile_file).total_calls > 0
@@ -1,9 +1,13 @@
 import pytest
+import io
 import json
 import os
 
 from typing import Dict
-from model import Contact, FileHandler
+import model
+from model import (CODECS, BinarySnapshot, Changeset, Contact, ContactColumns, ContactStore, FileHandler,
+                   JsonArrayReader, JsonCodec, MappedContactStore, PackedStrings, convert_snapshot, detect_codec,
+                   merge_changes, optional_module)
 
 """
 Common args for test fuctions:
@@ -48,6 +52,221 @@ class TestContact:
         contact_dict = test_first_contact.to_dict()
         assert contact_dict == test_contact_data
 
+    def test_no_instance_dict(self, test_first_contact: Contact) -> None:
+        """Test that contacts use slots instead of a per-instance dict."""
+        assert not hasattr(test_first_contact, "__dict__")
+
+
+class TestPackedStrings:
+    def test_append_set_compact(self) -> None:
+        """Test storing, replacing and compacting packed strings."""
+        strings = PackedStrings()
+        for value in ["Oleg", "", "Маша"]:
+            strings.append(value)
+        strings[0] = "Olga"
+        strings.compact()
+
+        assert len(strings) == 3
+        assert [strings[i] for i in range(3)] == ["Olga", "", "Маша"]
+
+
+class TestContactColumns:
+    def test_views(self, test_first_contact: Contact, test_contact_data: Dict) -> None:
+        """Test that views read and write through to the columns."""
+        columns = ContactColumns()
+        columns[test_first_contact.id] = test_first_contact
+
+        view = columns[test_first_contact.id]
+        assert view.to_dict() == test_contact_data
+        view.comment = "Changed"
+        assert columns.get(test_first_contact.id).comment == "Changed"
+
+    def test_unordered_ids(self) -> None:
+        """Test lookups when ids are inserted out of order."""
+        columns = ContactColumns()
+        for contact_id in [5, 2, 9]:
+            columns[contact_id] = Contact(contact_id, f"N{contact_id}", "1")
+
+        assert columns.pop(2).name == "N2"
+        assert 2 not in columns
+        assert [view.id for view in columns.values()] == [5, 9]
+        assert columns[9].name == "N9"
+
+    def test_columnar_store(self, test_first_contact: Contact,
+                            test_second_contact: Contact) -> None:
+        """Test ContactStore operations on the columnar layout."""
+        store = ContactStore([test_first_contact, test_second_contact], columnar=True)
+        store.update(2, name="Masha Ivanova")
+        store.delete(1)
+        contact = store.create("Ivan", "112")
+
+        assert len(store) == 2
+        assert store.get(2).name == "Masha Ivanova"
+        assert store.get(1) is None
+        assert [found.id for found in store.search("ivan")] == [2, contact.id]
+
+
+class TestChangeset:
+    def test_create_then_delete(self) -> None:
+        """Test that a contact created and deleted before a save leaves no trace."""
+        changes = Changeset()
+        changes.record_insert(5)
+        changes.record_update(5)
+        changes.record_delete(5)
+        assert not changes
+
+    def test_merge(self) -> None:
+        """Test folding a newer changeset into an older one."""
+        older = Changeset()
+        older.record_insert(3)
+        older.record_update(1)
+        newer = Changeset()
+        newer.record_delete(3)
+        newer.record_delete(1)
+        newer.record_update(2)
+
+        older.merge(newer)
+
+        assert older.added == set()
+        assert older.updated == {2}
+        assert older.deleted == {1}
+
+    def test_merge_changes(self, test_first_contact: Contact,
+                           test_second_contact: Contact) -> None:
+        """Test replaying local changes over a copy saved by someone else."""
+        ours = ContactStore([test_first_contact.copy(), test_second_contact.copy()])
+        ours.update(1, comment="Ours")
+        ours.delete(2)
+        ours.create("Ivan", "112")
+        theirs = [test_first_contact.copy(), test_second_contact.copy(), Contact(3, "Olga", "113")]
+
+        merged, rebased = merge_changes(theirs, ours, ours.changes)
+
+        assert [(c.id, c.name) for c in merged] == [(1, "Oleg Lutin"), (3, "Olga"), (4, "Ivan")]
+        assert merged[0].comment == "Ours"
+        assert (rebased.added, rebased.updated, rebased.deleted) == ({4}, {1}, {2})
+
+
+class TestContactStore:
+    def test_get_insert_delete(self, test_first_contact: Contact,
+                               test_second_contact: Contact) -> None:
+        """Test id lookups, insertion and deletion."""
+        store = ContactStore([test_first_contact])
+        store.insert(test_second_contact)
+
+        assert store.get(test_second_contact.id) is test_second_contact
+        assert store.delete(test_first_contact.id) is test_first_contact
+        assert store.get(test_first_contact.id) is None
+        assert store.delete(test_first_contact.id) is None
+        assert list(store) == [test_second_contact]
+
+    def test_insert_duplicate_id(self, test_first_contact: Contact) -> None:
+        """Test that inserting an existing id is rejected."""
+        store = ContactStore([test_first_contact])
+        with pytest.raises(ValueError):
+            store.insert(Contact(test_first_contact.id, "Other", "123"))
+
+    def test_duplicate_ids_on_load(self, test_first_contact: Contact) -> None:
+        """Test that repeated ids in loaded data get fresh ids."""
+        duplicate = Contact(test_first_contact.id, "Other", "123")
+        store = ContactStore([test_first_contact, duplicate])
+
+        assert len(store) == 2
+        assert duplicate.id == test_first_contact.id + 1
+
+    def test_update(self, test_second_contact: Contact) -> None:
+        """Test updating selected fields of a contact."""
+        store = ContactStore([test_second_contact])
+
+        contact = store.update(test_second_contact.id, comment="Updated")
+
+        assert contact.comment == "Updated"
+        assert contact.name == "Masha Butova"
+        assert store.update(100, name="Nobody") is None
+
+    def test_create_and_next_id(self, test_first_contact: Contact,
+                                test_second_contact: Contact) -> None:
+        """Test that ids keep growing in insertion order."""
+        store = ContactStore([test_second_contact, test_first_contact])
+        store.delete(test_second_contact.id)
+
+        contact = store.create("New", "555")
+
+        assert contact.id == 3
+        assert store.next_id() == 4
+        assert list(store) == [test_first_contact, contact]
+
+    def test_change_tracking(self, test_first_contact: Contact,
+                             test_second_contact: Contact) -> None:
+        """Test that the store records which ids changed since the last save."""
+        store = ContactStore([test_first_contact, test_second_contact])
+        assert not store.changes
+
+        store.update(1, comment="Changed")
+        store.delete(2)
+        created = store.create("New", "555")
+        store.update(created.id, comment="New comment")
+
+        changes = store.clear_changes()
+        assert changes.added == {created.id}
+        assert changes.updated == {1}
+        assert changes.deleted == {2}
+        assert len(changes) == 3
+        assert not store.changes
+
+    def test_snapshot_copies_rows(self, test_first_contact: Contact,
+                                  test_second_contact: Contact) -> None:
+        """Test that a snapshot keeps the values it was taken with while the store changes."""
+        store = ContactStore([test_first_contact, test_second_contact])
+        snapshot = store.snapshot()
+
+        store.update(1, comment="Changed")
+        store.delete(2)
+
+        assert snapshot.rows == [(1, "Oleg Lutin", "89991112233", "Test comment"),
+                                 (2, "Masha Butova", "899955544", "")]
+        assert len(snapshot) == 2
+        assert snapshot.get(1).comment == "Test comment"
+        assert snapshot.get(3) is None
+        assert [contact.comment for contact in snapshot] == ["Test comment", ""]
+
+    def test_sequence_access(self, test_first_contact: Contact,
+                             test_second_contact: Contact) -> None:
+        """Test list-like access used by the view and tests."""
+        store = ContactStore([test_first_contact, test_second_contact])
+
+        assert store[0] is test_first_contact
+        assert store[-1] is test_second_contact
+        assert store[:1] == [test_first_contact]
+        assert store == [test_first_contact, test_second_contact]
+        assert test_first_contact.id in store
+        with pytest.raises(IndexError):
+            store[2]
+
+
+class TestJsonArrayReader:
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 64 * 1024])
+    def test_chunk_boundaries(self, chunk_size: int,
+                              test_contact_data: Dict,
+                              test_second_contact_data: Dict) -> None:
+        """Test that records split across read chunks are decoded intact."""
+        data = [test_contact_data, test_second_contact_data]
+        reader = JsonArrayReader(io.StringIO(json.dumps(data, indent=2)), chunk_size)
+        assert list(reader) == data
+
+    @pytest.mark.parametrize("content", ["", "{}", "[1 2]", "[1,", "[] []"])
+    def test_invalid_json(self, content: str) -> None:
+        """Test that malformed documents raise JSONDecodeError."""
+        with pytest.raises(json.JSONDecodeError):
+            list(JsonArrayReader(io.StringIO(content), 2))
+
+    def test_malformed_record_stops_reading(self) -> None:
+        """Test that a malformed record is reported without reading on to the end."""
+        source = io.StringIO('[[1, "a"], [2, x], ' + '[3, "b"], ' * 10000 + '[4, "c"]]')
+        with pytest.raises(json.JSONDecodeError):
+            list(JsonArrayReader(source, 64))
+        assert source.tell() == 64
+
 
 class TestFileHandler:
     def test_read_contacts_empty_file(self, temp_file: str) -> None:
@@ -90,6 +309,28 @@ class TestFileHandler:
         contacts = handler.read_contacts()
         assert contacts == []
 
+    def test_read_contacts_truncated_json(self, temp_file: str,
+                                          test_contact_data: Dict,
+                                          test_second_contact_data: Dict) -> None:
+        """Test that a file cut in the middle of a record reads as empty."""
+        with open(temp_file, 'w') as f:
+            f.write(json.dumps([test_contact_data, test_second_contact_data])[:-10])
+
+        handler = FileHandler(temp_file)
+        assert handler.read_contacts() == []
+
+    def test_iter_contacts_is_lazy(self, temp_file: str,
+                                   test_contact_data: Dict) -> None:
+        """Test that records are yielded before the rest of the file is parsed."""
+        with open(temp_file, 'w') as f:
+            f.write(json.dumps([test_contact_data])[:-1] + ", garbage")
+
+        contacts = FileHandler(temp_file).iter_contacts()
+
+        assert next(contacts).name == test_contact_data["name"]
+        with pytest.raises(json.JSONDecodeError):
+            next(contacts)
+
     def test_write_contacts(self, temp_file: str,
                             test_first_contact: Contact,
                             test_second_contact: Contact,
@@ -109,6 +350,28 @@ class TestFileHandler:
         assert data[0]["name"] == test_contact_data["name"]
         assert data[1]["name"] == test_second_contact_data["name"]
 
+    def test_write_changes_rewrites_everything(self, temp_file: str,
+                                               test_first_contact: Contact,
+                                               test_second_contact: Contact) -> None:
+        """Test that the plain JSON handler reports a full rewrite."""
+        store = ContactStore([test_first_contact, test_second_contact])
+        store.update(1, comment="Changed")
+
+        assert FileHandler(temp_file).write_changes(store, store.changes) == 2
+
+    def test_write_contacts_is_atomic(self, temp_file: str,
+                                      test_first_contact: Contact,
+                                      mocker) -> None:
+        """Test that a failed write leaves the previous file in place."""
+        handler = FileHandler(temp_file)
+        handler.write_contacts([test_first_contact])
+        mocker.patch.object(JsonCodec, "write", side_effect=OSError("disk full"))
+
+        assert handler.write_contacts([]) is False
+
+        assert len(handler.read_contacts()) == 1
+        assert not os.path.exists(temp_file + ".tmp")
+
     def test_write_contacts_error(self, temp_file: str, test_first_contact: Contact) -> None:
         """Test writing contacts when file operation fails."""
         handler = FileHandler(temp_file)
@@ -118,3 +381,246 @@ class TestFileHandler:
         contacts = [test_first_contact]
         result = handler.write_contacts(contacts)
         assert result is False
+
+    def test_write_contacts_rotates_snapshots(self, temp_file: str) -> None:
+        """Test that saves keep the last snapshots, each with a matching checksum."""
+        handler = FileHandler(temp_file, keep=2)
+        for count in range(1, 5):
+            assert handler.write_contacts([Contact(i, f"Contact {i}", "1") for i in range(1, count + 1)])
+
+        assert [len(FileHandler(name, keep=0).read_contacts()) for name in handler.snapshot_files()] == [4, 3, 2]
+        assert not os.path.exists(temp_file + ".3")
+        for name in handler.snapshot_files():
+            with open(name + ".crc32") as f:
+                assert f.read() == model.file_checksum(name)
+
+    def test_read_contacts_falls_back_to_valid_snapshot(self, temp_file: str,
+                                                        test_first_contact: Contact,
+                                                        test_second_contact: Contact,
+                                                        capsys) -> None:
+        """Test that a snapshot that cannot be decoded is skipped for the newest valid one."""
+        handler = FileHandler(temp_file)
+        handler.write_contacts([test_first_contact])
+        handler.write_contacts([test_first_contact, test_second_contact])
+        with open(temp_file, 'r+b') as f:
+            f.truncate(os.path.getsize(temp_file) - 5)
+
+        contacts = FileHandler(temp_file).read_contacts()
+
+        assert [contact.id for contact in contacts] == [1]
+        assert temp_file + ".1" in capsys.readouterr().out
+
+    @pytest.mark.parametrize("snapshot_format", ["json", "packed", "jsonl"])
+    def test_read_contacts_rejects_cut_snapshot(self, temp_file: str, snapshot_format: str, mocker) -> None:
+        """Test that a file that still decodes but fails its checksum is skipped, checked in one pass."""
+        contacts = [Contact(i, f"Contact {i}", "1") for i in range(1, 4)]
+        handler = FileHandler(temp_file, snapshot_format)
+        handler.write_contacts(contacts[:1])
+        handler.write_contacts(contacts)
+        if snapshot_format == "json":
+            with open(temp_file, 'r+b') as f:
+                data = f.read().replace(b"Contact 3", b"Contact 9")
+                f.seek(0)
+                f.write(data)
+        else:
+            shorter = temp_file + ".short"
+            FileHandler(shorter, snapshot_format).write_contacts(contacts[:2])
+            with open(temp_file, 'r+b') as f:
+                f.truncate(os.path.getsize(shorter))
+        file_checksum = mocker.patch("model.file_checksum")
+
+        assert [contact.id for contact in FileHandler(temp_file).read_contacts()] == [1]
+        file_checksum.assert_not_called()
+
+    def test_binary_snapshot_is_not_hashed_on_load(self, temp_file: str,
+                                                   test_first_contact: Contact,
+                                                   test_second_contact: Contact,
+                                                   mocker) -> None:
+        """Test that a mapped snapshot is opened without reading it whole, but a cut-off one is refused."""
+        handler = FileHandler(temp_file, "binary")
+        handler.write_contacts([test_first_contact])
+        handler.write_contacts([test_first_contact, test_second_contact])
+        file_checksum = mocker.patch("model.file_checksum")
+
+        contacts = FileHandler(temp_file).read_contacts()
+        assert len(contacts) == 2
+        contacts.close()
+        file_checksum.assert_not_called()
+
+        with open(temp_file, 'r+b') as f:
+            f.truncate(os.path.getsize(temp_file) - 3)
+        contacts = FileHandler(temp_file).read_contacts()
+        assert [contact.id for contact in contacts] == [1]
+        contacts.close()
+
+    def test_read_contacts_sets_damaged_file_aside(self, temp_file: str,
+                                                   test_first_contact: Contact) -> None:
+        """Test that a damaged book with no valid copy is kept instead of being overwritten."""
+        handler = FileHandler(temp_file, keep=0)
+        handler.write_contacts([test_first_contact])
+        with open(temp_file, 'r+b') as f:
+            f.truncate(10)
+
+        assert handler.read_contacts() == []
+        handler.write_contacts([])
+
+        with open(temp_file + ".damaged", 'rb') as f:
+            assert len(f.read()) == 10
+        assert FileHandler(temp_file).read_contacts() == []
+
+    def test_read_contacts_without_checksum(self, temp_file: str, test_contact_data: Dict) -> None:
+        """Test that files written without a checksum are still read."""
+        with open(temp_file, 'w') as f:
+            json.dump([test_contact_data], f)
+
+        assert len(FileHandler(temp_file).read_contacts()) == 1
+
+    def test_interrupted_save_keeps_previous_snapshot(self, temp_file: str,
+                                                      test_first_contact: Contact,
+                                                      test_second_contact: Contact,
+                                                      mocker) -> None:
+        """Test that a save stopped after rotating loads the previous snapshot."""
+        handler = FileHandler(temp_file)
+        handler.write_contacts([test_first_contact])
+        move_snapshot = model.move_snapshot
+
+        def interrupted(source: str, target: str):
+            if source.endswith(".tmp"):
+                raise OSError("power cut")
+            move_snapshot(source, target)
+
+        mocker.patch("model.move_snapshot", side_effect=interrupted)
+        assert handler.write_contacts([test_first_contact, test_second_contact]) is False
+        mocker.stopall()
+
+        assert not os.path.exists(temp_file)
+        assert [contact.id for contact in FileHandler(temp_file).read_contacts()] == [1]
+
+
+class TestCodecs:
+    @pytest.fixture
+    def contacts(self, test_first_contact: Contact) -> list:
+        """Contacts with non-ASCII text and characters that need escaping in JSON."""
+        return [test_first_contact, Contact(2, "Ольга", "+7 (999) 111-22-33", 'Says "hi"},{\nbye'),
+                Contact(7, "", "112", "")]
+
+    @pytest.mark.parametrize("name", sorted(CODECS))
+    def test_round_trip(self, temp_file: str, contacts: list, name: str) -> None:
+        """Test that every codec writes a file that is detected and read back unchanged."""
+        if CODECS[name].requires and optional_module(CODECS[name].requires) is None:
+            pytest.skip(f"{CODECS[name].requires} is not installed")
+        assert FileHandler(temp_file, name).write_contacts(contacts)
+
+        assert detect_codec(temp_file) is CODECS[name]
+        handler = FileHandler(temp_file, "json")
+        assert [c.to_dict() for c in handler.read_contacts()] == [c.to_dict() for c in contacts]
+        assert handler.snapshot_format == name
+
+    @pytest.mark.parametrize("use_orjson", [False, True])
+    def test_compact_json(self, temp_file: str, contacts: list, use_orjson: bool) -> None:
+        """Test that both JSON encoders write compact JSON the standard library can load."""
+        codec = JsonCodec(use_orjson)
+        if use_orjson and codec.orjson is None:
+            pytest.skip("orjson is not installed")
+        with open(temp_file, 'wb') as f:
+            codec.write(f, iter(contacts))
+
+        with open(temp_file, encoding="utf-8") as f:
+            data = f.read()
+        assert json.loads(data) == [c.to_dict() for c in contacts]
+        assert '  ' not in data
+        empty = io.BytesIO()
+        codec.write(empty, [])
+        assert json.loads(empty.getvalue()) == []
+
+    def test_truncated_packed_file(self, temp_file: str, contacts: list) -> None:
+        """Test that a packed file cut inside a record is rejected rather than read short."""
+        FileHandler(temp_file, "packed").write_contacts(contacts)
+        with open(temp_file, 'rb+') as f:
+            f.truncate(os.path.getsize(temp_file) - 2)
+
+        with pytest.raises(ValueError):
+            list(FileHandler(temp_file, checksums=False).iter_contacts())
+        with pytest.raises(ValueError):
+            list(FileHandler(temp_file).iter_contacts())
+        assert FileHandler(temp_file).read_contacts() == []
+
+
+class TestBinarySnapshot:
+    @pytest.fixture
+    def binary_file(self, temp_file: str,
+                    test_first_contact: Contact,
+                    test_second_contact: Contact) -> str:
+        """Write both test contacts, plus one with non-ASCII text, as a binary snapshot."""
+        contacts = [test_second_contact, Contact(5, "Ольга", "112", "Соседка"), test_first_contact]
+        assert FileHandler(temp_file, "binary").write_contacts(contacts)
+        return temp_file
+
+    def test_round_trip(self, binary_file: str, test_first_contact: Contact) -> None:
+        """Test that records come back sorted by id with every field intact."""
+        snapshot = BinarySnapshot(binary_file)
+        try:
+            assert [c.id for c in snapshot] == [1, 2, 5]
+            assert snapshot.contact(0).to_dict() == test_first_contact.to_dict()
+            assert snapshot.contact(2).comment == "Соседка"
+            assert snapshot.position(5) == 2
+            assert snapshot.position(3) is None
+        finally:
+            snapshot.close()
+
+    def test_lookup_decodes_one_record(self, binary_file: str) -> None:
+        """Test that opening and fetching by id leave other records undecoded."""
+        handler = FileHandler(binary_file)
+        store = handler.read_contacts()
+
+        assert isinstance(store, MappedContactStore)
+        assert handler.snapshot_format == "binary"
+        assert len(store) == 3 and store.next_id() == 6
+        assert store.get(5).name == "Ольга"
+        assert list(store._contacts._loaded) == [5]
+        store.close()
+
+    def test_changes_over_snapshot(self, binary_file: str) -> None:
+        """Test edits, deletes and inserts on top of the mapped records."""
+        handler = FileHandler(binary_file)
+        store = handler.read_contacts()
+        store.update(2, comment="Updated")
+        store.delete(1)
+        store.create("Ivan", "112")
+
+        assert [c.id for c in store] == [2, 5, 6]
+        assert store.get(2).comment == "Updated"
+        assert 1 not in store
+        assert [c.id for c in store.search("112")] == [5, 6]
+
+        expected = [c.to_dict() for c in store]
+        assert handler.write_contacts(store)
+        store.close()
+        reopened = handler.read_contacts()
+        assert [c.to_dict() for c in reopened] == expected
+        reopened.close()
+
+    def test_convert(self, binary_file: str, tmp_path) -> None:
+        """Test conversion to JSON and back."""
+        json_file = str(tmp_path / "contacts.json")
+        back_file = str(tmp_path / "contacts.bin")
+
+        assert convert_snapshot(binary_file, json_file, "json") == 3
+        with open(json_file) as f:
+            assert [c["id"] for c in json.load(f)] == [1, 2, 5]
+        assert convert_snapshot(json_file, back_file, "binary") == 3
+        with open(binary_file, 'rb') as original, open(back_file, 'rb') as converted:
+            assert original.read() == converted.read()
+
+    def test_convert_missing_source(self, tmp_path, capsys) -> None:
+        """Test that a missing source is reported instead of raising."""
+        target = tmp_path / "contacts.bin"
+        assert convert_snapshot(str(tmp_path / "missing.json"), str(target), "binary") is None
+        assert "Could not read the phonebook" in capsys.readouterr().out
+        assert not target.exists()
+
+    def test_truncated_snapshot(self, binary_file: str) -> None:
+        """Test that a snapshot cut short reads as empty."""
+        os.truncate(binary_file, 40)
+
+        assert FileHandler(binary_file).read_contacts() == []
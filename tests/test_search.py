@@ -0,0 +1,305 @@
+import pytest
+
+from model import Contact, ContactStore
+from search import (FuzzyIndex, NgramIndex, ParallelSearcher, PhoneIndex, QueryCache, contact_matches, deletions,
+                    edit_distance, ngrams, normalize_phone, query_matches)
+
+"""
+Common args for test fuctions:
+    store: Fixture providing a ContactStore with a few contacts
+    term: Search term to look up
+"""
+
+
+@pytest.fixture
+def store() -> ContactStore:
+    """Create a store with contacts sharing parts of their fields.
+    Returns:
+        ContactStore: Store with indexed contacts
+    """
+    store = ContactStore([
+        Contact(1, "Oleg Lutin", "89991112233", "Work"),
+        Contact(2, "Masha Butova", "899955544"),
+        Contact(3, "Olga Petrova", "+7 912 000-11-22", "Neighbour, works late"),
+        Contact(4, "Ivan", "112", "Emergency"),
+    ])
+    store.build_index()
+    return store
+
+
+def linear_search(store: ContactStore, term: str) -> list:
+    """Reference implementation: full scan over every contact."""
+    term = term.lower()
+    return [contact for contact in store if contact_matches(contact, term)]
+
+
+def test_ngrams() -> None:
+    """Test n-gram extraction from text."""
+    assert ngrams("abcd") == {"abc", "bcd"}
+    assert ngrams("ab") == set()
+
+
+def test_candidates_short_term() -> None:
+    """Test that terms shorter than an n-gram are not answered by the index."""
+    index = NgramIndex([Contact(1, "Oleg", "123")])
+    assert index.candidates("ol") is None
+
+
+def test_candidates_are_superset(store: ContactStore) -> None:
+    """Test that the index returns every matching contact id."""
+    index = NgramIndex(store)
+    assert index.candidates("oleg") == {1}
+    assert index.candidates("zzz") == set()
+
+
+@pytest.mark.parametrize("term", ["", "o", "ol", "OLE", "ova", "999", "work", "11-22", "nothing"])
+def test_search_matches_linear_scan(store: ContactStore, term: str) -> None:
+    """Test that indexed search returns the same contacts as a full scan."""
+    assert store.search(term) == linear_search(store, term)
+
+
+def test_search_after_changes(store: ContactStore) -> None:
+    """Test that the index follows create, update and delete."""
+    store.create("Oleksandr", "555")
+    store.update(2, name="Olesya Butova")
+    store.delete(1)
+
+    assert [contact.id for contact in store.search("ole")] == [2, 5]
+    assert store.search("masha") == []
+    assert store.search("oleg") == []
+
+
+def test_search_keeps_insertion_order() -> None:
+    """Test result order for books whose ids are not sorted."""
+    store = ContactStore([Contact(5, "Anna One", "1"), Contact(2, "Anna Two", "2")])
+    assert [contact.id for contact in store.search("anna")] == [5, 2]
+
+
+def test_unordered_store_keeps_order_through_changes() -> None:
+    """Test that lookups in an unsorted book follow insertion order without scanning it."""
+    store = ContactStore([Contact(5, "Anna One", "8999"), Contact(2, "Anna Two", "8999")])
+    assert [contact.id for contact in store.find_by_phone("8999")] == [5, 2]
+
+    store.insert(Contact(3, "Anna Three", "8999"))
+    store.delete(5)
+    store.create("Anna Four", "8999")
+
+    assert [contact.id for contact in store.find_by_phone("8999")] == [2, 3, 6]
+    assert [contact.id for contact in store.search("anna")] == [2, 3, 6]
+    assert list(store._positions) == [2, 3, 6]
+
+
+@pytest.mark.parametrize("phone,expected", [
+    ("+7 999 111-22-33", "79991112233"),
+    ("89991112233", "79991112233"),
+    ("8 (999) 111 22 33", "79991112233"),
+    ("8999", "7999"),
+    ("+8613800138000", "8613800138000"),
+    ("112", "112"),
+    ("", ""),
+])
+def test_normalize_phone(phone: str, expected: str) -> None:
+    """Test canonical digit-only phone keys."""
+    assert normalize_phone(phone) == expected
+
+
+def test_contact_phone_key_follows_edits() -> None:
+    """Test that the phone key is recomputed whenever the phone changes."""
+    contact = Contact(1, "Oleg", "8 999 111-22-33")
+    assert contact.phone_key == "79991112233"
+    contact.phone = "+7 912 000 11 22"
+    assert contact.phone_key == "79120001122"
+
+
+def test_phone_index() -> None:
+    """Test prefix and exact lookups in the bucketed phone index."""
+    contacts = [Contact(1, "A", "89991112233"), Contact(2, "B", "+79991110000"),
+                Contact(3, "C", "+7 912 000-11-22"), Contact(4, "D", "89991112233")]
+    index = PhoneIndex(contacts)
+
+    assert sorted(index.prefix("7999")) == [1, 2, 4]
+    assert sorted(index.exact("79991112233")) == [1, 4]
+    assert index.prefix("") == []
+
+    index.remove(contacts[0])
+    assert index.exact("79991112233") == [4]
+    assert len(index) == 3
+
+    index.remove(contacts[2])
+    assert index.prefix("79") == index.prefix("7999")
+    assert sorted(index.prefix("7999111")) == [2, 4]
+
+
+def test_update_skips_unchanged_indexes(store: ContactStore) -> None:
+    """Test that a new comment leaves the phone index alone and a new phone updates it."""
+    store.find_by_phone("8999")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(store._phone_index, "remove", lambda contact: pytest.fail("phone index touched"))
+        store.update(1, comment="Only the comment")
+    store.update(1, phone="+7 912 555 00 00")
+    assert [contact.id for contact in store.find_by_phone("8912555", prefix=True)] == [1]
+
+
+def test_search_by_phone_format(store: ContactStore) -> None:
+    """Test that phone searches ignore formatting and the trunk prefix."""
+    assert [contact.id for contact in store.search("+7 999 111")] == [1]
+    assert [contact.id for contact in store.search("8912")] == [3]
+
+
+def test_find_by_phone(store: ContactStore) -> None:
+    """Test caller-id and prefix lookups through the store."""
+    assert [contact.id for contact in store.find_by_phone("+7 (999) 111-22-33")] == [1]
+    assert [contact.id for contact in store.find_by_phone("8999", prefix=True)] == [1, 2]
+
+    store.update(1, phone="+7 912 555 00 00")
+    assert store.find_by_phone("89991112233") == []
+    assert [contact.id for contact in store.find_by_phone("8912", prefix=True)] == [1, 3]
+
+
+def test_parallel_searcher_shards(store: ContactStore) -> None:
+    """Test that sharded worker scans return ids in store order."""
+    searcher = ParallelSearcher(store, workers=3)
+    try:
+        assert len(searcher) == 2
+        assert searcher.search_ids("o") == [c.id for c in linear_search(store, "o")]
+    finally:
+        searcher.close()
+
+
+def test_parallel_search_follows_changes(store: ContactStore) -> None:
+    """Test that short-term scans use the workers and see later edits."""
+    store.enable_parallel_search(2)
+    try:
+        assert store.search("ol") == linear_search(store, "ol")
+        store.update(2, name="Olesya")
+        store.delete(1)
+        assert [c.id for c in store.search("ol")] == [2, 3]
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("oleg", "oleg", 0),
+    ("oleg", "olge", 2),
+    ("masha", "mascha", 1),
+    ("ivan", "petrova", 3),
+])
+def test_edit_distance(a: str, b: str, expected: int) -> None:
+    """Test bounded Levenshtein distance."""
+    assert edit_distance(a, b, limit=2) == expected
+
+
+def test_deletions() -> None:
+    """Test deletion variants used as fuzzy index keys."""
+    assert deletions("abc", 1) == {"abc", "ab", "ac", "bc"}
+    assert "a" in deletions("abc", 2)
+
+
+def test_fuzzy_index_matches(store: ContactStore) -> None:
+    """Test that misspelled names find the closest contacts."""
+    index = FuzzyIndex(store)
+    assert index.matches("Olge") == {1: 2, 3: 1}
+    assert index.matches("mascha butova") == {2: 1}
+    assert index.matches("oleg xyzxyz") == {}
+    assert index.matches("Olga", max_distance=0) == {3: 0}
+
+
+def test_fuzzy_index_follows_changes(store: ContactStore) -> None:
+    """Test that renamed and deleted contacts leave the fuzzy index."""
+    store.update(4, name="Ivanna")
+    store.delete(3)
+    assert [contact.id for contact in store.fuzzy_search("ivana")] == [4]
+    assert [contact.id for contact in store.fuzzy_search("olga")] == [1]
+
+
+def test_fuzzy_search_ranking(store: ContactStore) -> None:
+    """Test that closer names come first and ties keep store order."""
+    store.insert(Contact(5, "Olg Sidorov", "100"))
+    assert [contact.id for contact in store.fuzzy_search("olga")] == [3, 5, 1]
+
+
+def test_query_cache_hits_and_refinements(store: ContactStore) -> None:
+    """Test repeated and extended terms answered from the cache."""
+    assert store.search("L") == linear_search(store, "l")
+    assert store.search("l") == linear_search(store, "l")
+    assert store.search("ol") == linear_search(store, "ol")
+
+    stats = store.query_cache.stats()
+    assert (stats["cache_hits"], stats["cache_refinements"]) == (1, 1)
+    assert stats["cache_misses"] == 1
+
+
+def test_query_cache_precise_invalidation(store: ContactStore) -> None:
+    """Test that only answers affected by a change are dropped."""
+    cache = store.query_cache
+    store.search("oleg")
+    store.search("work")
+
+    store.update(2, comment="Night shift")
+    assert len(cache) == 2
+    store.update(2, name="Oleg Butov")
+    assert len(cache) == 1 and cache.invalidations == 1
+    assert [c.id for c in store.search("oleg")] == [1, 2]
+
+    store.delete(1)
+    assert [c.id for c in store.search("work")] == [3]
+    assert [c.id for c in store.search("oleg")] == [2]
+    store.create("Vera", "1", "Remote work")
+    assert [c.id for c in store.search("work")] == [3, 5]
+
+
+def test_query_cache_is_bounded() -> None:
+    """Test least recently used eviction."""
+    cache = QueryCache(size=2)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    cache.get("a")
+    cache.put("c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1] and cache.get("c") == [3]
+
+
+def test_query_cache_prefers_smaller_index_candidates(store: ContactStore) -> None:
+    """Test that a cached substring is only filtered when it is smaller than the index candidates."""
+    cache = store.query_cache
+    store.search("o")
+    assert cache.refinement("olga", candidates=1) is None
+    assert cache.refinement("olga", candidates=len(store)) == [c.id for c in linear_search(store, "o")]
+    assert [c.id for c in store.search("olga")] == [3]
+    assert cache.stats()["cache_refinements"] == 1
+
+
+def test_query_cache_skips_large_results() -> None:
+    """Test that results over the size cap are not kept."""
+    cache = QueryCache(max_results=2)
+    cache.put("a", [1, 2, 3])
+    cache.put("ab", [1, 2])
+
+    assert cache.get("a") is None
+    assert cache.get("ab") == [1, 2]
+
+
+def test_query_cache_skips_phone_refinement(store: ContactStore) -> None:
+    """Test that phone-like terms are not narrowed from a cached substring."""
+    store.search("912000")
+    assert store.query_cache.refinement("7912000", candidates=len(store)) is None
+    assert [c.id for c in store.search("7912000")] == [3]
+    assert query_matches(store.get(3), "7912000")
+
+
+def test_query_cache_matches_scan_after_edits(store: ContactStore) -> None:
+    """Test cached answers against a full scan through a series of edits."""
+    terms = ["o", "ol", "olg", "a", "an", "8999", "work", "11"]
+    edits = [
+        lambda: store.update(1, name="Olga Lutina"),
+        lambda: store.create("Anna", "+7 999 000 00 00", "Works nights"),
+        lambda: store.delete(3),
+        lambda: store.update(4, phone="8 999 111"),
+        lambda: store.update(2, comment="olga's sister"),
+    ]
+    for edit in [lambda: None] + edits:
+        edit()
+        for term in terms:
+            # Phone-like terms also match normalized phone prefixes.
+            assert store.search(term) == [c for c in store if query_matches(c, term)]
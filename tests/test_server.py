@@ -0,0 +1,230 @@
+import asyncio
+import json
+import time
+import pytest
+
+from model import Contact, ContactStore, FileHandler
+from server import ContactService, HttpError, PhonebookServer, Request, read_request
+
+"""
+Common args for test fuctions:
+    service: Fixture providing a ContactService over two contacts
+    test_first_contact: Fixture providing test Contact instance
+    test_second_contact: Fixture providing second test Contact instance
+"""
+
+
+@pytest.fixture
+def service(test_first_contact: Contact, test_second_contact: Contact) -> ContactService:
+    """Create a service without persistence.
+    Returns:
+        ContactService: Service over an indexed store
+    """
+    store = ContactStore([test_first_contact, test_second_contact])
+    store.build_index()
+    return ContactService(store)
+
+
+def call(service: ContactService, *requests: Request) -> list:
+    """Start the writer, handle the requests in order and stop it again."""
+    async def run():
+        await service.start()
+        try:
+            return [await service.handle(request) for request in requests]
+        finally:
+            await service.stop()
+    return asyncio.run(run())
+
+
+def json_request(method: str, target: str, data=None, headers: dict = None) -> Request:
+    """Build a request with an optional JSON body."""
+    return Request(method, target, headers, b"" if data is None else json.dumps(data).encode())
+
+
+def test_crud(service: ContactService) -> None:
+    """Test create, read, update and delete through the API."""
+    created, fetched, updated, deleted, missing = call(
+        service,
+        json_request("POST", "/contacts", {"name": "Ivan", "phone": "112"}),
+        json_request("GET", "/contacts/3"),
+        json_request("PATCH", "/contacts/3", {"comment": "Emergency"}),
+        json_request("DELETE", "/contacts/1"),
+        json_request("GET", "/contacts/1"),
+    )
+
+    assert created.status == 201
+    assert created.data == {"id": 3, "name": "Ivan", "phone": "112", "comment": ""}
+    assert fetched.data == created.data
+    assert updated.data["comment"] == "Emergency"
+    assert deleted.status == 204 and deleted.body == b""
+    assert missing.status == 404
+    assert [c.id for c in service.store] == [2, 3]
+
+
+@pytest.mark.parametrize("request_", [
+    json_request("POST", "/contacts", {"name": "Ivan"}),
+    json_request("POST", "/contacts", {"name": "Ivan", "phone": 112}),
+    json_request("PATCH", "/contacts/x", {"name": "Ivan"}),
+    json_request("GET", "/contacts?page=0"),
+    Request("POST", "/contacts", body=b"{not json"),
+])
+def test_bad_requests(service: ContactService, request_: Request) -> None:
+    """Test that invalid input is rejected without touching the store."""
+    response, = call(service, request_)
+
+    assert response.status == 400
+    assert "error" in response.data
+    assert len(service.store) == 2
+
+
+def test_writer_survives_bad_operations(service: ContactService, mocker) -> None:
+    """Test that an id out of range or an unexpected error fails one request, not the writer."""
+    huge, = call(service, Request("POST", "/contacts/batch", body=b'[{"op": "delete", "id": 1e400}]'))
+    assert huge.data["results"][0]["status"] == 400
+
+    mocker.patch.object(service.store, "delete", side_effect=[RuntimeError("boom"), None])
+
+    async def run():
+        await service.start()
+        try:
+            failed = await service.handle(json_request("DELETE", "/contacts/1"))
+            created = await asyncio.wait_for(
+                service.handle(json_request("POST", "/contacts", {"name": "Ivan", "phone": "112"})), 1)
+            return failed, created
+        finally:
+            await service.stop()
+
+    failed, created = asyncio.run(run())
+    assert failed.status == 500
+    assert created.status == 201
+
+
+def test_batch_answers_each_operation_after_an_error(service: ContactService, mocker) -> None:
+    """Test that an unexpected error fails its own operation while the others stay applied."""
+    mocker.patch.object(service.store, "delete", side_effect=RuntimeError("boom"))
+    response, = call(service, json_request("POST", "/contacts/batch", [
+        {"op": "update", "id": 2, "comment": "Applied"},
+        {"op": "delete", "id": 1},
+        {"op": "create", "name": "Ivan", "phone": "112"},
+    ]))
+
+    assert [result["status"] for result in response.data["results"]] == [200, 500, 201]
+    assert service.store.get(2).comment == "Applied"
+    assert len(service.store) == 3
+
+
+def test_negative_content_length() -> None:
+    """Test that a negative body length is refused with 400 instead of dropping the connection."""
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"POST /contacts HTTP/1.1\r\nContent-Length: -5\r\n\r\n")
+        reader.feed_eof()
+        return await read_request(reader)
+
+    with pytest.raises(HttpError) as error:
+        asyncio.run(run())
+    assert error.value.status == 400
+
+
+def test_stop_waits_for_running_save(mocker, test_first_contact: Contact) -> None:
+    """Test that the final save does not run next to one the save loop started."""
+    running, peak = [0], [0]
+
+    def write_changes(snapshot, changes):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        time.sleep(0.2)
+        running[0] -= 1
+        return None
+
+    file_handler = mocker.Mock(spec=FileHandler)
+    file_handler.write_changes.side_effect = write_changes
+    service = ContactService(ContactStore([test_first_contact]), file_handler, save_interval=0.01)
+
+    async def run():
+        await service.start()
+        await service.handle(json_request("POST", "/contacts", {"name": "Ivan", "phone": "1"}))
+        await asyncio.sleep(0.05)
+        await service.stop()
+
+    asyncio.run(run())
+
+    assert peak[0] == 1
+    assert service.store.changes.added == {2}
+
+
+def test_list_etag(service: ContactService) -> None:
+    """Test conditional list requests before and after a write."""
+    first, cached, _, changed = call(
+        service,
+        json_request("GET", "/contacts?q=oleg"),
+        json_request("GET", "/contacts?q=oleg", headers={"if-none-match": service.etag}),
+        json_request("PATCH", "/contacts/1", {"name": "Oleg Petrov"}),
+        json_request("GET", "/contacts?q=oleg", headers={"if-none-match": service.etag}),
+    )
+
+    assert [c["id"] for c in first.data["contacts"]] == [1]
+    assert cached.status == 304 and cached.body == b""
+    assert changed.status == 200
+    assert changed.headers["ETag"] != first.headers["ETag"]
+
+
+def test_pages_and_ids(service: ContactService) -> None:
+    """Test paged listings and batch reads by id."""
+    page, ids = call(service, json_request("GET", "/contacts?page=2&size=1"),
+                     json_request("GET", "/contacts?ids=2,9,1"))
+
+    assert [c["id"] for c in page.data["contacts"]] == [2]
+    assert page.headers["X-Total-Count"] == "2"
+    assert [c["id"] for c in ids.data["contacts"]] == [2, 1]
+
+
+def test_batch(service: ContactService) -> None:
+    """Test that a batch reports a status per operation."""
+    response, = call(service, json_request("POST", "/contacts/batch", [
+        {"op": "create", "name": "Ivan", "phone": "112"},
+        {"op": "update", "id": 2, "comment": "Updated"},
+        {"op": "delete", "id": 9},
+        {"op": "merge"},
+    ]))
+
+    assert [result["status"] for result in response.data["results"]] == [201, 200, 404, 400]
+    assert service.store.get(2).comment == "Updated"
+    assert service.generation == 2
+
+
+def test_writes_are_saved_together(mocker, test_first_contact: Contact) -> None:
+    """Test that writes are persisted by one save instead of per request."""
+    file_handler = mocker.Mock(spec=FileHandler)
+    file_handler.write_changes.return_value = 3
+    service = ContactService(ContactStore([test_first_contact]), file_handler, save_interval=60)
+
+    call(service, *(json_request("POST", "/contacts", {"name": f"Name {i}", "phone": "1"}) for i in range(3)))
+
+    file_handler.write_changes.assert_called_once()
+    snapshot, changes = file_handler.write_changes.call_args.args
+    assert len(snapshot) == 4
+    assert changes.added == {2, 3, 4}
+    assert not service.store.changes
+
+
+def test_http_keep_alive(service: ContactService) -> None:
+    """Test two requests over one connection to a running server."""
+    async def run():
+        server = PhonebookServer(service, "127.0.0.1", 0)
+        await server.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        try:
+            writer.write(b"GET /contacts/1 HTTP/1.1\r\nHost: test\r\n\r\n"
+                         b"DELETE /contacts/2 HTTP/1.1\r\nConnection: close\r\n\r\n")
+            return await reader.read()
+        finally:
+            writer.close()
+            await server.stop()
+
+    raw = asyncio.run(run())
+
+    assert raw.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert b'"name": "Oleg Lutin"' in raw
+    assert b"HTTP/1.1 204 No Content\r\n" in raw
+    assert 2 not in service.store
@@ -0,0 +1,402 @@
+import pytest
+import json
+import os
+import threading
+
+from model import Changeset, Contact, ContactStore, FileHandler
+from storage import (JournalFileHandler, SharedFileHandler, ShardedFileHandler, SqliteFileHandler, file_lock,
+                     make_file_handler, migrate_json_to_sqlite)
+
+"""
+Common args for test fuctions:
+    temp_file: Fixture providing temporary file path
+    test_first_contact: Fixture providing test Contact instance
+    test_second_contact: Fixture providing second test Contact instance
+"""
+
+
+@pytest.fixture
+def temp_file(tmp_path) -> str:
+    """Create a temporary file path for testing.
+    Args:
+        tmp_path: pytest fixture providing temporary directory
+    Returns:
+        str: Path to temporary test file
+    """
+    return str(tmp_path / "test_contacts.json")
+
+
+def read_journal_lines(handler: JournalFileHandler) -> list:
+    """Read the raw records of a journal file."""
+    with open(handler.journal_filename) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestJournalFileHandler:
+    def test_first_save_writes_snapshot(self, temp_file: str,
+                                        test_first_contact: Contact) -> None:
+        """Test that saving without a snapshot writes a full snapshot."""
+        handler = JournalFileHandler(temp_file)
+        store = ContactStore([test_first_contact])
+
+        assert handler.write_contacts(store)
+
+        assert FileHandler(temp_file).read_contacts()[0].name == test_first_contact.name
+        assert handler.journal_size() == 0
+
+    def test_changes_are_appended(self, temp_file: str,
+                                  test_first_contact: Contact,
+                                  test_second_contact: Contact) -> None:
+        """Test that later saves append only the changed contacts."""
+        handler = JournalFileHandler(temp_file)
+        store = ContactStore([test_first_contact, test_second_contact])
+        handler.write_contacts(store)
+        snapshot_size = os.path.getsize(temp_file)
+
+        store.update(2, comment="Updated")
+        store.delete(1)
+        store.create("Ivan", "112")
+        assert handler.write_changes(store, store.clear_changes()) == 3
+
+        assert os.path.getsize(temp_file) == snapshot_size
+        assert [(r["op"], r["id"]) for r in read_journal_lines(handler)] == [
+            ("del", 1), ("put", 2), ("put", 3)]
+        contacts = handler.read_contacts()
+        assert [c.id for c in contacts] == [2, 3]
+        assert contacts[0].comment == "Updated"
+
+    def test_append_skips_missing_contacts(self, temp_file: str, test_first_contact: Contact) -> None:
+        """Test that a changeset naming a contact no longer in the snapshot appends nothing for it."""
+        handler = JournalFileHandler(temp_file)
+        store = ContactStore([test_first_contact])
+        handler.write_contacts(store)
+        changes = Changeset()
+        changes.record_insert(5)
+        changes.record_update(1)
+
+        assert handler.write_changes(store.snapshot(), changes) == 1
+        assert [(r["op"], r["id"]) for r in read_journal_lines(handler)] == [("put", 1)]
+
+    def test_appended_contacts_get_ids(self, temp_file: str,
+                                       test_first_contact: Contact,
+                                       test_second_contact: Contact) -> None:
+        """Test that contacts appended without ids are numbered on replay, past deleted ones."""
+        handler = JournalFileHandler(temp_file)
+        store = ContactStore([test_first_contact, test_second_contact])
+        handler.write_contacts(store)
+        store.delete(2)
+        handler.write_changes(store, store.clear_changes())
+
+        assert handler.append_new_contacts([("Ivan", "112", ""), ("Olga", "113", "Work")]) == 2
+        assert handler.append_new_contacts([]) == 0
+
+        contacts = handler.read_contacts()
+        assert [(c.id, c.name) for c in contacts] == [(1, "Oleg Lutin"), (3, "Ivan"), (4, "Olga")]
+        assert ContactStore(contacts).next_id() == 5
+
+    def test_replay_after_interrupted_compaction(self, temp_file: str,
+                                                 test_first_contact: Contact) -> None:
+        """Test that contacts added before a compaction are not added again if the journal survived it."""
+        handler = JournalFileHandler(temp_file)
+        handler.write_contacts(ContactStore([test_first_contact]))
+        handler.append_new_contacts([("Ivan", "112", "")])
+        store = ContactStore(handler.read_contacts())
+        store.update(2, comment="Edited")
+        handler.write_changes(store, store.clear_changes())
+        with open(handler.journal_filename) as f:
+            journal = f.read()
+
+        assert handler.compact(store)
+        # A crash after the new snapshot but before the journal was cleared leaves it behind.
+        with open(handler.journal_filename, 'w') as f:
+            f.write(journal)
+
+        contacts = handler.read_contacts()
+        assert [(c.id, c.name, c.comment) for c in contacts] == [(1, "Oleg Lutin", "Test comment"),
+                                                                 (2, "Ivan", "Edited")]
+
+    def test_torn_journal_tail(self, temp_file: str, test_first_contact: Contact) -> None:
+        """Test that a half-written last record is ignored on replay."""
+        handler = JournalFileHandler(temp_file)
+        handler.write_contacts(ContactStore([test_first_contact]))
+        with open(handler.journal_filename, 'a') as f:
+            f.write('{"op":"del","id":1}\n{"op":"put","id":2,"na')
+
+        assert handler.read_contacts() == []
+
+    def test_append_after_torn_tail(self, temp_file: str,
+                                    test_first_contact: Contact,
+                                    test_second_contact: Contact) -> None:
+        """Test that records saved after an interrupted append are replayed."""
+        handler = JournalFileHandler(temp_file)
+        store = ContactStore([test_first_contact])
+        handler.write_contacts(store)
+        with open(handler.journal_filename, 'a') as f:
+            f.write('{"op":"put","id":5,"na')
+
+        store.insert(test_second_contact)
+        assert handler.write_changes(store, store.clear_changes()) == 1
+
+        assert [c.id for c in handler.read_contacts()] == [1, 2]
+
+    def test_compaction_threshold(self, temp_file: str, test_first_contact: Contact) -> None:
+        """Test that a journal over the size limit is folded into the snapshot."""
+        handler = JournalFileHandler(temp_file, max_journal_bytes=1)
+        store = ContactStore([test_first_contact])
+        handler.write_contacts(store)
+        store.create("Ivan", "112")
+        assert handler.write_changes(store, store.clear_changes()) == 1
+        assert handler.journal_size() > 0
+
+        store.create("Olga", "113")
+        assert handler.write_changes(store, store.clear_changes()) == 3
+
+        assert handler.journal_size() == 0
+        assert len(FileHandler(temp_file).read_contacts()) == 3
+
+
+class TestSharedFileHandler:
+    def test_concurrent_saves_merge(self, temp_file: str,
+                                    test_first_contact: Contact,
+                                    test_second_contact: Contact) -> None:
+        """Test that two writers keep each other's changes, per contact id."""
+        FileHandler(temp_file).write_contacts([test_first_contact, test_second_contact])
+        first, second = SharedFileHandler(temp_file), SharedFileHandler(temp_file)
+        first_store = ContactStore(first.read_contacts())
+        second_store = ContactStore(second.read_contacts())
+
+        first_store.create("Ivan", "112")
+        first_store.delete(2)
+        assert first.write_changes(first_store, first_store.clear_changes()) == 2
+        assert not first.changed_on_disk()
+
+        assert second.changed_on_disk()
+        second_store.update(1, comment="Updated")
+        second_store.create("Olga", "113")
+        assert second.write_changes(second_store, second_store.clear_changes()) == 3
+
+        contacts = FileHandler(temp_file).read_contacts()
+        assert [(c.id, c.name) for c in contacts] == [(1, "Oleg Lutin"), (3, "Ivan"), (4, "Olga")]
+        assert contacts[0].comment == "Updated"
+        assert second.changed_on_disk()
+        assert first.changed_on_disk()
+
+    def test_unchanged_content_is_not_a_change(self, temp_file: str,
+                                               test_first_contact: Contact) -> None:
+        """Test that rewriting the same bytes does not trigger a reload."""
+        handler = SharedFileHandler(temp_file)
+        handler.write_contacts([test_first_contact])
+        FileHandler(temp_file).write_contacts([test_first_contact])
+
+        assert not handler.changed_on_disk()
+
+        FileHandler(temp_file).write_contacts([])
+        assert handler.changed_on_disk()
+
+    def test_saves_and_reads_do_not_hash_the_book(self, temp_file: str,
+                                                   test_first_contact: Contact, mocker) -> None:
+        """Test that the saved checksum stands for the file until its stat stamp changes."""
+        handler = SharedFileHandler(temp_file)
+        file_checksum = mocker.patch("storage.file_checksum")
+
+        handler.write_contacts([test_first_contact])
+        handler.read_contacts()
+        assert not handler.changed_on_disk()
+
+        file_checksum.assert_not_called()
+
+    def test_writes_wait_for_lock(self, temp_file: str, test_first_contact: Contact) -> None:
+        """Test that a save blocks while another writer holds the lock."""
+        handler = SharedFileHandler(temp_file)
+        writer = threading.Thread(target=handler.write_contacts, args=([test_first_contact],))
+
+        with file_lock(handler.lock_filename, exclusive=True):
+            writer.start()
+            writer.join(0.2)
+            assert writer.is_alive()
+            assert not os.path.exists(temp_file)
+        writer.join()
+
+        assert len(FileHandler(temp_file).read_contacts()) == 1
+
+
+class TestShardedFileHandler:
+    @pytest.fixture
+    def shard_dir(self, tmp_path) -> str:
+        """Provide a directory path for a sharded phonebook of ten contacts, four per shard at most."""
+        path = str(tmp_path / "test_contacts.shards")
+        ShardedFileHandler(path, max_shard_contacts=4).write_contacts(
+            Contact(i, f"Name {i}", f"8999{i:07}") for i in range(1, 11))
+        return path
+
+    def test_layout(self, shard_dir: str) -> None:
+        """Test that a full write cuts the book into half-full shards listed in the manifest."""
+        with open(os.path.join(shard_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        assert [(s["start"], s["count"]) for s in manifest["shards"]] == [(0, 2), (3, 2), (5, 2), (7, 2), (9, 2)]
+        assert manifest["last_id"] == 10
+        assert sorted(os.listdir(shard_dir)) == sorted(["manifest.json"] + [s["file"] for s in manifest["shards"]])
+
+    def test_get_reads_one_shard(self, shard_dir: str, mocker) -> None:
+        """Test that a lookup reads only the shard holding the id, and a search reads them all."""
+        handler = ShardedFileHandler(shard_dir)
+        read_shard = mocker.spy(handler, "read_shard")
+        store = handler.read_contacts()
+
+        assert len(store) == 10
+        read_shard.assert_not_called()
+        assert store.get(6).name == "Name 6"
+        assert read_shard.call_count == 1
+        assert [c.id for c in store.page(1, 3)] == [1, 2, 3]
+        assert read_shard.call_count == 3
+
+        assert [c.id for c in store.search("name 1")] == [1, 10]
+        assert read_shard.call_count == 5
+
+    def test_save_rewrites_dirty_shards(self, shard_dir: str) -> None:
+        """Test that only shards with changes are rewritten, and that a full shard is split."""
+        handler = ShardedFileHandler(shard_dir, max_shard_contacts=4)
+        store = handler.read_contacts()
+        untouched = {shard.file for shard in handler.layout.shards[:-1] if shard.start != 3}
+        store.update(4, comment="Updated")
+        store.delete(3)
+        for _ in range(3):
+            store.create("Ivan", "112")
+
+        assert handler.write_changes(store, store.clear_changes()) == 6
+
+        assert handler.layout.starts == [0, 3, 5, 7, 9, 11, 13]
+        assert untouched <= set(os.listdir(shard_dir))
+        assert len(os.listdir(shard_dir)) == 8
+        contacts = list(ShardedFileHandler(shard_dir).read_contacts())
+        assert [c.id for c in contacts] == [1, 2, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13]
+        assert contacts[2].comment == "Updated"
+
+    def test_autosave_snapshot(self, shard_dir: str) -> None:
+        """Test that a snapshot copies only read shards and saves them for the live store."""
+        handler = ShardedFileHandler(shard_dir)
+        store = handler.read_contacts()
+        store.update(1, name="Changed")
+        snapshot = store.snapshot()
+        store.update(1, name="Later")
+
+        assert snapshot.get(1).name == "Changed"
+        assert handler.write_changes(snapshot, store.clear_changes()) == 2
+        assert ShardedFileHandler(shard_dir).read_contacts().get(1).name == "Changed"
+
+
+class TestSqliteFileHandler:
+    @pytest.fixture
+    def db_file(self, tmp_path) -> str:
+        """Provide a path for a temporary SQLite database."""
+        return str(tmp_path / "test_contacts.db")
+
+    def test_crud_and_commit(self, db_file: str,
+                             test_first_contact: Contact,
+                             test_second_contact: Contact) -> None:
+        """Test that store operations reach the database only after a save."""
+        handler = SqliteFileHandler(db_file)
+        store = handler.read_contacts()
+        store.insert(test_first_contact)
+        store.insert(test_second_contact)
+        assert handler.write_changes(store, store.clear_changes()) == 2
+
+        store.update(2, comment="Updated")
+        store.delete(1)
+        assert store.get(2).comment == "Updated"
+        assert 1 not in store
+        handler.close()
+
+        reopened = SqliteFileHandler(db_file).read_contacts()
+        assert [c.id for c in reopened] == [1, 2]
+        assert reopened.get(2).comment == ""
+
+    def test_ids_not_reused(self, db_file: str, test_second_contact: Contact) -> None:
+        """Test that the id counter survives deleting the newest contact."""
+        handler = SqliteFileHandler(db_file)
+        store = handler.read_contacts()
+        store.insert(test_second_contact)
+        store.delete(2)
+        handler.write_contacts(store)
+
+        assert handler.read_contacts().next_id() == 3
+
+    @pytest.mark.parametrize("term", ["", "ol", "OLEG", "999", "comm", "zzz"])
+    def test_search(self, db_file: str, term: str,
+                    test_first_contact: Contact,
+                    test_second_contact: Contact) -> None:
+        """Test that full-text search returns the same contacts as a scan."""
+        handler = SqliteFileHandler(db_file)
+        handler.write_contacts([test_first_contact, test_second_contact])
+        store = handler.read_contacts()
+
+        expected = ContactStore([test_first_contact, test_second_contact]).search(term)
+        assert [c.id for c in store.search(term)] == [c.id for c in expected]
+
+    def test_find_by_phone(self, db_file: str, test_first_contact: Contact) -> None:
+        """Test normalized phone lookups in the database."""
+        handler = SqliteFileHandler(db_file)
+        store = handler.read_contacts()
+        store.insert(test_first_contact)
+
+        assert [c.id for c in store.find_by_phone("+7 999 111 22 33")] == [1]
+        assert [c.id for c in store.search("+7 999")] == [1]
+        store.update(1, phone="112")
+        assert store.find_by_phone("8999", prefix=True) == []
+
+    def test_fuzzy_search(self, db_file: str,
+                          test_first_contact: Contact,
+                          test_second_contact: Contact) -> None:
+        """Test that the fuzzy index is built on demand and kept current."""
+        handler = SqliteFileHandler(db_file)
+        store = handler.read_contacts()
+        store.insert(test_first_contact)
+
+        assert [c.id for c in store.fuzzy_search("Olek Lutn")] == [1]
+        store.insert(test_second_contact)
+        store.update(1, name="Pavel")
+        assert [c.id for c in store.fuzzy_search("Mosha")] == [2]
+        assert store.fuzzy_search("Oleg") == []
+
+    def test_migrate(self, db_file: str, temp_file: str,
+                     test_first_contact: Contact,
+                     test_second_contact: Contact) -> None:
+        """Test bulk import of a JSON phonebook."""
+        FileHandler(temp_file).write_contacts([test_first_contact, test_second_contact])
+
+        assert migrate_json_to_sqlite(temp_file, db_file) == 2
+        contacts = SqliteFileHandler(db_file).read_contacts()
+        assert [c.to_dict() for c in contacts] == [
+            test_first_contact.to_dict(), test_second_contact.to_dict()]
+
+
+    def test_migrate_into_non_empty_db(self, db_file: str, temp_file: str, capsys,
+                                       test_first_contact: Contact,
+                                       test_second_contact: Contact) -> None:
+        """Test that a second migrate is reported instead of failing, and replaces with replace=True."""
+        FileHandler(temp_file).write_contacts([test_first_contact])
+        migrate_json_to_sqlite(temp_file, db_file)
+        FileHandler(temp_file).write_contacts([test_second_contact])
+
+        assert migrate_json_to_sqlite(temp_file, db_file) is None
+        assert "already has 1 contacts" in capsys.readouterr().out
+        assert [c.id for c in SqliteFileHandler(db_file).read_contacts()] == [1]
+
+        assert migrate_json_to_sqlite(temp_file, db_file, replace=True) == 1
+        assert [c.id for c in SqliteFileHandler(db_file).read_contacts()] == [2]
+
+    def test_migrate_missing_source(self, db_file: str, tmp_path, capsys) -> None:
+        """Test that a missing JSON phonebook is reported instead of raising."""
+        assert migrate_json_to_sqlite(str(tmp_path / "missing.json"), db_file) is None
+        assert "Could not import" in capsys.readouterr().out
+        assert SqliteFileHandler(db_file).read_contacts() == []
+
+
+def test_make_file_handler(temp_file: str) -> None:
+    """Test building file handlers by storage name."""
+    assert isinstance(make_file_handler("journal", temp_file), JournalFileHandler)
+    assert make_file_handler("json", temp_file).filename == temp_file
+    assert isinstance(make_file_handler("sharded"), ShardedFileHandler)
+    with pytest.raises(ValueError):
+        make_file_handler("unknown", temp_file)
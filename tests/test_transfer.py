@@ -0,0 +1,82 @@
+import pytest
+
+from model import Contact, ContactStore
+from transfer import detect_format, export_contacts, import_contacts
+
+"""
+Common args for test fuctions:
+    tmp_path: pytest fixture providing temporary directory
+    fmt: Contact file format name
+    test_first_contact: Fixture providing test Contact instance
+    test_second_contact: Fixture providing second test Contact instance
+"""
+
+
+@pytest.mark.parametrize("fmt", ["csv", "vcard", "ndjson"])
+def test_round_trip(tmp_path, fmt: str,
+                    test_first_contact: Contact,
+                    test_second_contact: Contact) -> None:
+    """Test that exported contacts import back with fresh ids."""
+    path = str(tmp_path / f"contacts.{fmt}")
+    tricky = Contact(7, "Doe, John; Jr", "+7 999 000", "line one\nline two")
+    exported = export_contacts([test_first_contact, test_second_contact, tricky], path, fmt)
+    assert exported.processed == 3
+
+    store = ContactStore([Contact(10, "Existing", "1")])
+    result = import_contacts(store, path, fmt, batch_size=2)
+
+    assert result.processed == 3
+    assert result.rejected == 0
+    assert [(c.id, c.name, c.phone, c.comment) for c in store][1:] == [
+        (11, test_first_contact.name, test_first_contact.phone, test_first_contact.comment),
+        (12, test_second_contact.name, test_second_contact.phone, ""),
+        (13, tricky.name, tricky.phone, tricky.comment),
+    ]
+    assert store.changes.added == {11, 12, 13}
+
+
+def test_import_rejects_invalid_rows(tmp_path) -> None:
+    """Test that rows without a name or phone are skipped and counted."""
+    path = tmp_path / "contacts.csv"
+    path.write_text("phone,name\n123,Oleg\n,Nobody\n456,\n789,Masha\n")
+    store = ContactStore()
+
+    result = import_contacts(store, str(path))
+
+    assert result.processed == 2
+    assert result.rejected == 2
+    assert [(c.name, c.phone) for c in store] == [("Oleg", "123"), ("Masha", "789")]
+
+
+def test_import_rejects_invalid_ndjson_lines(tmp_path) -> None:
+    """Test that malformed and non-object lines are counted as rejected."""
+    path = tmp_path / "contacts.ndjson"
+    path.write_text('{"name": "Oleg", "phone": "123"}\n{broken\n[1, 2]\n"text"\n\n'
+                    '{"name": "Masha", "phone": "789"}\n')
+    store = ContactStore()
+
+    result = import_contacts(store, str(path))
+
+    assert (result.processed, result.rejected) == (2, 3)
+    assert [c.name for c in store] == ["Oleg", "Masha"]
+
+
+def test_import_keeps_search_working(tmp_path, test_first_contact: Contact) -> None:
+    """Test that imported contacts are found once the indexes are rebuilt."""
+    path = tmp_path / "contacts.ndjson"
+    path.write_text('{"name": "Ivan Petrov", "phone": "8 912 000 11 22"}\n')
+    store = ContactStore([test_first_contact])
+    store.build_index()
+
+    import_contacts(store, str(path))
+
+    assert [c.name for c in store.search("petrov")] == ["Ivan Petrov"]
+    assert [c.name for c in store.find_by_phone("+79120001122")] == ["Ivan Petrov"]
+
+
+def test_detect_format() -> None:
+    """Test choosing the format from the file extension."""
+    assert detect_format("book.VCF") == "vcard"
+    assert detect_format("book.jsonl") == "ndjson"
+    with pytest.raises(ValueError):
+        detect_format("book.txt")
@@ -54,6 +54,31 @@ def test_show_contacts_with_data(capsys: CaptureFixture[str],
     assert test_first_contact.comment in captured.out
 
 
+def test_show_contacts_single_write(monkeypatch: MonkeyPatch,
+                                   test_first_contact: Contact) -> None:
+    """Test that a list of contacts is rendered with one write call."""
+    writes = []
+    monkeypatch.setattr('sys.stdout.write', writes.append)
+    View.show_contacts([test_first_contact, test_first_contact])
+    assert len(writes) == 1
+    assert writes[0].count(test_first_contact.name) == 2
+
+
+def test_show_contacts_page(capsys: CaptureFixture[str],
+                            test_first_contact: Contact) -> None:
+    """Test displaying one page of contacts with its position."""
+    View.show_contacts_page([test_first_contact], 2, 5)
+    captured = capsys.readouterr()
+    assert test_first_contact.name in captured.out
+    assert text.page_header.format(page=2, pages=5) in captured.out
+
+
+def test_get_page_command(monkeypatch: MonkeyPatch) -> None:
+    """Test reading a pager command."""
+    monkeypatch.setattr('builtins.input', lambda _: " N ")
+    assert View.get_page_command() == text.page_next
+
+
 @pytest.mark.parametrize("is_edit,inputs", [
     (False, ["Test Name", "1234567890", "Test Comment"]),
     (True, ["Test Name", "1234567890", "Test Comment"])
@@ -115,3 +140,17 @@ def test_confirm_action(monkeypatch: MonkeyPatch,
     monkeypatch.setattr('builtins.input', lambda _: user_input)
     result = View.confirm_action()
     assert result == expected
+
+
+def test_show_stats(capsys: CaptureFixture[str]) -> None:
+    """Test that statistics are printed as one table."""
+    View.show_stats({
+        "operations": {"find_contacts": {"count": 3, "mean_ms": 0.5, "p50_ms": 0.5, "p99_ms": 1.0,
+                                         "max_ms": 1.2, "total_ms": 1.5, "buckets": {}}},
+        "counters": {"bytes_read": 100},
+    })
+
+    captured = capsys.readouterr().out
+    assert text.stats_header in captured
+    assert "find_contacts" in captured and "1.200" in captured
+    assert "bytes_read: 100" in captured
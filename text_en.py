@@ -7,17 +7,22 @@ main_menu_items = [
     "Delete contact",
     "Save changes",
     "Exit",
+    "Show statistics",
+    "Find duplicates",
 ]
 main_menu_user_choice = "Select a menu item: "
 main_menu_user_choice_error = "You must enter a number from 1 to {number}".format(number=len(main_menu_items) - 1)
 
 contact_main = "\nContacts:"
 contact_save_successful = "Contacts saved successfully!"
+contact_save_stats = " Records written: {written}"
 contact_delete_successful = "Contact deleted successfully!"
 contact_update_successful = "Contact updated successfully!"
 contact_create_successful = "Contact created successfully!"
 
 contact_found_error = "\nContact not found"
+contacts_reloaded = "The phonebook was changed by another program and has been reloaded"
+contact_similar_found = "No exact matches, showing similar names:"
 contact_field_error = "Field cannot be empty!"
 contact_details = "Current contact details:"
 contact_id = "ID: "
@@ -30,7 +35,37 @@ contact_enter_id = "\nEnter contact ID: "
 contact_enter_new_details = "\nEnter new details (press Enter to keep current value): "
 contact_enter_valid_number = "Please enter a valid number!"
 
+page_header = "Page {page} of {pages}"
+page_prompt = "[n]ext, [p]revious, page number or Enter to continue: "
+page_next = "n"
+page_previous = "p"
+
 phonebook_closing = "The phonebook is closing!"
 save_confirm = "\nAre you sure you want to save changes before exiting? (y/n): "
 save_error = "Error saving!"
+load_error = "Error loading!"
+snapshot_restored = "Loaded the newest valid backup: "
+snapshot_damaged = "The phonebook file is damaged and was moved to "
+save_started = "Saving in the background..."
 save_approve = "y"
+
+import_report = "Imported {count} contacts, rejected {rejected} in {seconds:.2f}s ({rate:.0f} records/s)"
+batch_report = ("Applied {count} commands, rejected {rejected} in {seconds:.2f}s ({rate:.0f} commands/s), "
+                "records written: {written}")
+dedup_report = "Found {clusters} groups of duplicates, {duplicates} contacts to merge away, in {seconds:.2f}s"
+dedup_confirm = "\nMerge all {clusters} groups? (y/n): "
+dedup_merged = "Merged {clusters} groups, removed {removed} contacts"
+export_report = "Exported {count} contacts in {seconds:.2f}s ({rate:.0f} records/s)"
+migrate_successful = "Imported {count} contacts into {path}"
+migrate_not_empty = "{path} already has {count} contacts; run migrate with --replace to overwrite them"
+migrate_error = "Could not import the phonebook, nothing was written: "
+convert_successful = "Wrote {count} contacts to {path}"
+convert_error = "Could not read the phonebook to convert: "
+
+server_started = "Serving the phonebook on http://{host}:{port}/contacts (Ctrl+C to stop)"
+server_stopped = "Server stopped"
+
+stats_header = "\nOperation timings (ms):"
+stats_columns = f"{'operation':<18} {'count':>7} {'mean':>9} {'p50':>9} {'p99':>9} {'max':>9}"
+stats_row = "{name:<18} {count:>7} {mean_ms:>9.3f} {p50_ms:>9.3f} {p99_ms:>9.3f} {max_ms:>9.3f}"
+stats_disabled = "Operation timings are off; start the phonebook with --stats to collect them"
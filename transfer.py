@@ -0,0 +1,188 @@
+import csv
+import json
+import os
+import time
+from typing import Iterable, Iterator, Optional, TextIO
+
+from config import IMPORT_BATCH_SIZE
+from model import Contact, ContactStore, batches
+
+CSV_FIELDS = ["name", "phone", "comment"]
+VCARD_ESCAPES = {"\\n": "\n", "\\N": "\n", "\\,": ",", "\\;": ";", "\\\\": "\\"}
+FORMATS = {
+    ".csv": "csv",
+    ".vcf": "vcard",
+    ".vcard": "vcard",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+
+class TransferResult:
+    def __init__(self, processed: int = 0, rejected: int = 0, seconds: float = 0.0):
+        self.processed = processed
+        self.rejected = rejected
+        self.seconds = seconds
+
+    @property
+    def rate(self) -> float:
+        return self.processed / self.seconds if self.seconds else 0.0
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unknown contact file format: {path}")
+    return FORMATS[extension]
+
+
+def read_csv(file: TextIO) -> Iterator[tuple]:
+    rows = csv.reader(file)
+    header = [column.strip().lower() for column in next(rows, [])]
+    positions = [header.index(field) if field in header else None for field in CSV_FIELDS]
+    if positions == [0, 1, 2]:
+        for row in rows:
+            yield tuple(row[:3]) if len(row) >= 3 else tuple(row + [""] * (3 - len(row)))
+        return
+    for row in rows:
+        yield tuple(row[pos] if pos is not None and pos < len(row) else "" for pos in positions)
+
+
+def read_ndjson(file: TextIO) -> Iterator[tuple]:
+    for line in file:
+        if line.strip():
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                data = None
+            if not isinstance(data, dict):
+                # An empty record, so validate counts the line as rejected.
+                yield None, None, None
+                continue
+            yield data.get("name"), data.get("phone"), data.get("comment")
+
+
+def unescape_vcard(value: str) -> str:
+    result = []
+    i = 0
+    while i < len(value):
+        pair = value[i:i + 2]
+        if pair in VCARD_ESCAPES:
+            result.append(VCARD_ESCAPES[pair])
+            i += 2
+        else:
+            result.append(value[i])
+            i += 1
+    return "".join(result)
+
+
+def escape_vcard(value: str) -> str:
+    return (value.replace("\\", "\\\\").replace("\n", "\\n")
+            .replace(",", "\\,").replace(";", "\\;"))
+
+
+def unfold_lines(file: TextIO) -> Iterator[str]:
+    current = None
+    for line in file:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def read_vcard(file: TextIO) -> Iterator[tuple]:
+    record: Optional[dict] = None
+    for line in unfold_lines(file):
+        key, _, value = line.partition(":")
+        key = key.split(";")[0].upper()
+        if key == "BEGIN":
+            record = {}
+        elif record is None:
+            continue
+        elif key == "END":
+            yield record.get("FN"), record.get("TEL"), record.get("NOTE")
+            record = None
+        elif key in ("FN", "TEL", "NOTE"):
+            # Only the first phone number of a card is kept.
+            record.setdefault(key, unescape_vcard(value))
+
+
+READERS = {
+    "csv": read_csv,
+    "ndjson": read_ndjson,
+    "vcard": read_vcard,
+}
+
+
+def validate(records: Iterable[tuple], result: TransferResult) -> Iterator[tuple[str, str, str]]:
+    for name, phone, comment in records:
+        name = str(name or "").strip()
+        phone = str(phone or "").strip()
+        if not name or not phone:
+            result.rejected += 1
+            continue
+        yield name, phone, str(comment or "").strip()
+
+
+def import_contacts(store: ContactStore, path: str, fmt: Optional[str] = None,
+                    batch_size: int = IMPORT_BATCH_SIZE) -> TransferResult:
+    result = TransferResult()
+    start = time.perf_counter()
+    with open(path, "r", newline="", encoding="utf-8") as file:
+        records = validate(READERS[fmt or detect_format(path)](file), result)
+        for batch in batches(records, batch_size):
+            first_id = store.next_id()
+            store.insert_many(Contact(first_id + offset, name, phone, comment)
+                              for offset, (name, phone, comment) in enumerate(batch))
+            result.processed += len(batch)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def write_csv(file: TextIO, contacts: Iterable[Contact]):
+    writer = csv.writer(file)
+    writer.writerow(CSV_FIELDS)
+    for contact in contacts:
+        writer.writerow((contact.name, contact.phone, contact.comment))
+
+
+def write_ndjson(file: TextIO, contacts: Iterable[Contact]):
+    for contact in contacts:
+        file.write(json.dumps(contact.to_dict(), ensure_ascii=False) + "\n")
+
+
+def write_vcard(file: TextIO, contacts: Iterable[Contact]):
+    for contact in contacts:
+        file.write("BEGIN:VCARD\r\nVERSION:3.0\r\n")
+        file.write(f"FN:{escape_vcard(contact.name)}\r\n")
+        file.write(f"TEL:{escape_vcard(contact.phone)}\r\n")
+        if contact.comment:
+            file.write(f"NOTE:{escape_vcard(contact.comment)}\r\n")
+        file.write("END:VCARD\r\n")
+
+
+WRITERS = {
+    "csv": write_csv,
+    "ndjson": write_ndjson,
+    "vcard": write_vcard,
+}
+
+
+def export_contacts(contacts: Iterable[Contact], path: str, fmt: Optional[str] = None) -> TransferResult:
+    result = TransferResult()
+    start = time.perf_counter()
+
+    def counted(items: Iterable[Contact]) -> Iterator[Contact]:
+        for item in items:
+            result.processed += 1
+            yield item
+
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        WRITERS[fmt or detect_format(path)](file, counted(contacts))
+    result.seconds = time.perf_counter() - start
+    return result
@@ -1,3 +1,4 @@
+import sys
 import text_en as text
 
 
@@ -13,19 +14,45 @@ class View:
             print(f'\t{i}. {row}' if i else row)
         return input(text.main_menu_user_choice)
 
+    @staticmethod
+    def format_contacts(contacts) -> str:
+        lines = [text.contact_main]
+        for contact in contacts:
+            lines.append(f"{text.contact_id}{contact.id}")
+            lines.append(f"{text.contact_name}{contact.name}")
+            lines.append(f"{text.contact_phone}{contact.phone}")
+            lines.append(f"{text.contact_comment}{contact.comment}")
+            lines.append("-" * 30)
+        lines.append("")
+        return "\n".join(lines)
+
     @staticmethod
     def show_contacts(contacts: dict):
         if not contacts:
             print(text.contact_found_error)
             return
 
-        print(text.contact_main)
-        for contact in contacts:
-            print(f"{text.contact_id}{contact.id}")
-            print(f"{text.contact_name}{contact.name}")
-            print(f"{text.contact_phone}{contact.phone}")
-            print(f"{text.contact_comment}{contact.comment}")
-            print("-" * 30)
+        sys.stdout.write(View.format_contacts(contacts))
+
+    @staticmethod
+    def show_contacts_page(contacts, page: int, pages: int):
+        sys.stdout.write(View.format_contacts(contacts) + text.page_header.format(page=page, pages=pages) + "\n")
+
+    @staticmethod
+    def format_stats(stats: dict) -> str:
+        lines = [text.stats_header, text.stats_columns]
+        for name, timer in stats["operations"].items():
+            lines.append(text.stats_row.format(name=name, **timer))
+        lines.extend(f"{name}: {value}" for name, value in stats["counters"].items())
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def show_stats(stats: dict):
+        sys.stdout.write(View.format_stats(stats))
+
+    @staticmethod
+    def get_page_command() -> str:
+        return input(text.page_prompt).strip().lower()
 
     @staticmethod
     def get_contact_input(is_edit=False) -> str:
@@ -67,6 +94,6 @@ class View:
         return cnt_id
 
     @staticmethod
-    def confirm_action() -> bool:
-        response = input(text.save_confirm).lower()
+    def confirm_action(prompt: str = text.save_confirm) -> bool:
+        response = input(prompt).lower()
         return response == text.save_approve